@@ -0,0 +1,110 @@
+import gzip
+import importlib
+import os
+from io import BufferedIOBase
+from pathlib import Path
+from types import ModuleType
+
+# Exports can be written plain or compressed; the compression is picked by
+# config and recorded only in the file suffix. Readers go by the magic
+# bytes, so every reader opens any variant.
+
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+
+
+def _zstd() -> ModuleType:
+    # compression.zstd is in the standard library from Python 3.14 on
+    try:
+        return importlib.import_module("compression.zstd")
+    except ImportError as e:
+        raise RuntimeError("zstd compression needs Python 3.14 or newer") from e
+
+
+def zstd_available() -> bool:
+    try:
+        _zstd()
+    except RuntimeError:
+        return False
+    return True
+
+
+def artifact_path(path: str | os.PathLike[str], compression: str) -> Path:
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown export compression: {compression!r}")
+    path = Path(path)
+    return path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+
+
+def artifact_variants(path: str | os.PathLike[str]) -> list[Path]:
+    return [artifact_path(path, compression) for compression in COMPRESSION_SUFFIXES]
+
+
+def find_artifact(path: str | os.PathLike[str]) -> Path:
+    # `x.realm.json` also finds `x.realm.json.gz` and `x.realm.json.zst`
+    for variant in artifact_variants(path):
+        if variant.is_file():
+            return variant
+    return Path(path)
+
+
+def detect_compression(head: bytes) -> str:
+    for magic, compression in _MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return "none"
+
+
+class _GzipWriter(gzip.GzipFile):
+    # Opens the file itself but leaves the name and mtime out of the header,
+    # so equal realms give byte-identical files.
+    def __init__(self, path: str | os.PathLike[str]):
+        self._raw = Path(path).open("wb")
+        super().__init__(
+            filename="", mode="wb", compresslevel=GZIP_LEVEL, fileobj=self._raw, mtime=0
+        )
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+def open_artifact_writer(
+    path: str | os.PathLike[str], compression: str
+) -> BufferedIOBase:
+    match compression:
+        case "none":
+            return Path(path).open("wb")
+        case "gzip":
+            return _GzipWriter(path)
+        case "zstd":
+            return _zstd().open(path, "wb", level=ZSTD_LEVEL)  # type: ignore[no-any-return]
+        case _:
+            raise ValueError(f"Unknown export compression: {compression!r}")
+
+
+def open_artifact(path: str | os.PathLike[str]) -> BufferedIOBase:
+    with Path(path).open("rb") as f:
+        compression = detect_compression(f.read(4))
+
+    match compression:
+        case "gzip":
+            return gzip.GzipFile(path, "rb")
+        case "zstd":
+            return _zstd().open(path, "rb")  # type: ignore[no-any-return]
+        case _:
+            return Path(path).open("rb")
+
+
+def read_artifact(path: str | os.PathLike[str]) -> bytes:
+    with open_artifact(path) as f:
+        return f.read()
@@ -0,0 +1,157 @@
+from collections.abc import Iterator
+from typing import Any
+
+from pykeycloak_realm.ids import stable_id
+
+JsonDict = dict[str, Any]
+
+# Expands `authorizationSettings.matrix` of a client into the resources,
+# scopes, policies and scope permissions Keycloak expects:
+#
+#   authorizationSettings:
+#     matrix:
+#       scopes:                  # name -> displayName
+#         view: View Scope
+#         update: Update Scope
+#       resources:               # name -> resource fields (uri defaults to name)
+#         /otago/users: {type: urn:section, displayName: Users}
+#       policies:                # name -> policy fields
+#         policy_role__otago_admin: {type: role, config: {roles: [{id: ...}]}}
+#       grants:                  # policy -> resource -> scopes it grants
+#         policy_role__otago_admin:
+#           /otago/users: [view, update]
+#       permission_name: "{scope}:{resource}"
+#       permission: {decisionStrategy: AFFIRMATIVE}
+#
+# Every granted (resource, scope) pair becomes one scope permission listing
+# the policies that grant it. A resource without `scopes` gets the scopes
+# granted on it. Generated entries get ids derived from the clientId and
+# their name, so they are the same on every build.
+#
+# Entries are generated lazily and appended as they come; names are checked
+# for collisions (with each other and with what the client already declares)
+# on the way, with one set lookup per entry.
+
+DEFAULT_PERMISSION_NAME = "{scope}:{resource}"
+DEFAULT_PERMISSION = {"logic": "POSITIVE", "decisionStrategy": "AFFIRMATIVE"}
+DEFAULT_POLICY = {"logic": "POSITIVE"}
+
+
+class MatrixError(ValueError):
+    pass
+
+
+def matrix_id(client_id: str, kind: str, name: str) -> str:
+    return stable_id(client_id, kind, name)
+
+
+def _grants(matrix: JsonDict) -> dict[tuple[str, str], list[str]]:
+    # (resource, scope) -> policies granting it, in declaration order
+    scopes = matrix.get("scopes") or {}
+    resources = matrix.get("resources") or {}
+    granted: dict[tuple[str, str], list[str]] = {}
+    unknown = []
+
+    for policy, by_resource in (matrix.get("grants") or {}).items():
+        for resource, resource_scopes in (by_resource or {}).items():
+            if resource not in resources:
+                unknown.append(f"resource {resource!r} (granted by {policy})")
+                continue
+            for scope in resource_scopes or ():
+                if scope not in scopes:
+                    unknown.append(f"scope {scope!r} (granted by {policy})")
+                    continue
+                granted.setdefault((resource, scope), []).append(policy)
+
+    if unknown:
+        raise MatrixError(
+            "Unknown names in authorization matrix: " + ", ".join(unknown)
+        )
+    return granted
+
+
+def iter_matrix(client_id: str, matrix: JsonDict) -> Iterator[tuple[str, JsonDict]]:
+    # yields ("scopes" | "resources" | "policies", entry)
+    scopes = matrix.get("scopes") or {}
+    resources = matrix.get("resources") or {}
+    granted = _grants(matrix)
+
+    for name, display_name in scopes.items():
+        entry = {"id": matrix_id(client_id, "scope", name), "name": name}
+        if display_name is not None:
+            entry["displayName"] = display_name
+        yield "scopes", entry
+
+    granted_scopes: dict[str, list[str]] = {}
+    for resource, scope in granted:
+        granted_scopes.setdefault(resource, []).append(scope)
+
+    for name, fields in resources.items():
+        entry = {"_id": matrix_id(client_id, "resource", name), "name": name}
+        entry["uri"] = name
+        entry |= fields or {}
+        entry.setdefault("scopes", granted_scopes.get(name, []))
+        yield "resources", entry
+
+    for name, fields in (matrix.get("policies") or {}).items():
+        entry = {"id": matrix_id(client_id, "policy", name), "name": name}
+        yield "policies", entry | DEFAULT_POLICY | (fields or {})
+
+    name_pattern = matrix.get("permission_name") or DEFAULT_PERMISSION_NAME
+    defaults = DEFAULT_PERMISSION | (matrix.get("permission") or {})
+    for (resource, scope), policies in granted.items():
+        name = name_pattern.format(resource=resource, scope=scope)
+        yield "policies", {
+            "id": matrix_id(client_id, "permission", name),
+            "name": name,
+            "type": "scope",
+            **defaults,
+            "resources": [resource],
+            "scopes": [scope],
+            "policies": policies,
+        }
+
+
+def expand_matrix(client: JsonDict) -> int:
+    # Returns the number of generated entries; the matrix key is removed.
+    auth = client.get("authorizationSettings")
+    if not auth or "matrix" not in auth:
+        return 0
+    matrix = auth["matrix"] or {}
+    client_id = client.get("clientId", "")
+
+    names = {
+        section: {entry.get("name") for entry in auth.get(section) or ()}
+        for section in ("scopes", "resources", "policies")
+    }
+    known_policies = names["policies"] | set(matrix.get("policies") or {})
+    missing = [p for p in matrix.get("grants") or {} if p not in known_policies]
+    if missing:
+        raise MatrixError(
+            f"Unknown policies in authorization matrix of {client_id}: "
+            + ", ".join(missing)
+        )
+
+    generated: dict[str, list[JsonDict]] = {}
+    for section, entry in iter_matrix(client_id, matrix):
+        seen = names[section]
+        if entry["name"] in seen:
+            raise MatrixError(
+                f"Duplicate name in authorization matrix of {client_id}: "
+                f"{section} {entry['name']!r}"
+            )
+        seen.add(entry["name"])
+        generated.setdefault(section, []).append(entry)
+
+    # new settings and lists: YAML anchors can share them with other clients
+    client["authorizationSettings"] = {
+        key: value for key, value in auth.items() if key != "matrix"
+    } | {
+        section: [*(auth.get(section) or ()), *entries]
+        for section, entries in generated.items()
+    }
+    return sum(map(len, generated.values()))
+
+
+def expand_matrices(clients: list[JsonDict]) -> int:
+    return sum(expand_matrix(client) for client in clients)
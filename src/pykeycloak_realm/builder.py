@@ -1,18 +1,27 @@
 #!/usr/bin/env python3
 
-import json
+from __future__ import annotations
+
 import logging
+from collections.abc import Mapping, Sequence
 from pathlib import Path
-from typing import Any
-
-import yaml
+from typing import TYPE_CHECKING, Any
 
 from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.policy_encoding import DEFAULT_POLICY_ENCODING, PolicyEncoder
+
+if TYPE_CHECKING:
+    from pykeycloak_realm.metrics import RealmMetrics
+    from pykeycloak_realm.realm_refs import Resolver
 
 logger = logging.getLogger(__name__)
 
 JsonDict = dict[str, Any]
 
+# yaml (via the template loader), json, the writer and the modules of the
+# build stages are imported where they are used so that importing the
+# builder (and the CLI on top of it) stays cheap.
+
 
 def template_load(
     template_name: str,
@@ -30,139 +39,353 @@ def template_load(
     if not file_path.is_file():
         raise FileNotFoundError(f"Preset file does not exist: {file_path}")
 
+    from pykeycloak_realm.loader import load_template
+
     with file_path.open(encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+        return load_template(f) or {}
 
 
 def write_to_realm_import_file(
     realm_data: JsonDict,
     target_file: Path,
     overwrite: bool = False,
-) -> None:
-    if target_file.exists() and not overwrite:
-        raise FileExistsError(f"{target_file} already exists")
+    compression: str = "none",
+) -> Path:
+    from pykeycloak_realm.artifacts import (
+        artifact_path,
+        artifact_variants,
+        open_artifact_writer,
+    )
+    from pykeycloak_realm.fingerprint import (
+        dump_realm,
+        fingerprint_path,
+        write_fingerprint,
+    )
+
+    artifact = artifact_path(target_file, compression)
+    existing = [path for path in artifact_variants(target_file) if path.exists()]
+    if existing and not overwrite:
+        raise FileExistsError(f"{existing[0]} already exists")
 
     try:
-        target_file.write_text(
-            json.dumps(realm_data, indent=2, ensure_ascii=False),
-            encoding="utf-8",
-        )
-        logger.info("Export completed: %s", target_file)
+        # an old sidecar must not outlive a failed write
+        for path in {artifact, *existing}:
+            fingerprint_path(path).unlink(missing_ok=True)
+
+        with open_artifact_writer(artifact, compression) as f:
+            fingerprint = dump_realm(realm_data, f.write)
+
+        # the hashes are of the JSON, the size and mtime guard the file on disk
+        stat = artifact.stat()
+        fingerprint["size"] = stat.st_size
+        fingerprint["mtime_ns"] = stat.st_mtime_ns
+        write_fingerprint(artifact, fingerprint)
+
+        # keep a single variant so readers cannot pick up an outdated one
+        for path in existing:
+            if path != artifact:
+                path.unlink()
+
+        logger.info("Export completed: %s (sha256 %s)", artifact, fingerprint["realm"])
     except OSError:
-        logger.exception("Error writing JSON file %s", target_file)
+        logger.exception("Error writing JSON file %s", artifact)
         raise
 
+    return artifact
+
 
-def deep_replace(value: Any, replacements: dict[str, str]) -> Any:
-    match value:
-        case str():
-            return replacements.get(value, value)
+def replace_counted(value: Any, replacements: Mapping[str, str]) -> tuple[Any, int]:
+    # the replaced value and how many strings (values and keys) were replaced
+    from pykeycloak_realm.model import SlotModel
 
-        case list():
-            return [deep_replace(v, replacements) for v in value]
+    get = replacements.get
+    replaced = 0
 
-        case dict():
-            return {
-                replacements.get(k, k): deep_replace(v, replacements)
-                for k, v in value.items()
-            }
+    def walk(value: Any) -> Any:
+        nonlocal replaced
+        match value:
+            case str():
+                new = get(value)
+                if new is None:
+                    return value
+                replaced += 1
+                return new
 
-        case _:
-            return value
+            case list():
+                return [walk(v) for v in value]
+
+            case dict():
+                return {walk(k): walk(v) for k, v in value.items()}
+
+            case SlotModel():
+                return type(value).from_dict(
+                    {walk(k): walk(v) for k, v in value.items()}
+                )
+
+            case _:
+                return value
+
+    return walk(value), replaced
+
+
+def deep_replace(value: Any, replacements: Mapping[str, str]) -> Any:
+    return replace_counted(value, replacements)[0]
+
+
+# records per chunk when the clients and users are transformed in workers
+DEFAULT_TRANSFORM_CHUNK_SIZE = 2000
+
+
+def env_client_secrets(envs: JsonDict) -> dict[str, JsonDict]:
+    # clientId -> the id/secret its env entry sets
+    return {
+        client["clientId"]: {k: client[k] for k in ("id", "secret") if k in client}
+        for client in envs.get("clients", [])
+        if client.get("clientId")
+    }
+
+
+def inject_client_secrets(
+    clients: list[JsonDict], secrets: dict[str, JsonDict]
+) -> list[JsonDict]:
+    return [
+        (
+            client | secrets[client["clientId"]]
+            if client.get("clientId") in secrets
+            else client
+        )
+        for client in clients
+    ]
+
+
+def alias_replacements(envs: JsonDict) -> dict[str, str]:
+    return {
+        f"${c['cid_alias']}": c["cid"]
+        for c in envs.get("clients", [])
+        if c.get("cid_alias") and c.get("cid")
+    }
 
 
 class RealmTransformer:
-    def __init__(self, template: JsonDict):
+    def __init__(
+        self,
+        template: JsonDict,
+        policy_encoding: Mapping[str, Sequence[str]] = DEFAULT_POLICY_ENCODING,
+        compact_model: bool = False,
+        validate_schema: bool = False,
+        transform_workers: int = 0,
+        transform_chunk_size: int = DEFAULT_TRANSFORM_CHUNK_SIZE,
+        realm_refs: Resolver | None = None,
+        metrics: RealmMetrics | None = None,
+        mask_secrets: bool = False,
+    ):
         self.realm: JsonDict = template.get("realm", {})
         self.envs: JsonDict = template.get("envs", {})
+        self.hierarchy: JsonDict = template.get("hierarchy") or {}
+        self.policy_encoder = PolicyEncoder(policy_encoding)
+        self.compact_model = compact_model
+        self.validate_schema = validate_schema
+        self.transform_workers = transform_workers
+        self.transform_chunk_size = transform_chunk_size
+        self.realm_refs = realm_refs
+        self.mask_secrets = mask_secrets
+        if metrics is None:
+            from pykeycloak_realm.metrics import RealmMetrics
+
+            metrics = RealmMetrics()
+        self.metrics = metrics
 
     def apply(self) -> JsonDict:
-        realm = self._inject_client_secrets(self.realm)
-        realm = self._transform_authorizations(realm)
-        realm = self._replace_aliases(realm)
+        stage = self.metrics.stage
+        with stage("realm_refs"):
+            self._resolve_realm_refs()
+        with stage("secrets"):
+            self._resolve_secret_refs()
+        with stage("hierarchy"):
+            self._expand_hierarchy()
+        with stage("authz_matrix"):
+            self._expand_authz_matrices()
+        if self.compact_model:
+            # users and policies become slotted models for the other stages
+            with stage("compact"):
+                self._compact()
+        if self._worth_chunking():
+            with stage("chunked_transform"):
+                realm = self._transform_chunked(self.realm)
+        else:
+            with stage("client_secrets"):
+                realm = self._inject_client_secrets(self.realm)
+            with stage("policy_encoding"):
+                realm = self._encode_policies(realm)
+            with stage("aliases"):
+                realm = self._replace_aliases(realm)
+        if self.validate_schema:
+            with stage("schema"):
+                self._validate_schema(realm)
+        from pykeycloak_realm.metrics import count_entities
+
+        self.metrics.entities = count_entities(realm)
         return realm
 
-    def _inject_client_secrets(self, realm: JsonDict) -> JsonDict:
-        env_clients_list = self.envs.get("clients", [])
-        # Convert list to dictionary for easier lookup by clientId
-        env_clients = {
-            client.get("clientId"): client
-            for client in env_clients_list
-            if client.get("clientId")
-        }
-
-        clients = [
-            client
-            | {
-                k: env_clients[client["clientId"]][k]
-                for k in ("id", "secret")
-                if client.get("clientId") in env_clients
-                and k in env_clients[client["clientId"]]
-            }
-            for client in realm.get("clients", [])
-        ]
+    @staticmethod
+    def _validate_schema(realm: JsonDict) -> None:
+        # runs on the final realm, so encoded policy configs and replaced
+        # aliases are checked as they will be uploaded
+        from pykeycloak_realm.schema import SchemaValidationError, validate_realm
 
-        return realm | {"clients": clients}
+        errors = validate_realm(realm)
+        if errors:
+            raise SchemaValidationError(errors)
 
-    @staticmethod
-    def _transform_authorizations(realm: JsonDict) -> JsonDict:
-        def transform_client(client: JsonDict) -> JsonDict:
-            auth = client.get("authorizationSettings")
-            if not auth:
-                return client
-
-            policies = [
-                (
-                    policy
-                    if not (
-                        policy.get("name", "").startswith("policy_role__")
-                        and policy.get("config")
-                    )
-                    else policy
-                    | {
-                        "config": policy["config"]
-                        | {"roles": json.dumps(policy["config"].get("roles", []))}
-                    }
-                )
-                for policy in auth.get("policies", [])
-            ]
+    def _resolve_realm_refs(self) -> None:
+        from pykeycloak_realm.realm_refs import resolve_realm_refs
+
+        resolve_realm_refs([self.envs, self.realm], self.realm_refs)
+
+    def _resolve_secret_refs(self) -> None:
+        from pykeycloak_realm.secret_refs import mask_secrets, resolve_secrets
+
+        if self.mask_secrets:
+            mask_secrets([self.envs, self.realm])
+        else:
+            resolve_secrets([self.envs, self.realm])
+
+    def _expand_hierarchy(self) -> None:
+        if self.hierarchy:
+            from pykeycloak_realm.hierarchy import expand_hierarchy
+
+            expand_hierarchy(self.realm, self.hierarchy)
+
+    def _expand_authz_matrices(self) -> None:
+        from pykeycloak_realm.authz_matrix import expand_matrices
 
-            return client | {"authorizationSettings": auth | {"policies": policies}}
+        expand_matrices(self.realm.get("clients", []))
 
-        return realm | {
-            "clients": [transform_client(c) for c in realm.get("clients", [])]
-        }
+    def _compact(self) -> None:
+        from pykeycloak_realm.model import compact_realm
+
+        compact_realm(self.realm)
+
+    def _worth_chunking(self) -> bool:
+        if self.transform_workers <= 1:
+            return False
+        from pykeycloak_realm.chunked import worth_chunking
+
+        return worth_chunking(
+            self.realm, self.transform_workers, self.transform_chunk_size
+        )
+
+    def _transform_chunked(self, realm: JsonDict) -> JsonDict:
+        # the three stages below on chunks of clients and users in worker
+        # processes; same output
+        from pykeycloak_realm.chunked import TransformTables, transform_chunked
+
+        tables = TransformTables(
+            env_client_secrets(self.envs),
+            self.policy_encoder.rules,
+            alias_replacements(self.envs),
+        )
+        return transform_chunked(
+            realm,
+            tables,
+            self.transform_workers,
+            self.transform_chunk_size,
+            metrics=self.metrics,
+        )
+
+    def _inject_client_secrets(self, realm: JsonDict) -> JsonDict:
+        clients = inject_client_secrets(
+            realm.get("clients", []), env_client_secrets(self.envs)
+        )
+        return realm | {"clients": clients}
+
+    def _encode_policies(self, realm: JsonDict) -> JsonDict:
+        # Batch path: encodes the matching policy configs of all clients in
+        # place, reusing the encoded string of repeated values.
+        encoder = self.policy_encoder
+        hits, misses = encoder.hits, encoder.misses
+        encoder.apply(realm.get("clients", []))
+        self.metrics.cache_hits += encoder.hits - hits
+        self.metrics.cache_misses += encoder.misses - misses
+        return realm
 
     def _replace_aliases(self, realm: JsonDict) -> JsonDict:
-        replacements = {
-            f"${c['cid_alias']}": c["cid"]
-            for c in self.envs.get("clients", [])
-            if c.get("cid_alias") and c.get("cid")
-        }
+        replacements = alias_replacements(self.envs)
 
         if not replacements:
             return realm
 
-        return deep_replace(realm, replacements)  # type: ignore[no-any-return]
+        realm, replaced = replace_counted(realm, replacements)
+        self.metrics.aliases_replaced += replaced
+        return realm
 
 
-def create_realm_config_file(
-    template_name: str, config: RealmBuilderConfig
-) -> dict[str, Any]:
-    template = template_load(
-        template_name=template_name,
-        template_suffix=config.template_file_suffix,
-        templates_path=config.template_dir_path,
+def realm_transformer(
+    template: JsonDict,
+    config: RealmBuilderConfig,
+    realm_refs: Resolver | None = None,
+    metrics: RealmMetrics | None = None,
+    mask_secrets: bool = False,
+) -> RealmTransformer:
+    # the transformer of every build (export, build, deploy, snapshot)
+    return RealmTransformer(
+        template,
+        policy_encoding=config.policy_encoding_rules,
+        compact_model=config.compact_model,
+        validate_schema=config.validate_schema,
+        transform_workers=config.transform_workers,
+        transform_chunk_size=config.transform_chunk_size,
+        realm_refs=realm_refs,
+        metrics=metrics,
+        mask_secrets=mask_secrets,
     )
 
-    return RealmTransformer(template).apply()
 
+def create_realm_config_file(
+    template_name: str,
+    config: RealmBuilderConfig,
+    metrics: RealmMetrics | None = None,
+) -> dict[str, Any]:
+    from pykeycloak_realm.metrics import RealmMetrics
+    from pykeycloak_realm.realm_refs import ExportValues
+
+    metrics = metrics if metrics is not None else RealmMetrics()
+    with metrics.stage("load"):
+        template = template_load(
+            template_name=template_name,
+            template_suffix=config.template_file_suffix,
+            templates_path=config.template_dir_path,
+        )
 
-def export(from_template: str, to_file: str, config: RealmBuilderConfig) -> None:
-    realm_data = create_realm_config_file(template_name=from_template, config=config)
+    return realm_transformer(
+        template,
+        config,
+        # values of other realms from their exports
+        realm_refs=ExportValues(
+            config.template_export_dir_path, config.realm_file_suffix
+        ),
+        metrics=metrics,
+    ).apply()
+
+
+def export(
+    from_template: str,
+    to_file: str,
+    config: RealmBuilderConfig,
+    metrics: RealmMetrics | None = None,
+) -> None:
+    from pykeycloak_realm.metrics import RealmMetrics
 
-    write_to_realm_import_file(
-        realm_data=realm_data,
-        target_file=config.get_realm_filename(to_file),
-        overwrite=config.overwrite_existing_realm,
+    metrics = metrics if metrics is not None else RealmMetrics()
+    realm_data = create_realm_config_file(
+        template_name=from_template, config=config, metrics=metrics
     )
+
+    with metrics.stage("write"):
+        artifact = write_to_realm_import_file(
+            realm_data=realm_data,
+            target_file=config.get_realm_filename(to_file),
+            overwrite=config.overwrite_existing_realm,
+            compression=config.export_compression,
+        )
+    metrics.finish(artifact)
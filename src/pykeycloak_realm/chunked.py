@@ -0,0 +1,131 @@
+import os
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from pykeycloak_realm.builder import (
+    DEFAULT_TRANSFORM_CHUNK_SIZE,
+    inject_client_secrets,
+    replace_counted,
+)
+from pykeycloak_realm.metrics import RealmMetrics
+from pykeycloak_realm.policy_encoding import PolicyEncoder
+
+JsonDict = dict[str, Any]
+
+# Chunked transform of one large realm: the clients and users are cut into
+# chunks of `chunk_size` records and the per-record stages (client secret
+# injection, policy encoding, alias replacement) run on them in worker
+# processes. The tables every chunk needs are sent once per worker through
+# the pool initializer, the chunks themselves are pickled sub-lists, and the
+# results are put back in order, so the output is the same as the serial
+# transform's. The rest of the realm is replaced in the parent.
+#
+# Each chunk is pickled on the way to a worker and on the way back, so this
+# only pays off for realms with many thousands of records and several CPUs;
+# see tests/benchmarks/chunked_bench_test.py for the break-even size.
+
+SECTIONS = ("clients", "users")
+
+
+@dataclass(frozen=True, slots=True)
+class TransformTables:
+    secrets: dict[str, JsonDict]  # clientId -> id/secret from the envs
+    policy_encoding: dict[str, tuple[str, ...]]
+    replacements: dict[str, str]  # "$alias" -> client id
+
+
+# set in each worker by _init_worker
+_tables: TransformTables | None = None
+_encoder: PolicyEncoder | None = None
+
+
+def _init_worker(tables: TransformTables) -> None:
+    global _tables, _encoder
+    _tables = tables
+    _encoder = PolicyEncoder(tables.policy_encoding)
+
+
+def transform_clients(
+    clients: list[JsonDict], tables: TransformTables, encoder: PolicyEncoder
+) -> tuple[list[JsonDict], int]:
+    clients = inject_client_secrets(clients, tables.secrets)
+    encoder.apply(clients)
+    return replace_records(clients, tables)
+
+
+def replace_records(
+    records: list[Any], tables: TransformTables
+) -> tuple[list[Any], int]:
+    # the records and how many aliases were replaced in them
+    if not tables.replacements:
+        return records, 0
+    return replace_counted(records, tables.replacements)
+
+
+def _transform_chunk(
+    section: str, chunk: list[Any]
+) -> tuple[list[Any], tuple[int, int, int]]:
+    # the records and (aliases replaced, cache hits, cache misses)
+    if _tables is None or _encoder is None:
+        raise RuntimeError("Transform worker was not initialized")
+    hits, misses = _encoder.hits, _encoder.misses
+    if section == "clients":
+        records, replaced = transform_clients(chunk, _tables, _encoder)
+    else:
+        records, replaced = replace_records(chunk, _tables)
+    return records, (replaced, _encoder.hits - hits, _encoder.misses - misses)
+
+
+def chunks(records: Sequence[Any], size: int) -> list[list[Any]]:
+    return [list(records[i : i + size]) for i in range(0, len(records), size)]
+
+
+def worth_chunking(realm: Mapping[str, Any], workers: int, chunk_size: int) -> bool:
+    # more than one chunk for more than one worker
+    records = sum(len(realm.get(section) or ()) for section in SECTIONS)
+    return workers > 1 and chunk_size > 0 and records > chunk_size
+
+
+def transform_chunked(
+    realm: JsonDict,
+    tables: TransformTables,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_TRANSFORM_CHUNK_SIZE,
+    metrics: RealmMetrics | None = None,
+) -> JsonDict:
+    # like the serial transform, a realm without clients gets an empty list
+    realm = realm if "clients" in realm else realm | {"clients": []}
+    jobs = [
+        (section, chunk)
+        for section in SECTIONS
+        for chunk in chunks(realm.get(section) or [], chunk_size)
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers or os.cpu_count() or 1, len(jobs) or 1),
+        initializer=_init_worker,
+        initargs=(tables,),
+    ) as pool:
+        results = pool.map(_transform_chunk, *zip(*jobs, strict=True)) if jobs else []
+        sections: dict[str, list[Any]] = {section: [] for section in SECTIONS}
+        counts = [0, 0, 0]
+        for (section, _), (records, chunk_counts) in zip(jobs, results, strict=True):
+            sections[section].extend(records)
+            counts = [a + b for a, b in zip(counts, chunk_counts, strict=True)]
+
+    rest = {k: v for k, v in realm.items() if not (k in SECTIONS and v)}
+    rest, replaced = replace_counted(rest, tables.replacements)
+    if metrics is not None:
+        metrics.aliases_replaced += counts[0] + replaced
+        metrics.cache_hits += counts[1]
+        metrics.cache_misses += counts[2]
+
+    replacements = tables.replacements
+    return {
+        replacements.get(k, k): (
+            sections[k] if k in SECTIONS and v else rest[replacements.get(k, k)]
+        )
+        for k, v in realm.items()
+    }
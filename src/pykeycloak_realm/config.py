@@ -18,6 +18,13 @@ class RealmBuilderConfig:
         )
     )
 
+    # golden exports the snapshot command compares builds with
+    _golden_dir_path: str | PathLike[str] = field(
+        default_factory=lambda: os.getenv(
+            "KEYCLOAK_BUILDER_GOLDEN_PATH", "./data/realms/golden"
+        )
+    )
+
     template_file_suffix: str = field(
         default_factory=lambda: os.getenv(
             "KEYCLOAK_BUILDER_TEMPLATES_FILE_SUFFIX", ".realm.yml"
@@ -35,6 +42,50 @@ class RealmBuilderConfig:
         == "True"
     )
 
+    # prefix=field[,field];prefix=field, e.g. "policy_role__=roles;policy_group__=groups"
+    policy_encoding: str = field(
+        default_factory=lambda: os.getenv(
+            "KEYCLOAK_BUILDER_POLICY_ENCODING", "policy_role__=roles"
+        )
+    )
+
+    # keep users and authorization policies in slotted models while building
+    compact_model: bool = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_BUILDER_COMPACT_MODEL", "False")
+        == "True"
+    )
+
+    # check clients, roles, authorization settings and users against the schema
+    validate_schema: bool = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_BUILDER_VALIDATE_SCHEMA", "False")
+        == "True"
+    )
+
+    # worker processes for the clients and users of one large realm; 0 or 1
+    # transforms them in the build process
+    transform_workers: int = field(
+        default_factory=lambda: int(
+            os.getenv("KEYCLOAK_BUILDER_TRANSFORM_WORKERS", "0")
+        )
+    )
+
+    # clients or users per chunk sent to a transform worker
+    transform_chunk_size: int = field(
+        default_factory=lambda: int(
+            os.getenv("KEYCLOAK_BUILDER_TRANSFORM_CHUNK_SIZE", "2000")
+        )
+    )
+
+    # none, gzip or zstd (zstd needs Python 3.14)
+    export_compression: str = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_BUILDER_EXPORT_COMPRESSION", "none")
+    )
+
+    # build metrics go to <prefix>.json and <prefix>.prom; empty: not written
+    metrics_path: str = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_BUILDER_METRICS_PATH", "")
+    )
+
     def get_realm_filename(self, filename: str) -> Path:
         return (
             Path(self._template_export_dir_path) / f"{filename}{self.realm_file_suffix}"
@@ -48,6 +99,20 @@ class RealmBuilderConfig:
     def template_dir_path(self) -> str:
         return str(Path(self._template_dir_path).resolve())
 
+    @property
+    def golden_dir_path(self) -> str:
+        return str(Path(self._golden_dir_path).resolve())
+
+    @property
+    def policy_encoding_rules(self) -> dict[str, tuple[str, ...]]:
+        rules = {}
+        for rule in filter(None, self.policy_encoding.split(";")):
+            prefix, sep, fields = rule.partition("=")
+            if not sep or not prefix.strip() or not fields.strip():
+                raise ValueError(f"Invalid policy encoding rule: {rule!r}")
+            rules[prefix.strip()] = tuple(f.strip() for f in fields.split(","))
+        return rules
+
     def __post_init__(self) -> None:
         missing = []
 
@@ -67,3 +132,27 @@ class RealmBuilderConfig:
             raise ValueError(
                 f"RealmBuilderConfig missing required fields: {', '.join(missing)}"
             )
+
+
+@dataclass
+class KeycloakAdminConfig:
+    # admin REST API as seen from the host (docker compose publishes 8089)
+    url: str = field(
+        default_factory=lambda: os.getenv(
+            "KEYCLOAK_ADMIN_URL",
+            f"http://127.0.0.1:{os.getenv('KEYCLOAK_INSTANCE_PORT', '8089')}",
+        )
+    )
+
+    username: str = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_INSTANCE_USERNAME", "admin")
+    )
+
+    password: str = field(
+        default_factory=lambda: os.getenv("KEYCLOAK_INSTANCE_PASSWORD", "admin"),
+        repr=False,
+    )
+
+    timeout: float = field(
+        default_factory=lambda: float(os.getenv("KEYCLOAK_ADMIN_TIMEOUT", "60"))
+    )
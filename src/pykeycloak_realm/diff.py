@@ -0,0 +1,119 @@
+import json
+import os
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from pykeycloak_realm.export_reader import ExportReader
+from pykeycloak_realm.fingerprint import changed_sections, load_fingerprint
+
+# Lists of records are matched by the first of these keys that is a unique
+# string in both lists, so a reordered or inserted client shows up as one
+# change instead of a shifted tail.
+RECORD_KEYS = ("clientId", "username", "alias", "name", "id")
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    kind: str  # "added", "removed" or "changed"
+    path: str
+    old: Any = None
+    new: Any = None
+
+    def __str__(self) -> str:
+        match self.kind:
+            case "added":
+                return f"+ {self.path}: {_short(self.new)}"
+            case "removed":
+                return f"- {self.path}: {_short(self.old)}"
+            case _:
+                return f"~ {self.path}: {_short(self.old)} -> {_short(self.new)}"
+
+
+def _short(value: Any, limit: int = 80) -> str:
+    text = json.dumps(value, ensure_ascii=False)
+    return text if len(text) <= limit else f"{text[: limit - 3]}..."
+
+
+def record_key(old: list[Any], new: list[Any]) -> str | None:
+    if not all(isinstance(item, dict) for item in (*old, *new)):
+        return None
+
+    for key in RECORD_KEYS:
+        old_names = [item.get(key) for item in old]
+        new_names = [item.get(key) for item in new]
+        if (
+            all(isinstance(name, str) for name in (*old_names, *new_names))
+            and len(set(old_names)) == len(old_names)
+            and len(set(new_names)) == len(new_names)
+        ):
+            return key
+    return None
+
+
+def diff_values(old: Any, new: Any, path: str = "") -> Iterator[Change]:
+    if old == new:
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in dict.fromkeys([*old, *new]):
+            child = f"{path}.{key}" if path else key
+            if key not in new:
+                yield Change("removed", child, old=old[key])
+            elif key not in old:
+                yield Change("added", child, new=new[key])
+            else:
+                yield from diff_values(old[key], new[key], child)
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        key = record_key(old, new)
+        if key is None:
+            for i in range(max(len(old), len(new))):
+                child = f"{path}[{i}]"
+                if i >= len(new):
+                    yield Change("removed", child, old=old[i])
+                elif i >= len(old):
+                    yield Change("added", child, new=new[i])
+                else:
+                    yield from diff_values(old[i], new[i], child)
+            return
+
+        old_records = {item[key]: item for item in old}
+        new_records = {item[key]: item for item in new}
+        for name in dict.fromkeys([*old_records, *new_records]):
+            child = f"{path}[{key}={name}]"
+            if name not in new_records:
+                yield Change("removed", child, old=old_records[name])
+            elif name not in old_records:
+                yield Change("added", child, new=new_records[name])
+            else:
+                yield from diff_values(old_records[name], new_records[name], child)
+        return
+
+    yield Change("changed", path, old=old, new=new)
+
+
+def diff_exports(
+    old_path: str | os.PathLike[str], new_path: str | os.PathLike[str]
+) -> tuple[dict[str, str], list[Change]]:
+    # Sections with equal fingerprints are skipped without being decoded;
+    # only the changed ones are read (through their offsets) and compared.
+    sections = changed_sections(load_fingerprint(old_path), load_fingerprint(new_path))
+    if not sections:
+        return sections, []
+
+    changes: list[Change] = []
+    with ExportReader(old_path) as old, ExportReader(new_path) as new:
+        for name, kind in sections.items():
+            match kind:
+                case "added":
+                    changes.append(Change(kind, name, new=new.section(name)))
+                case "removed":
+                    changes.append(Change(kind, name, old=old.section(name)))
+                case _:
+                    changes.extend(
+                        diff_values(old.section(name), new.section(name), name)
+                    )
+
+    return sections, changes
@@ -0,0 +1,525 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+import mmap
+import os
+import re
+from array import array
+from collections.abc import Callable, Iterator
+from json.decoder import scanstring  # type: ignore[attr-defined]
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+
+from pykeycloak_realm.artifacts import detect_compression, read_artifact
+
+logger = logging.getLogger(__name__)
+
+JsonDict = dict[str, Any]
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index.json"
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# key of the identifying field of each record type
+_NAME_KEYS = {
+    "clients": "clientId",
+    "users": "username",
+    "groups": "name",
+    "roles": "name",
+    "policies": "name",
+}
+
+
+class Table:
+    # Byte spans and names of the records of one array, stored column-wise.
+    # `owners` holds the position of the enclosing client (policies only,
+    # -1 otherwise). A table loaded from a cached index stays packed until
+    # a column is needed: single lookups search the joined names and decode
+    # just the 32 base64 characters around the wanted offsets.
+
+    __slots__ = ("_columns", "_names", "_packed", "_joined", "_positions")
+
+    COLUMNS = ("starts", "ends", "owners")
+
+    def __init__(self) -> None:
+        self._columns: dict[str, array[int]] = {c: array("q") for c in self.COLUMNS}
+        self._names: list[str] | None = []
+        self._packed: JsonDict = {}
+        self._joined = ""
+        self._positions: dict[str, int] | None = None
+
+    def __len__(self) -> int:
+        if self._names is None:
+            return int(self._packed["count"])
+        return len(self._names)
+
+    @property
+    def starts(self) -> array[int]:
+        return self._column("starts")
+
+    @property
+    def ends(self) -> array[int]:
+        return self._column("ends")
+
+    @property
+    def owners(self) -> array[int]:
+        return self._column("owners")
+
+    @property
+    def names(self) -> list[str]:
+        if self._names is None:
+            self._names = self._packed["names"].split("\0") if len(self) else []
+        return self._names
+
+    def append(self, start: int, end: int, name: Any, owner: int = -1) -> None:
+        self.starts.append(start)
+        self.ends.append(end)
+        self.owners.append(owner)
+        self.names.append(name if isinstance(name, str) else "")
+
+    def find(self, name: str) -> int | None:
+        if not name or "\0" in name:
+            return None
+        if self._names is None and self._positions is None:
+            # first lookup on a packed table
+            self._positions = {}
+            return next(self._find_packed(name), None)
+        if not self._positions:
+            self._positions = {}
+            for position, record_name in enumerate(self.names):
+                self._positions.setdefault(record_name, position)
+        return self._positions.get(name)
+
+    def find_all(self, name: str) -> list[int]:
+        if self._names is None:
+            return list(self._find_packed(name))
+        return [i for i, record_name in enumerate(self.names) if record_name == name]
+
+    def _find_packed(self, name: str) -> Iterator[int]:
+        # positions are counted by the separators in front of each match
+        if not self._joined:
+            self._joined = "\0" + self._packed["names"] + "\0"
+        joined = self._joined
+        needle = f"\0{name}\0"
+        position = offset = 0
+        while (found := joined.find(needle, offset)) != -1:
+            position += joined.count("\0", offset, found)
+            yield position
+            offset = found + 1
+            position += 1
+
+    def span(self, position: int) -> tuple[int, int]:
+        return self.item("starts", position), self.item("ends", position)
+
+    def item(self, column: str, position: int) -> int:
+        if column in self._columns or not self._packed:
+            return self._column(column)[position]
+        # three 8 byte items per 32 base64 characters
+        group, index = divmod(position, 3)
+        chunk = array("q")
+        chunk.frombytes(
+            base64.b64decode(self._packed[column][group * 32 : group * 32 + 32])
+        )
+        return chunk[index]
+
+    def _column(self, column: str) -> array[int]:
+        if column not in self._columns:
+            values = array("q")
+            values.frombytes(base64.b64decode(self._packed[column]))
+            self._columns[column] = values
+        return self._columns[column]
+
+    def pack(self) -> JsonDict:
+        packed: JsonDict = {"count": len(self), "names": "\0".join(self.names)}
+        for column in self.COLUMNS:
+            packed[column] = base64.b64encode(self._column(column).tobytes()).decode(
+                "ascii"
+            )
+        return packed
+
+    @classmethod
+    def unpack(cls, packed: JsonDict) -> Self:
+        table = cls()
+        table._columns = {}
+        table._names = None
+        table._packed = packed
+        return table
+
+
+class _Indexer:
+    # Walks only the structure the index needs (the top-level object, the
+    # record arrays and the members of each client); every other value is
+    # handed to the C scanner of the json module and dropped.
+
+    def __init__(self, text: str):
+        self.text = text
+        self.scan_once = json.JSONDecoder().scan_once  # type: ignore[attr-defined]
+        self.ascii = text.isascii()
+        self._last = (0, 0)
+        self.sections: dict[str, list[int]] = {}
+        self.tables: dict[str, Table] = {
+            name: Table()
+            for name in ("clients", "users", "groups", "roles", "policies")
+        }
+
+    def byte_offset(self, i: int) -> int:
+        if self.ascii:
+            return i
+        last_char, last_byte = self._last
+        if i < last_char:
+            last_char, last_byte = 0, 0
+        offset = last_byte + len(self.text[last_char:i].encode("utf-8"))
+        self._last = (i, offset)
+        return offset
+
+    def ws(self, i: int) -> int:
+        return _WHITESPACE.match(self.text, i).end()  # type: ignore[union-attr]
+
+    def value(self, i: int) -> tuple[Any, int]:
+        try:
+            return self.scan_once(self.text, i)  # type: ignore[no-any-return]
+        except StopIteration as e:
+            raise ValueError(f"Invalid realm export at char {i}") from e
+
+    def members(self, i: int, visit: Callable[[str, int], int]) -> int:
+        # visit(key, value_start) returns the end of the value
+        text = self.text
+        i = self.ws(i)
+        if text[i : i + 1] != "{":
+            return self.value(i)[1]
+        i = self.ws(i + 1)
+        if text[i : i + 1] == "}":
+            return i + 1
+
+        while True:
+            if text[i : i + 1] != '"':
+                raise ValueError(f"Invalid realm export at char {i}")
+            key, i = scanstring(text, i + 1)
+            i = self.ws(i)
+            if text[i : i + 1] != ":":
+                raise ValueError(f"Invalid realm export at char {i}")
+            i = visit(key, self.ws(i + 1))
+            i = self.ws(i)
+            if text[i : i + 1] == ",":
+                i = self.ws(i + 1)
+            elif text[i : i + 1] == "}":
+                return i + 1
+            else:
+                raise ValueError(f"Invalid realm export at char {i}")
+
+    def items(self, i: int, visit: Callable[[int], int]) -> int:
+        text = self.text
+        if text[i : i + 1] != "[":
+            return self.value(i)[1]
+        i = self.ws(i + 1)
+        if text[i : i + 1] == "]":
+            return i + 1
+
+        while True:
+            i = self.ws(visit(i))
+            if text[i : i + 1] == ",":
+                i = self.ws(i + 1)
+            elif text[i : i + 1] == "]":
+                return i + 1
+            else:
+                raise ValueError(f"Invalid realm export at char {i}")
+
+    def records(self, kind: str, table: Table, owner: int = -1) -> Callable[[int], int]:
+        name_key = _NAME_KEYS[kind]
+
+        def visit(i: int) -> int:
+            record, end = self.value(i)
+            name = record.get(name_key) if isinstance(record, dict) else None
+            table.append(self.byte_offset(i), self.byte_offset(end), name, owner)
+            return end
+
+        return visit
+
+    def client(self, i: int) -> int:
+        start = self.byte_offset(i)
+        found: JsonDict = {}
+        clients = self.tables["clients"]
+        policies = self.records("policies", self.tables["policies"], len(clients))
+
+        def visit_authorization(key: str, j: int) -> int:
+            if key == "policies":
+                return self.items(j, policies)
+            return self.value(j)[1]
+
+        def visit(key: str, j: int) -> int:
+            if key == "authorizationSettings":
+                return self.members(j, visit_authorization)
+            value, end = self.value(j)
+            if key == "clientId":
+                found["clientId"] = value
+            return end
+
+        end = self.members(i, visit)
+        clients.append(start, self.byte_offset(end), found.get("clientId"))
+        return end
+
+    def roles(self, i: int) -> int:
+        def visit_client(key: str, j: int) -> int:
+            table = self.tables.setdefault(f"roles/{key}", Table())
+            return self.items(j, self.records("roles", table))
+
+        def visit(key: str, j: int) -> int:
+            if key == "realm":
+                return self.items(j, self.records("roles", self.tables["roles"]))
+            if key == "client":
+                return self.members(j, visit_client)
+            return self.value(j)[1]
+
+        return self.members(i, visit)
+
+    def root(self, key: str, i: int) -> int:
+        start = self.byte_offset(i)
+        match key:
+            case "clients":
+                end = self.items(i, self.client)
+            case "users" | "groups":
+                end = self.items(i, self.records(key, self.tables[key]))
+            case "roles":
+                end = self.roles(i)
+            case _:
+                end = self.value(i)[1]
+        self.sections[key] = [start, self.byte_offset(end)]
+        return end
+
+
+# The index holds the byte span of every top-level section and a Table per
+# record array: `clients`, `users`, `groups`, realm `roles`, the roles of
+# each client (`roles/<clientId>`) and the authorization `policies` of all
+# clients.
+def build_index(buf: Any) -> tuple[dict[str, list[int]], dict[str, Table]]:
+    indexer = _Indexer(bytes(buf).decode("utf-8"))
+    start = indexer.ws(0)
+    if start < len(indexer.text):
+        indexer.members(start, indexer.root)
+    return indexer.sections, indexer.tables
+
+
+class ExportReader:
+    def __init__(self, path: str | os.PathLike[str], use_cache: bool = True):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + INDEX_SUFFIX)
+        self.use_cache = use_cache
+        self._file = self.path.open("rb")
+        stat = os.fstat(self._file.fileno())
+        self._stamp = [stat.st_size, stat.st_mtime_ns]
+        self._buf: Any = b""
+        if stat.st_size:
+            self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            # compressed exports are inflated into memory instead
+            if detect_compression(self._buf[:4]) != "none":
+                self._buf.close()
+                self._buf = read_artifact(self.path)
+        self._sections: dict[str, list[int]] | None = None
+        # tables of a cached index are only unpacked once they are queried
+        self._packed: dict[str, JsonDict] = {}
+        self._tables: dict[str, Table] = {}
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        self._file.close()
+
+    @property
+    def buffer(self) -> Any:
+        return self._buf
+
+    @property
+    def index(self) -> dict[str, list[int]]:
+        if self._sections is None:
+            self._sections = self._load_index()
+        return self._sections
+
+    def _load_index(self) -> dict[str, list[int]]:
+        if self.use_cache and self.index_path.is_file():
+            try:
+                cached = json.loads(self.index_path.read_text(encoding="utf-8"))
+                if (
+                    cached.get("version") == INDEX_VERSION
+                    and cached.get("stamp") == self._stamp
+                ):
+                    self._packed = cached["tables"]
+                    return cached["sections"]  # type: ignore[no-any-return]
+            except (OSError, ValueError, KeyError):
+                logger.warning("Ignoring unreadable index %s", self.index_path)
+
+        sections, self._tables = build_index(self._buf)
+
+        if self.use_cache:
+            index = {
+                "version": INDEX_VERSION,
+                "stamp": self._stamp,
+                "sections": sections,
+                "tables": {name: t.pack() for name, t in self._tables.items()},
+            }
+            tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+            try:
+                tmp_path.write_text(json.dumps(index), encoding="utf-8")
+                tmp_path.replace(self.index_path)
+            except OSError:
+                logger.warning("Could not cache index at %s", self.index_path)
+
+        return sections
+
+    def table(self, name: str) -> Table:
+        if self._sections is None:
+            self._sections = self._load_index()
+        if name not in self._tables:
+            packed = self._packed.get(name)
+            self._tables[name] = Table() if packed is None else Table.unpack(packed)
+        return self._tables[name]
+
+    def table_names(self) -> list[str]:
+        if self._sections is None:
+            self._sections = self._load_index()
+        return list(dict.fromkeys([*self._tables, *self._packed]))
+
+    def _decode(self, start: int, end: int) -> Any:
+        return json.loads(self._buf[start:end])
+
+    def _get(self, table_name: str, name: str) -> Any:
+        table = self.table(table_name)
+        position = table.find(name)
+        return None if position is None else self._decode(*table.span(position))
+
+    def sections(self) -> list[str]:
+        return list(self.index)
+
+    def section(self, name: str) -> Any:
+        span = self.index.get(name)
+        return None if span is None else self._decode(*span)
+
+    def client(self, client_id: str) -> JsonDict | None:
+        return self._get("clients", client_id)  # type: ignore[no-any-return]
+
+    def user(self, username: str) -> JsonDict | None:
+        return self._get("users", username)  # type: ignore[no-any-return]
+
+    def group(self, name: str) -> JsonDict | None:
+        return self._get("groups", name)  # type: ignore[no-any-return]
+
+    def role(self, name: str, client_id: str | None = None) -> JsonDict | None:
+        table_name = "roles" if client_id is None else f"roles/{client_id}"
+        return self._get(table_name, name)  # type: ignore[no-any-return]
+
+    def policy(self, name: str) -> list[tuple[str | None, JsonDict]]:
+        policies = self.table("policies")
+        clients = self.table("clients")
+        found = []
+        for position in policies.find_all(name):
+            owner = policies.item("owners", position)
+            client_id = clients.names[owner] if 0 <= owner < len(clients) else ""
+            found.append((client_id or None, self._decode(*policies.span(position))))
+        return found
+
+    def iter_users(self) -> Iterator[JsonDict]:
+        users = self.table("users")
+        for start, end in zip(users.starts, users.ends, strict=True):
+            yield self._decode(start, end)
+
+    def clients_referencing_role(
+        self, name: str, client_id: str | None = None
+    ) -> list[str]:
+        needles = {name}
+        role = self.role(name, client_id)
+        if role and role.get("id"):
+            needles.add(role["id"])
+
+        # Cheap byte search first, decoding only the candidate clients. The
+        # export is written with ensure_ascii=False; encoded policy configs
+        # inside it are ASCII-escaped.
+        encoded = {json.dumps(n, ensure_ascii=False).encode() for n in needles}
+        escaped = {
+            json.dumps(inner, ensure_ascii=False).encode()[1:-1]
+            for n in needles
+            for inner in (json.dumps(n), json.dumps(n, ensure_ascii=False))
+        }
+        clients = self.table("clients")
+        found = []
+
+        for start, end, client in zip(
+            clients.starts, clients.ends, clients.names, strict=True
+        ):
+            if not any(
+                self._buf.find(needle, start, end) != -1
+                for needle in (*encoded, *escaped)
+            ):
+                continue
+            if _references(self._decode(start, end), needles):
+                found.append(client)
+
+        # the client that defines a client role
+        if client_id is not None and client_id not in found and role is not None:
+            found.append(client_id)
+
+        return found
+
+
+def _references(value: Any, needles: set[str]) -> bool:
+    match value:
+        case str():
+            if value in needles:
+                return True
+            # encoded policy configs, e.g. '[{"id": "..."}]'
+            if value.startswith("["):
+                try:
+                    return _references(json.loads(value), needles)
+                except ValueError:
+                    return False
+            return False
+        case list():
+            return any(_references(v, needles) for v in value)
+        case dict():
+            return any(_references(v, needles) for v in value.values())
+        case _:
+            return False
+
+
+def query(
+    reader: ExportReader, entity: str, name: str | None, client_id: str | None
+) -> Any:
+    if entity == "sections":
+        return reader.sections()
+
+    if name is None:
+        raise ValueError(f"'{entity}' query needs a name")
+
+    match entity:
+        case "section":
+            return reader.section(name)
+        case "client":
+            return reader.client(name)
+        case "role":
+            return reader.role(name, client_id)
+        case "user":
+            return reader.user(name)
+        case "group":
+            return reader.group(name)
+        case "policy":
+            return [
+                {"clientId": cid, "policy": policy}
+                for cid, policy in reader.policy(name)
+            ] or None
+        case "role-refs":
+            return reader.clients_referencing_role(name, client_id)
+        case _:
+            raise ValueError(f"Unknown query: {entity}")
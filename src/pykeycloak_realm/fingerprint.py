@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+
+from pykeycloak_realm.artifacts import open_artifact
+from pykeycloak_realm.export_reader import ExportReader
+from pykeycloak_realm.model import to_json
+
+logger = logging.getLogger(__name__)
+
+JsonDict = dict[str, Any]
+
+FINGERPRINT_VERSION = 1
+FINGERPRINT_SUFFIX = ".fingerprint.json"
+HASH_ALGORITHM = "sha256"
+FILE_FIELDS = ("size", "mtime_ns")
+
+# A section hash covers the bytes of the section value exactly as they are
+# written to the export, so it can be recomputed from any export through
+# the offsets of ExportReader without decoding it. The realm hash covers
+# the whole file.
+
+
+def iter_realm_chunks(realm_data: JsonDict) -> Iterator[tuple[str | None, str]]:
+    # Yields (section, text) pieces whose concatenation is exactly
+    # json.dumps(realm_data, indent=2, ensure_ascii=False); section is None
+    # for the punctuation between the values. The records of a section (and
+    # of the lists in a dict section, e.g. roles) are encoded and yielded
+    # CHUNK_RECORDS at a time, so a large section is never held as text as
+    # a whole. Compact models are written as the dicts they stand for.
+    if not realm_data:
+        yield None, "{}"
+        return
+
+    separator = "{\n  "
+    for key, value in realm_data.items():
+        yield None, f"{separator}{json.dumps(key, ensure_ascii=False)}: "
+        for text in _iter_json(value, "\n  ", SECTION_DEPTH):
+            yield key, text
+        separator = ",\n  "
+    yield None, "\n}"
+
+
+# records of a section, and of the lists in a dict section
+SECTION_DEPTH = 2
+# records encoded at a time; one encoder call per record would cost more
+# than the encoding (the indented encoder is pure Python)
+CHUNK_RECORDS = 500
+
+_encode = json.JSONEncoder(indent=2, ensure_ascii=False, default=to_json).encode
+
+
+def _iter_json(value: Any, newline: str, depth: int) -> Iterator[str]:
+    # json.dumps(value, indent=2) with every line break followed by `newline`
+    # instead; lists are streamed CHUNK_RECORDS items and dicts one key at a
+    # time down to `depth` levels, anything deeper is written whole
+    if depth and value and type(value) is list:
+        opening = "["
+        for start in range(0, len(value), CHUNK_RECORDS):
+            # "[\n  a,\n  b\n]" -> "\n  a,\n  b", indented
+            text = _encode(value[start : start + CHUNK_RECORDS])
+            yield opening + text[1:-2].replace("\n", newline)
+            opening = ","
+        yield newline + "]"
+    elif depth and value and type(value) is dict and all(type(k) is str for k in value):
+        inner = newline + "  "
+        opening = "{" + inner
+        for key, item in value.items():
+            yield f"{opening}{json.dumps(key, ensure_ascii=False)}: "
+            yield from _iter_json(item, inner, depth - 1)
+            opening = "," + inner
+        yield newline + "}"
+    else:
+        yield _encode(value).replace("\n", newline)
+
+
+def dump_realm(realm_data: JsonDict, write: Callable[[bytes], Any]) -> JsonDict:
+    # Serializes the realm through `write` and returns its fingerprint,
+    # hashing every chunk while it is written.
+    realm_hash = hashlib.new(HASH_ALGORITHM)
+    section_hashes: dict[str, Any] = {}
+    size = 0
+
+    for section, text in iter_realm_chunks(realm_data):
+        data = text.encode("utf-8")
+        realm_hash.update(data)
+        if section is not None:
+            section_hash = section_hashes.get(section)
+            if section_hash is None:
+                section_hash = section_hashes[section] = hashlib.new(HASH_ALGORITHM)
+            section_hash.update(data)
+        write(data)
+        size += len(data)
+
+    sections = {name: h.hexdigest() for name, h in section_hashes.items()}
+    return make_fingerprint(realm_hash.hexdigest(), sections, size)
+
+
+def make_fingerprint(
+    realm: str, sections: dict[str, str], size: int, mtime_ns: int = 0
+) -> JsonDict:
+    return {
+        "version": FINGERPRINT_VERSION,
+        "algorithm": HASH_ALGORITHM,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "realm": realm,
+        "sections": sections,
+    }
+
+
+def content_fingerprint(fingerprint: JsonDict) -> JsonDict:
+    # without the size and mtime that guard a file on disk: what identifies
+    # the JSON itself, e.g. for the fingerprint of a deployed realm
+    return {k: v for k, v in fingerprint.items() if k not in FILE_FIELDS}
+
+
+def fingerprint_path(export_path: str | os.PathLike[str]) -> Path:
+    path = Path(export_path)
+    return path.with_name(path.name + FINGERPRINT_SUFFIX)
+
+
+def write_fingerprint(
+    export_path: str | os.PathLike[str], fingerprint: JsonDict
+) -> Path:
+    path = fingerprint_path(export_path)
+    # one member per line, so shell tooling can grep the realm hash
+    path.write_text(json.dumps(fingerprint, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+def read_fingerprint(export_path: str | os.PathLike[str]) -> JsonDict | None:
+    # Guards against an export that was replaced without its sidecar: the
+    # size and mtime are checked first, and an export whose mtime changed
+    # (e.g. by a checkout) is hashed again. A missing or stale sidecar
+    # returns None.
+    path = fingerprint_path(export_path)
+    try:
+        fingerprint = json.loads(path.read_text(encoding="utf-8"))
+        stat = Path(export_path).stat()
+        if (
+            not isinstance(fingerprint, dict)
+            or fingerprint.get("version") != FINGERPRINT_VERSION
+            or fingerprint.get("algorithm") != HASH_ALGORITHM
+            or fingerprint.get("size") != stat.st_size
+            or (
+                fingerprint.get("mtime_ns") != stat.st_mtime_ns
+                and fingerprint.get("realm") != hash_export(export_path)
+            )
+        ):
+            logger.warning("Ignoring stale fingerprint %s", path)
+            return None
+    except (OSError, ValueError):
+        return None
+
+    return fingerprint
+
+
+def hash_export(export_path: str | os.PathLike[str]) -> str:
+    # of the JSON, so compressed exports are inflated while they are read
+    with open_artifact(export_path) as f:
+        return hashlib.file_digest(f, HASH_ALGORITHM).hexdigest()
+
+
+def fingerprint_export(export_path: str | os.PathLike[str]) -> JsonDict:
+    # Recomputes the fingerprint of an existing export from the section
+    # offsets of its index instead of parsing it.
+    with ExportReader(export_path) as reader:
+        buf = reader.buffer
+        sections = {
+            name: hashlib.new(HASH_ALGORITHM, buf[start:end]).hexdigest()
+            for name, (start, end) in reader.index.items()
+        }
+        realm = hashlib.new(HASH_ALGORITHM, buf).hexdigest()
+    stat = Path(export_path).stat()
+    return make_fingerprint(realm, sections, stat.st_size, stat.st_mtime_ns)
+
+
+def load_fingerprint(export_path: str | os.PathLike[str]) -> JsonDict:
+    return read_fingerprint(export_path) or fingerprint_export(export_path)
+
+
+def changed_sections(old: JsonDict, new: JsonDict) -> dict[str, str]:
+    # section -> "added" | "removed" | "changed"; unchanged sections are left out
+    if old["realm"] == new["realm"]:
+        return {}
+
+    old_sections, new_sections = old["sections"], new["sections"]
+    changes = {}
+    for name in dict.fromkeys([*new_sections, *old_sections]):
+        if name not in old_sections:
+            changes[name] = "added"
+        elif name not in new_sections:
+            changes[name] = "removed"
+        elif old_sections[name] != new_sections[name]:
+            changes[name] = "changed"
+    return changes
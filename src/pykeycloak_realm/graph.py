@@ -0,0 +1,384 @@
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from collections.abc import Callable, Collection, Iterable, Mapping, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pykeycloak_realm.artifacts import find_artifact, open_artifact
+from pykeycloak_realm.builder import (
+    realm_transformer,
+    template_load,
+    write_to_realm_import_file,
+)
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.metrics import RealmMetrics
+from pykeycloak_realm.realm_refs import (
+    RealmRef,
+    RealmRefError,
+    find_refs,
+    lookup,
+    parse_ref,
+    resolve_realm_refs,
+)
+from pykeycloak_realm.secret_refs import SecretRef, resolve_secrets
+
+JsonDict = dict[str, Any]
+
+# Builds of realms that reference each other (`!ref`, see realm_refs.py):
+# the references form a graph that is checked for cycles before anything is
+# built. Realms whose dependencies are built run in parallel worker
+# processes; each worker writes its export and sends back only the values
+# other realms reference, which are put into their templates in memory.
+#
+# A realm is only built again when its inputs changed: the template file,
+# the values of its secret and realm references and the options that shape
+# the export. Their digest is kept next to the export
+# (`<export>.inputs.json`) together with the references, so that a template
+# whose file did not change is not even parsed. A change to one realm
+# therefore rebuilds the realms downstream of it only if a value they
+# reference changed.
+
+INPUTS_SUFFIX = ".inputs.json"
+INPUTS_VERSION = 2
+
+
+class CycleError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class BuildResult:
+    template: str
+    status: str  # "built", "unchanged", "failed" or "skipped"
+    seconds: float = 0.0
+    error: str | None = None
+    metrics: RealmMetrics | None = None  # of built realms
+
+
+def find_cycle(deps: Mapping[str, Collection[str]]) -> list[str] | None:
+    # a path that ends where it started, e.g. ["a", "b", "a"]
+    state: dict[str, int] = {}  # 1: on the current path, 2: done
+    for root in sorted(deps):
+        if root in state:
+            continue
+        path = [root]
+        stack = [iter(sorted(deps[root]))]
+        state[root] = 1
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif state.get(node) == 1:
+                return [*path[path.index(node) :], node]
+            elif node not in state and node in deps:
+                state[node] = 1
+                path.append(node)
+                stack.append(iter(sorted(deps[node])))
+    return None
+
+
+def topological_order(deps: Mapping[str, Collection[str]]) -> list[str]:
+    cycle = find_cycle(deps)
+    if cycle is not None:
+        raise CycleError(f"Dependency cycle: {' -> '.join(cycle)}")
+
+    order: list[str] = []
+    done: set[str] = set()
+    remaining = sorted(deps)
+    while remaining:
+        ready = [name for name in remaining if done.issuperset(deps[name])]
+        order.extend(ready)
+        done.update(ready)
+        remaining = [name for name in remaining if name not in done]
+    return order
+
+
+def _reachable(edges: Mapping[str, Collection[str]], names: Iterable[str]) -> set[str]:
+    found: set[str] = set()
+    stack = list(names)
+    while stack:
+        for name in set(edges.get(stack.pop(), ())) - found:
+            found.add(name)
+            stack.append(name)
+    return found
+
+
+def upstream(deps: Mapping[str, Collection[str]], names: Iterable[str]) -> set[str]:
+    # the realms any of `names` reference, directly or not
+    return _reachable(deps, names)
+
+
+def downstream(deps: Mapping[str, Collection[str]], names: Iterable[str]) -> set[str]:
+    # the realms that reference any of `names`, directly or not
+    dependents: dict[str, set[str]] = defaultdict(set)
+    for name, uses in deps.items():
+        for used in uses:
+            dependents[used].add(name)
+    return _reachable(dependents, names)
+
+
+def inputs_path(export: Path) -> Path:
+    return export.with_name(export.name + INPUTS_SUFFIX)
+
+
+@dataclass(slots=True)
+class _Node:
+    source: str  # sha256 of the template file
+    refs: list[RealmRef]
+    secrets: list[SecretRef]
+    template: JsonDict | None = None  # parsed only when needed
+    load_seconds: float = 0.0
+
+
+def inputs_digest(
+    node: _Node,
+    values: Sequence[Any],
+    secrets: Sequence[str],
+    config: RealmBuilderConfig,
+) -> str:
+    # `values` and `secrets` are those of node.refs and node.secrets
+    # every option realm_transformer and the export writer read
+    options = [
+        config.policy_encoding_rules,
+        config.compact_model,
+        config.validate_schema,
+        config.transform_workers,
+        config.transform_chunk_size,
+        config.export_compression,
+    ]
+    data = json.dumps(
+        [node.source, list(values), list(secrets), options],
+        default=repr,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _stored_inputs(export: Path) -> JsonDict:
+    try:
+        data = json.loads(inputs_path(export).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != INPUTS_VERSION:
+        return {}
+    return data
+
+
+def _store_inputs(export: Path, node: _Node, digest: str) -> None:
+    data = {
+        "version": INPUTS_VERSION,
+        "source": node.source,
+        "refs": ["/".join((ref.realm, *ref.path)) for ref in node.refs],
+        "secrets": [[ref.backend, ref.key] for ref in node.secrets],
+        "digest": digest,
+    }
+    inputs_path(export).write_text(json.dumps(data), encoding="utf-8")
+
+
+def _values(realm: Any, refs: Iterable[RealmRef]) -> dict[RealmRef, Any]:
+    # a missing value fails the realm that references it, not this one
+    values: dict[RealmRef, Any] = {}
+    for ref in refs:
+        try:
+            values[ref] = lookup(realm, ref)
+        except RealmRefError as e:
+            values[ref] = e
+    return values
+
+
+# the referenced values of a built realm and its metrics
+NodeOutput = tuple[dict[RealmRef, Any], RealmMetrics]
+
+
+def build_node(
+    name: str, template: JsonDict, wanted: list[RealmRef], config: RealmBuilderConfig
+) -> NodeOutput:
+    # runs in a worker process
+    metrics = RealmMetrics()
+    realm = realm_transformer(template, config, metrics=metrics).apply()
+    with metrics.stage("write"):
+        artifact = write_to_realm_import_file(
+            realm,
+            config.get_realm_filename(name),
+            overwrite=True,
+            compression=config.export_compression,
+        )
+    metrics.finish(artifact)
+    return _values(realm, wanted), metrics
+
+
+def _parse(name: str, config: RealmBuilderConfig) -> tuple[JsonDict, float]:
+    started = time.perf_counter()
+    template = template_load(
+        name, config.template_file_suffix, config.template_dir_path
+    )
+    return template, time.perf_counter() - started
+
+
+def _scan(name: str, config: RealmBuilderConfig) -> _Node:
+    path = Path(config.template_dir_path) / f"{name}{config.template_file_suffix}"
+    source = hashlib.sha256(path.read_bytes()).hexdigest()
+    stored = _stored_inputs(config.get_realm_filename(name))
+    if stored.get("source") == source:
+        return _Node(
+            source,
+            [parse_ref(ref) for ref in stored["refs"]],
+            [SecretRef(backend, key) for backend, key in stored["secrets"]],
+        )
+
+    template, seconds = _parse(name, config)
+    refs = {ref for _, _, ref in find_refs(template)}
+    secrets = {ref for _, _, ref in find_refs(template, SecretRef)}
+    return _Node(
+        source,
+        sorted(refs, key=str),
+        sorted(secrets, key=lambda ref: (ref.backend, ref.key)),
+        template,
+        seconds,
+    )
+
+
+def load_templates(
+    names: Iterable[str], config: RealmBuilderConfig
+) -> dict[str, _Node]:
+    # the templates and, transitively, the ones they reference
+    loaded: dict[str, _Node] = {}
+    stack = list(names)
+    while stack:
+        name = stack.pop()
+        if name in loaded:
+            continue
+        loaded[name] = _scan(name, config)
+        for used in {ref.realm for ref in loaded[name].refs}:
+            template = (
+                Path(config.template_dir_path) / f"{used}{config.template_file_suffix}"
+            )
+            if not template.is_file():
+                raise RealmRefError(f"{name} references {used}, which has no template")
+            stack.append(used)
+    return loaded
+
+
+class _Inline:
+    # runs submitted builds right away, when one process is enough
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future[Any]:
+        future: Future[Any] = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+def build_realms(
+    templates: Sequence[str],
+    config: RealmBuilderConfig,
+    jobs: int | None = None,
+    force: bool = False,
+    available: Collection[str] = (),
+) -> list[BuildResult]:
+    # `templates`, the realms they reference and, among `available`, the
+    # realms that reference them
+    loaded = load_templates([*templates, *available], config)
+    deps = {name: {ref.realm for ref in node.refs} for name, node in loaded.items()}
+    order = topological_order(deps)
+    selected = {*templates, *downstream(deps, templates)}
+    selected |= upstream(deps, selected)
+    order = [name for name in order if name in selected]
+
+    wanted: dict[str, set[RealmRef]] = defaultdict(set)
+    for name in order:
+        for ref in loaded[name].refs:
+            wanted[ref.realm].add(ref)
+
+    outputs: dict[RealmRef, Any] = {}
+    results: dict[str, BuildResult] = {}
+    pending: dict[Future[NodeOutput], tuple[str, str]] = {}
+    secret_values: dict[SecretRef, str] = {}
+
+    def resolve(ref: RealmRef) -> Any:
+        value = outputs[ref]
+        if isinstance(value, RealmRefError):
+            raise value
+        return value
+
+    def start(name: str, pool: Any) -> None:
+        failed = [
+            d for d in sorted(deps[name]) if results[d].status in ("failed", "skipped")
+        ]
+        if failed:
+            results[name] = BuildResult(
+                name, "skipped", error=f"Not built: {', '.join(failed)} failed"
+            )
+            return
+
+        node = loaded[name]
+        export = config.get_realm_filename(name)
+        try:
+            values = [resolve(ref) for ref in node.refs]
+            # secrets count as inputs too; each backend is asked once
+            secrets: list[Any] = list(node.secrets)
+            resolve_secrets(secrets)
+        except (LookupError, OSError) as e:
+            results[name] = BuildResult(name, "failed", error=str(e))
+            return
+        secret_values.update(zip(node.secrets, secrets, strict=True))
+
+        digest = inputs_digest(node, values, secrets, config)
+        if not force and _stored_inputs(export).get("digest") == digest:
+            artifact = find_artifact(export)
+            if artifact.is_file():
+                if wanted[name]:
+                    with open_artifact(artifact) as f:
+                        outputs.update(_values(json.load(f), wanted[name]))
+                results[name] = BuildResult(name, "unchanged")
+                return
+
+        if node.template is None:
+            node.template, node.load_seconds = _parse(name, config)
+        template, node.template = node.template, None
+        resolve_realm_refs(template, resolve)
+        for container, key, ref in find_refs(template, SecretRef):
+            container[key] = secret_values[ref]
+        inputs_path(export).unlink(missing_ok=True)
+        future = pool.submit(
+            build_node, name, template, sorted(wanted[name], key=str), config
+        )
+        pending[future] = (name, digest)
+
+    def collect() -> None:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, digest = pending.pop(future)
+            try:
+                values, metrics = future.result()
+            except Exception as e:
+                results[name] = BuildResult(name, "failed", error=str(e))
+                continue
+            outputs.update(values)
+            _store_inputs(config.get_realm_filename(name), loaded[name], digest)
+            # the template was parsed here, not in the worker
+            metrics.stages = {"load": loaded[name].load_seconds} | metrics.stages
+            results[name] = BuildResult(name, "built", metrics.seconds, metrics=metrics)
+
+    jobs = min(jobs or os.cpu_count() or 1, len(order))
+    executor = (
+        ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext(_Inline())
+    )
+    started: set[str] = set()
+    with executor as pool:
+        while len(results) < len(order):
+            for name in order:
+                if name not in started and all(d in results for d in deps[name]):
+                    started.add(name)
+                    start(name, pool)
+            if pending:
+                collect()
+    return [results[name] for name in order]
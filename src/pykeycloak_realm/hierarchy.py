@@ -0,0 +1,338 @@
+from collections.abc import Iterable
+from typing import Any
+
+JsonDict = dict[str, Any]
+
+# Expands the `hierarchy` section of a template into Keycloak's structures:
+#
+#   hierarchy:
+#     roles:                 # realm role -> roles it includes
+#       otago_admin: [otago_editor]
+#       otago_editor: [otago_viewer]
+#       otago_viewer: []
+#     client_roles:          # clientId -> client role -> roles it includes
+#       $ot_cid:
+#         system_role__otago_admin: [otago_admin]
+#     groups:                # group path -> roles of its members
+#       staff: [otago_viewer]
+#       staff/admins: [otago_admin, $ot_cid/system_role__otago_admin]
+#
+# A role is referenced as `name` (realm role) or `clientId/name` (client role).
+# Roles become `roles.realm` / `roles.client` entries with their composites,
+# group paths become nested `groups[].subGroups`; both are merged into what
+# the realm already declares.
+#
+# Keycloak resolves composites and group inheritance transitively, so a
+# composite that is already included through another composite, and a group
+# role that is inherited from a parent group or included by another of the
+# group's roles, is left out. For that, the transitive closure of every role
+# is computed once, as a bitset over all roles, and reused.
+
+RoleKey = tuple[str | None, str]  # (clientId or None for realm roles, name)
+
+
+class HierarchyError(ValueError):
+    pass
+
+
+def parse_role_ref(ref: str) -> RoleKey:
+    client, sep, name = ref.partition("/")
+    return (client, name) if sep else (None, ref)
+
+
+def format_role_key(key: RoleKey) -> str:
+    client, name = key
+    return name if client is None else f"{client}/{name}"
+
+
+class RoleGraph:
+    def __init__(self) -> None:
+        self.index: dict[RoleKey, int] = {}
+        self.keys: list[RoleKey] = []
+        self.edges: list[list[int]] = []
+        self._closures: list[int] | None = None
+
+    def node(self, key: RoleKey) -> int:
+        i = self.index.get(key)
+        if i is None:
+            i = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            self.edges.append([])
+            self._closures = None
+        return i
+
+    def add(self, parent: RoleKey, child: RoleKey) -> None:
+        self.edges[self.node(parent)].append(self.node(child))
+        self._closures = None
+
+    def closure(self, i: int) -> int:
+        # bit j is set if role j is included in role i, directly or not
+        if self._closures is None:
+            self._closures = self._compute_closures()
+        return self._closures[i]
+
+    def _compute_closures(self) -> list[int]:
+        # Iterative depth-first search; each closure is the union of the
+        # children's closures, so it is computed once per role. A role met
+        # again while still on the stack closes a cycle.
+        closures: list[int | None] = [None] * len(self.keys)
+        on_stack = [False] * len(self.keys)
+
+        for root in range(len(self.keys)):
+            if closures[root] is not None:
+                continue
+            stack = [(root, 0)]
+            on_stack[root] = True
+            while stack:
+                node, pos = stack[-1]
+                children = self.edges[node]
+                if pos < len(children):
+                    stack[-1] = (node, pos + 1)
+                    child = children[pos]
+                    if on_stack[child]:
+                        path = [n for n, _ in stack]
+                        cycle = path[path.index(child) :] + [child]
+                        raise HierarchyError(
+                            "Cycle in role hierarchy: "
+                            + " -> ".join(format_role_key(self.keys[n]) for n in cycle)
+                        )
+                    if closures[child] is None:
+                        stack.append((child, 0))
+                        on_stack[child] = True
+                    continue
+                reach = 0
+                for child in children:
+                    reach |= (1 << child) | closures[child]  # type: ignore[operator]
+                closures[node] = reach
+                on_stack[node] = False
+                stack.pop()
+
+        return closures  # type: ignore[return-value]
+
+    def reduce(self, roles: Iterable[int], inherited: int = 0) -> list[int]:
+        # roles not already reachable from the others or from `inherited`
+        roles = list(dict.fromkeys(roles))
+        reach = [(1 << r) | self.closure(r) for r in roles]
+        before = [inherited]
+        for r in reach[:-1]:
+            before.append(before[-1] | r)
+        kept = []
+        after = 0
+        for i in range(len(roles) - 1, -1, -1):
+            others = before[i] | after
+            if not others >> roles[i] & 1:
+                kept.append(roles[i])
+            after |= reach[i]
+        kept.reverse()
+        return kept
+
+
+def _role_lists(realm: JsonDict) -> Iterable[tuple[str | None, list[JsonDict]]]:
+    roles = realm.get("roles") or {}
+    yield None, roles.get("realm") or []
+    for client, client_roles in (roles.get("client") or {}).items():
+        yield client, client_roles or []
+
+
+def _composites(role_keys: list[RoleKey]) -> JsonDict:
+    realm_roles = [name for client, name in role_keys if client is None]
+    client_roles: dict[str, list[str]] = {}
+    for client, name in role_keys:
+        if client is not None:
+            client_roles.setdefault(client, []).append(name)
+    composites: JsonDict = {}
+    if realm_roles:
+        composites["realm"] = realm_roles
+    if client_roles:
+        composites["client"] = client_roles
+    return composites
+
+
+def _group_roles(role_keys: list[RoleKey]) -> JsonDict:
+    composites = _composites(role_keys)
+    mapping: JsonDict = {}
+    if "realm" in composites:
+        mapping["realmRoles"] = composites["realm"]
+    if "client" in composites:
+        mapping["clientRoles"] = composites["client"]
+    return mapping
+
+
+def _merge_group_roles(group: JsonDict, mapping: JsonDict) -> None:
+    # after the roles the group already has, without duplicates; new lists,
+    # as the existing ones may be shared through YAML aliases
+    if "realmRoles" in mapping:
+        existing = group.get("realmRoles") or []
+        group["realmRoles"] = list(dict.fromkeys([*existing, *mapping["realmRoles"]]))
+    if "clientRoles" in mapping:
+        client_roles = dict(group.get("clientRoles") or {})
+        for client, roles in mapping["clientRoles"].items():
+            existing = client_roles.get(client) or []
+            client_roles[client] = list(dict.fromkeys([*existing, *roles]))
+        group["clientRoles"] = client_roles
+
+
+def expand_hierarchy(realm: JsonDict, declaration: JsonDict) -> JsonDict:
+    graph = RoleGraph()
+    declared: dict[RoleKey, list[RoleKey]] = {}
+    existing: set[RoleKey] = set()
+    unknown: list[str] = []
+
+    for name, refs in (declaration.get("roles") or {}).items():
+        declared[(None, name)] = [parse_role_ref(r) for r in refs or ()]
+    for client, roles in (declaration.get("client_roles") or {}).items():
+        for name, refs in (roles or {}).items():
+            declared[(client, name)] = [parse_role_ref(r) for r in refs or ()]
+
+    # composites the realm already has are part of the closure, unless the
+    # role is declared again
+    for client, roles in _role_lists(realm):
+        for role in roles:
+            key = (client, role["name"])
+            existing.add(key)
+            graph.node(key)
+            if key in declared:
+                continue
+            composites = role.get("composites") or {}
+            for name in composites.get("realm") or ():
+                graph.add(key, (None, name))
+            for cid, names in (composites.get("client") or {}).items():
+                for name in names:
+                    graph.add(key, (cid, name))
+
+    known = existing | set(declared)
+    for key, refs in declared.items():
+        graph.node(key)
+        for ref in refs:
+            if ref not in known:
+                unknown.append(f"{format_role_key(ref)} (in {format_role_key(key)})")
+            graph.add(key, ref)
+
+    groups = {
+        path.strip("/"): [parse_role_ref(r) for r in refs or ()]
+        for path, refs in (declaration.get("groups") or {}).items()
+    }
+    for path, refs in groups.items():
+        unknown += [
+            f"{format_role_key(ref)} (in group {path})"
+            for ref in refs
+            if ref not in known
+        ]
+
+    if unknown:
+        raise HierarchyError("Unknown roles in hierarchy: " + ", ".join(unknown))
+
+    _expand_roles(realm, graph, declared)
+    if groups:
+        _expand_groups(realm, graph, groups)
+    return realm
+
+
+def _expand_roles(
+    realm: JsonDict, graph: RoleGraph, declared: dict[RoleKey, list[RoleKey]]
+) -> None:
+    if not declared:
+        return
+
+    # new role dicts and lists: YAML anchors can share them with other roles
+    expanded: dict[RoleKey, JsonDict] = {}
+    for key, refs in declared.items():
+        client, name = key
+        role: JsonDict = {"name": name}
+        if client is not None:
+            role["clientRole"] = True
+        kept = graph.reduce(graph.index[r] for r in refs)
+        if kept:
+            role |= {
+                "composite": True,
+                "composites": _composites([graph.keys[i] for i in kept]),
+            }
+        else:
+            role["composite"] = False
+        expanded[key] = role
+
+    roles = dict(realm.get("roles") or {})
+    realm_roles = [
+        _with_expansion(role, expanded.pop((None, role["name"]), None))
+        for role in roles.get("realm") or []
+    ]
+    client_roles = {
+        client: [
+            _with_expansion(role, expanded.pop((client, role["name"]), None))
+            for role in role_list or []
+        ]
+        for client, role_list in (roles.get("client") or {}).items()
+    }
+    # declared roles the realm does not have yet
+    for (client, _), role in expanded.items():
+        if client is None:
+            realm_roles.append(role)
+        else:
+            client_roles.setdefault(client, []).append(role)
+
+    if realm_roles:
+        roles["realm"] = realm_roles
+    if client_roles:
+        roles["client"] = client_roles
+    realm["roles"] = roles
+
+
+def _with_expansion(role: JsonDict, expansion: JsonDict | None) -> JsonDict:
+    if expansion is None:
+        return role
+    kept = {k: v for k, v in role.items() if k not in ("composite", "composites")}
+    return kept | expansion
+
+
+def _expand_groups(
+    realm: JsonDict, graph: RoleGraph, groups: dict[str, list[RoleKey]]
+) -> None:
+    tree = _GroupTree(realm.setdefault("groups", []))
+    # roles members of a group get through the group and its parents, by path
+    inherited: dict[str, int] = {"": 0}
+
+    # parents sort before their subgroups
+    for path in sorted(groups, key=lambda p: p.count("/")):
+        group = tree.get(path)
+        parent = path.rpartition("/")[0]
+        while parent not in inherited:
+            # undeclared parents inherit from their own parents
+            parent = parent.rpartition("/")[0]
+
+        ids = [graph.index[r] for r in groups[path]]
+        kept = graph.reduce(ids, inherited[parent])
+        _merge_group_roles(group, _group_roles([graph.keys[i] for i in kept]))
+
+        reach = inherited[parent]
+        for i in ids:
+            reach |= (1 << i) | graph.closure(i)
+        inherited[path] = reach
+
+
+class _GroupTree:
+    # group nodes by path, with an index of the children of every node seen
+    def __init__(self, top: list[JsonDict]) -> None:
+        self.nodes: dict[str, JsonDict] = {}
+        self.children: dict[str, tuple[list[JsonDict], dict[str, JsonDict]]] = {
+            "": (top, {g["name"]: g for g in top})
+        }
+
+    def get(self, path: str) -> JsonDict:
+        node = self.nodes.get(path)
+        if node is not None:
+            return node
+
+        parent, _, name = path.rpartition("/")
+        if parent:
+            self.get(parent)
+        siblings, by_name = self.children[parent]
+        node = by_name.get(name)
+        if node is None:
+            node = {"name": name, "path": f"/{path}", "subGroups": []}
+            siblings.append(node)
+            by_name[name] = node
+
+        sub = node.setdefault("subGroups", [])
+        self.children[path] = (sub, {g["name"]: g for g in sub})
+        self.nodes[path] = node
+        return node
@@ -0,0 +1,23 @@
+import uuid
+from functools import cache
+
+# Deterministic ids for generated entities: a UUIDv5 over a fixed namespace
+# and the entity's natural key, so the same entity gets the same id on every
+# build and exports (and their fingerprints) stay stable.
+#
+# In templates: `id: !uuid client/otago_proxy_service_client`. Keys built in
+# code from several parts are length-prefixed (`5:otago5:scope4:view`), so
+# different parts never encode alike, and hashed in a namespace of their own,
+# so they cannot collide with any key written in a template.
+
+ID_NAMESPACE = uuid.UUID("6f1c2b1e-5d0a-5b7e-9c61-4b8e2f0a7d13")
+PARTS_NAMESPACE = uuid.uuid5(ID_NAMESPACE, "parts")
+
+
+@cache
+def stable_id(*parts: str) -> str:
+    # memoized: repeated references to an entity cost one dict lookup
+    if len(parts) == 1:
+        return str(uuid.uuid5(ID_NAMESPACE, parts[0]))
+    key = "".join(f"{len(part)}:{part}" for part in parts)
+    return str(uuid.uuid5(PARTS_NAMESPACE, key))
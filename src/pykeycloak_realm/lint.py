@@ -0,0 +1,191 @@
+import os
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+import yaml
+
+# Finds dead references in a template from a single pass over the YAML event
+# stream, without constructing the document:
+#
+# - anchors (&name) that no alias (*name) reaches from the parts of the
+#   template that are built (`realm`, `envs`, `hierarchy`). An alias inside a
+#   `vars` anchor only counts if that anchor is reached itself, so chains of
+#   anchors that only reference each other are reported as a whole;
+# - `envs.clients[].cid_alias` entries whose `$alias` occurs nowhere.
+#
+# Work and memory are linear in the number of events.
+
+LIVE_SECTIONS = frozenset({"realm", "envs", "hierarchy"})
+
+# libyaml parses several times faster; the events are the same
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@dataclass(frozen=True, slots=True)
+class LintFinding:
+    line: int
+    kind: str
+    name: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.line}: {self.message}"
+
+
+class _Frame:
+    __slots__ = ("is_map", "expecting_key", "key", "owner")
+
+    def __init__(self, is_map: bool, owner: bool) -> None:
+        self.is_map = is_map
+        self.expecting_key = is_map
+        self.key: str | None = None
+        # the collection is a `vars` anchor that aliases inside it belong to
+        self.owner = owner
+
+
+class _Index:
+    def __init__(self) -> None:
+        # one entry per anchor definition; a redefined name starts a new one
+        self.names: list[str] = []
+        self.lines: list[int] = []
+        self.uses: list[list[int]] = []
+        self.aliased: list[bool] = []
+        self.current: dict[str, int] = {}
+        self.roots: set[int] = set()
+        self.cid_aliases: list[tuple[str, int]] = []
+        self.dollar_values: set[str] = set()
+
+    def define(self, name: str, line: int) -> int:
+        anchor = len(self.names)
+        self.names.append(name)
+        self.lines.append(line)
+        self.uses.append([])
+        self.aliased.append(False)
+        self.current[name] = anchor
+        return anchor
+
+    def live(self) -> list[bool]:
+        live = [False] * len(self.names)
+        queue = deque(self.roots)
+        for anchor in self.roots:
+            live[anchor] = True
+        while queue:
+            for used in self.uses[queue.popleft()]:
+                if not live[used]:
+                    live[used] = True
+                    queue.append(used)
+        return live
+
+
+def _index_events(events: Iterable[yaml.Event]) -> _Index:
+    index = _Index()
+    stack: list[_Frame] = []
+    owners: list[int] = []
+
+    for event in events:
+        if isinstance(event, yaml.CollectionEndEvent):
+            frame = stack.pop()
+            if frame.owner:
+                owners.pop()
+            continue
+        if not isinstance(event, yaml.NodeEvent):
+            continue
+
+        # position of this node in its parent
+        parent = stack[-1] if stack else None
+        is_key = parent is not None and parent.expecting_key
+        section = stack[0].key if stack and stack[0].is_map else None
+        live = section in LIVE_SECTIONS and not (is_key and len(stack) == 1)
+
+        if isinstance(event, yaml.AliasEvent):
+            target = index.current.get(event.anchor)  # type: ignore[arg-type]
+            if target is not None:
+                index.aliased[target] = True
+                if owners:
+                    index.uses[owners[-1]].append(target)
+                elif live:
+                    index.roots.add(target)
+            value = None
+        elif isinstance(event, yaml.ScalarEvent):
+            value = event.value
+            if event.anchor is not None:
+                index.define(event.anchor, _line(event))
+            if value.startswith("$"):
+                index.dollar_values.add(value)
+            elif (
+                not is_key
+                and parent is not None
+                and parent.key == "cid_alias"
+                and _is_env_client(stack)
+            ):
+                index.cid_aliases.append((value, _line(event)))
+        else:
+            value = None
+            owner = False
+            if event.anchor is not None:
+                anchor = index.define(event.anchor, _line(event))
+                # anchored content outside the built sections is only used when
+                # it is aliased, so its aliases depend on the anchor
+                if not live or owners:
+                    # nested in another anchor, it is used along with it
+                    if owners:
+                        index.uses[owners[-1]].append(anchor)
+                    owners.append(anchor)
+                    owner = True
+
+        if parent is not None and parent.is_map:
+            if is_key:
+                parent.key = value
+            parent.expecting_key = not is_key
+
+        if isinstance(event, yaml.CollectionStartEvent):
+            stack.append(_Frame(isinstance(event, yaml.MappingStartEvent), owner))
+
+    return index
+
+
+def _line(event: yaml.Event) -> int:
+    return event.start_mark.line + 1 if event.start_mark is not None else 0
+
+
+def _is_env_client(stack: list[_Frame]) -> bool:
+    # envs -> clients -> [] -> cid_alias
+    return (
+        len(stack) == 4
+        and stack[0].key == "envs"
+        and stack[1].key == "clients"
+        and not stack[2].is_map
+    )
+
+
+def lint_events(events: Iterable[yaml.Event]) -> list[LintFinding]:
+    index = _index_events(events)
+    findings = []
+
+    live = index.live()
+    for anchor, name in enumerate(index.names):
+        if live[anchor]:
+            continue
+        if index.aliased[anchor]:
+            message = f"anchor &{name} is only used by unused anchors"
+        else:
+            message = f"unused anchor &{name}"
+        findings.append(LintFinding(index.lines[anchor], "anchor", name, message))
+
+    for alias, line in index.cid_aliases:
+        if f"${alias}" not in index.dollar_values:
+            findings.append(
+                LintFinding(
+                    line, "cid_alias", alias, f"cid_alias {alias!r} is never used"
+                )
+            )
+
+    findings.sort(key=lambda f: f.line)
+    return findings
+
+
+def lint_template(path: str | os.PathLike[str]) -> list[LintFinding]:
+    with Path(path).open(encoding="utf-8") as f:
+        return lint_events(yaml.parse(f, Loader=_Loader))
@@ -0,0 +1,367 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Self
+from urllib.parse import quote
+
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.diff import Change, diff_values, record_key
+from pykeycloak_realm.fingerprint import changed_sections, read_fingerprint
+from pykeycloak_realm.upload import KeycloakAdmin, KeycloakError
+
+logger = logging.getLogger(__name__)
+
+JsonDict = dict[str, Any]
+
+# Live snapshots: a realm is read back through the admin API (realm
+# settings, clients with their roles and authorization settings, realm
+# roles, groups and users) and assembled into the shape of an export, so it
+# can be stored, queried and compared with what the templates build.
+#
+# Requests run on a bounded thread pool in two rounds: the realm, clients,
+# roles and the user/group counts first, then every page of users and
+# groups and the roles and authorization settings of every client. Each
+# response is cached by request path with its ETag and hash; a server that
+# sends ETags answers unchanged resources with 304 and the cached body is
+# used, otherwise the hash tells which responses changed.
+
+PAGE_SIZE = 100
+DEFAULT_CONCURRENCY = 8
+CACHE_SUFFIX = ".cache.json"
+CACHE_VERSION = 1
+
+# created by Keycloak in every realm; only compared when the export declares them
+BUILTIN_CLIENTS = frozenset(
+    {
+        "account",
+        "account-console",
+        "admin-cli",
+        "broker",
+        "realm-management",
+        "security-admin-console",
+    }
+)
+BUILTIN_ROLES = frozenset({"offline_access", "uma_authorization"})
+
+# never returned as written (masked or not readable at all)
+WRITE_ONLY_KEYS = frozenset({"credentials", "secret"})
+
+# not in what GET /users returns; reading them would take requests per user,
+# so declared role mappings and group memberships are not compared
+USER_MAPPING_KEYS = frozenset({"realmRoles", "clientRoles", "groups"})
+
+# the authorization settings endpoint returns what a permission applies to
+# as JSON encoded names in its config; templates declare them as lists
+POLICY_CONFIG_REFS = {
+    "resources": "resources",
+    "scopes": "scopes",
+    "applyPolicies": "policies",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class PullStats:
+    requests: int
+    not_modified: int  # answered with 304
+    unchanged: int  # same hash as the cached body
+    changed: int
+
+
+def cache_path(snapshot: str | os.PathLike[str]) -> Path:
+    path = Path(snapshot)
+    return path.with_name(path.name + CACHE_SUFFIX)
+
+
+class LiveCache:
+    # request path -> [ETag, sha256 of the body, decoded body]
+    def __init__(self, entries: dict[str, list[Any]] | None = None) -> None:
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> Self:
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return cls()
+        return cls(data.get("entries") or {})
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        Path(path).write_text(
+            json.dumps({"version": CACHE_VERSION, "entries": self.entries}),
+            encoding="utf-8",
+        )
+
+
+class _Fetcher:
+    def __init__(
+        self, admin: KeycloakAdmin, cache: LiveCache, concurrency: int
+    ) -> None:
+        self.admin = admin
+        self.old = cache.entries
+        self.new: dict[str, list[Any]] = {}
+        self.concurrency = concurrency
+        self.counts = {"not_modified": 0, "unchanged": 0, "changed": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _get(self, path: str) -> Any:
+        cached = self.old.get(path)
+        status, body, etag = self.admin.get(path, cached[0] if cached else None)
+        if status == 304 and cached is not None:
+            self._count("not_modified")
+            self.new[path] = cached
+            return cached[2]
+        if status == 404:
+            raise KeycloakError(f"GET {path}: HTTP 404")
+
+        digest = hashlib.sha256(body).hexdigest()
+        if cached is not None and cached[1] == digest:
+            self._count("unchanged")
+            value = cached[2]
+        else:
+            self._count("changed")
+            value = json.loads(body)
+        self.new[path] = [etag, digest, value]
+        return value
+
+    def get_all(self, paths: Iterable[str]) -> list[Any]:
+        paths = list(paths)
+        if len(paths) <= 1:
+            return [self._get(p) for p in paths]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(self._get, paths))
+
+    def stats(self) -> PullStats:
+        return PullStats(len(self.new), **self.counts)
+
+
+def _pages(path: str, count: int, extra: str = "") -> Iterator[str]:
+    for first in range(0, max(count, 1), PAGE_SIZE):
+        yield f"{path}?first={first}&max={PAGE_SIZE}{extra}"
+
+
+def pull_realm(
+    admin: KeycloakAdmin,
+    realm: str,
+    cache: LiveCache | None = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> tuple[JsonDict, LiveCache, PullStats]:
+    fetcher = _Fetcher(admin, cache or LiveCache(), concurrency)
+    base = f"/{quote(realm)}"
+
+    settings, clients, roles, users, groups = fetcher.get_all(
+        [
+            base,
+            f"{base}/clients",
+            f"{base}/roles?briefRepresentation=false",
+            f"{base}/users/count",
+            f"{base}/groups/count",
+        ]
+    )
+    user_count = users if isinstance(users, int) else users.get("count", 0)
+    group_count = groups if isinstance(groups, int) else groups.get("count", 0)
+
+    user_pages = list(_pages(f"{base}/users", user_count, "&briefRepresentation=false"))
+    group_pages = list(
+        _pages(f"{base}/groups", group_count, "&briefRepresentation=false")
+    )
+    role_paths = [f"{base}/clients/{quote(c['id'])}/roles" for c in clients]
+    authz_paths = [
+        f"{base}/clients/{quote(c['id'])}/authz/resource-server/settings"
+        for c in clients
+        if c.get("authorizationServicesEnabled")
+    ]
+    results = fetcher.get_all([*user_pages, *group_pages, *role_paths, *authz_paths])
+
+    # cached bodies are shared with the cache, so clients are copied
+    clients = [dict(c) for c in clients]
+    users_end = len(user_pages)
+    groups_end = users_end + len(group_pages)
+    roles_end = groups_end + len(role_paths)
+    authz_clients = [c for c in clients if c.get("authorizationServicesEnabled")]
+    for client, authz in zip(authz_clients, results[roles_end:], strict=True):
+        client["authorizationSettings"] = authz
+
+    live = dict(settings)
+    live["clients"] = clients
+    live["roles"] = {
+        "realm": roles,
+        "client": {
+            c["clientId"]: client_roles
+            for c, client_roles in zip(
+                clients, results[groups_end:roles_end], strict=True
+            )
+            if client_roles
+        },
+    }
+    live["groups"] = [g for page in results[users_end:groups_end] for g in page]
+    live["users"] = [u for page in results[:users_end] for u in page]
+    return live, LiveCache(fetcher.new), fetcher.stats()
+
+
+def pull_snapshot(
+    admin: KeycloakAdmin,
+    realm: str,
+    snapshot: str | os.PathLike[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> tuple[dict[str, str], PullStats]:
+    # Pulls `realm` into `snapshot` (an export, with its fingerprint) and
+    # returns the sections that changed since the previous pull. The file is
+    # only rewritten when a response did.
+    snapshot = Path(snapshot)
+    previous = read_fingerprint(snapshot) if snapshot.is_file() else None
+    cache = LiveCache.load(cache_path(snapshot))
+    live, new_cache, stats = pull_realm(admin, realm, cache, concurrency)
+
+    if (
+        previous is not None
+        and not stats.changed
+        and new_cache.entries.keys() == (cache.entries.keys())
+    ):
+        return {}, stats
+
+    write_to_realm_import_file(live, snapshot, overwrite=True)
+    new_cache.save(cache_path(snapshot))
+    current = read_fingerprint(snapshot)
+    if previous is None or current is None:
+        return dict.fromkeys(live, "added"), stats
+    return changed_sections(previous, current), stats
+
+
+def _without_builtins(live: JsonDict, export: JsonDict) -> JsonDict:
+    # drops what Keycloak creates by itself unless the export declares it
+    declared_clients = {c.get("clientId") for c in export.get("clients") or ()}
+    declared_roles = {
+        r.get("name") for r in (export.get("roles") or {}).get("realm") or ()
+    }
+    builtin_clients = BUILTIN_CLIENTS - declared_clients
+    builtin_roles = BUILTIN_ROLES | {f"default-roles-{live.get('realm')}"}
+    builtin_roles -= declared_roles
+
+    live = dict(live)
+    if "clients" in live:
+        live["clients"] = [
+            c for c in live["clients"] if c.get("clientId") not in builtin_clients
+        ]
+    if "roles" in live:
+        roles = live["roles"]
+        live["roles"] = {
+            "realm": [
+                r
+                for r in roles.get("realm") or ()
+                if r.get("name") not in builtin_roles
+            ],
+            "client": {
+                cid: client_roles
+                for cid, client_roles in (roles.get("client") or {}).items()
+                if cid not in builtin_clients
+            },
+        }
+    return live
+
+
+def project(live: Any, declared: Any) -> Any:
+    # the part of `live` the export declares: keys it does not set are
+    # Keycloak's defaults, records it does not have are drift
+    if isinstance(live, dict) and isinstance(declared, dict):
+        return {
+            k: project(live[k], declared[k])
+            for k in declared
+            if k in live and k not in WRITE_ONLY_KEYS
+        }
+    if isinstance(live, list) and isinstance(declared, list):
+        key = record_key(declared, live)
+        if key is None:
+            return [
+                project(item, declared[i]) if i < len(declared) else item
+                for i, item in enumerate(live)
+            ]
+        by_name = {item[key]: item for item in declared}
+        return [
+            project(item, by_name[item[key]]) if item[key] in by_name else item
+            for item in live
+        ]
+    return live
+
+
+def _declared(export: Any) -> Any:
+    if isinstance(export, dict):
+        return {k: _declared(v) for k, v in export.items() if k not in WRITE_ONLY_KEYS}
+    if isinstance(export, list):
+        return [_declared(v) for v in export]
+    return export
+
+
+def _policy_refs(policy: Any) -> Any:
+    config = policy.get("config") if isinstance(policy, dict) else None
+    if not isinstance(config, dict) or not config.keys() & POLICY_CONFIG_REFS:
+        return policy
+
+    config = dict(config)
+    refs = {}
+    for field, key in POLICY_CONFIG_REFS.items():
+        value = config.get(field)
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                continue
+        if field in config:
+            del config[field]
+            refs[key] = value
+    return policy | {"config": config} | refs
+
+
+def _comparable(section: str, value: Any) -> Any:
+    # the shape both sides are compared in; new containers, as live values
+    # are shared with the cache
+    if not isinstance(value, list):
+        return value
+    if section == "users":
+        return [
+            (
+                {k: v for k, v in user.items() if k not in USER_MAPPING_KEYS}
+                if isinstance(user, dict)
+                else user
+            )
+            for user in value
+        ]
+    if section == "clients":
+        clients = []
+        for client in value:
+            auth = (
+                client.get("authorizationSettings")
+                if isinstance(client, dict)
+                else None
+            )
+            if isinstance(auth, dict) and auth.get("policies"):
+                policies = [_policy_refs(p) for p in auth["policies"]]
+                client = client | {
+                    "authorizationSettings": auth | {"policies": policies}
+                }
+            clients.append(client)
+        return clients
+    return value
+
+
+def drift_report(export: JsonDict, live: JsonDict) -> list[Change]:
+    live = _without_builtins(live, export)
+    changes: list[Change] = []
+    for section in export:
+        if section not in live:
+            continue  # not part of a live snapshot (e.g. components)
+        declared = _comparable(section, _declared(export[section]))
+        current = project(_comparable(section, live[section]), declared)
+        changes.extend(diff_values(declared, current, section))
+    return changes
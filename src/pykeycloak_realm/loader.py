@@ -0,0 +1,71 @@
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+from pykeycloak_realm.ids import stable_id
+from pykeycloak_realm.realm_refs import RealmRef, parse_ref
+from pykeycloak_realm.secret_refs import BACKENDS, SecretRef
+
+
+class TemplateLoader(yaml.SafeLoader):
+    pass
+
+
+def _origin(loader: yaml.SafeLoader) -> Path | None:
+    name = getattr(loader, "name", None)
+    if not name or name.startswith("<"):
+        return None
+    return Path(name)
+
+
+def _construct_secret_ref(
+    loader: yaml.SafeLoader, tag_suffix: str, node: yaml.Node
+) -> SecretRef:
+    if tag_suffix not in BACKENDS:
+        raise yaml.constructor.ConstructorError(
+            None, None, f"unknown tag !{tag_suffix}", node.start_mark
+        )
+    if not isinstance(node, yaml.ScalarNode):
+        raise yaml.constructor.ConstructorError(
+            None, None, f"!{tag_suffix} expects a scalar", node.start_mark
+        )
+
+    key = loader.construct_scalar(node)
+    return BACKENDS[tag_suffix].make_ref(tag_suffix, key, _origin(loader))
+
+
+def _construct_uuid(loader: yaml.SafeLoader, node: yaml.Node) -> str:
+    if not isinstance(node, yaml.ScalarNode):
+        raise yaml.constructor.ConstructorError(
+            None, None, "!uuid expects a scalar", node.start_mark
+        )
+    key = loader.construct_scalar(node)
+    if not key:
+        raise yaml.constructor.ConstructorError(
+            None, None, "!uuid expects a natural key", node.start_mark
+        )
+    return stable_id(key)
+
+
+def _construct_realm_ref(loader: yaml.SafeLoader, node: yaml.Node) -> RealmRef:
+    if not isinstance(node, yaml.ScalarNode):
+        raise yaml.constructor.ConstructorError(
+            None, None, "!ref expects a scalar", node.start_mark
+        )
+    try:
+        return parse_ref(loader.construct_scalar(node))
+    except ValueError as e:
+        raise yaml.constructor.ConstructorError(
+            None, None, str(e), node.start_mark
+        ) from e
+
+
+# exact tags take precedence over the `!` prefix of secret references
+TemplateLoader.add_constructor("!uuid", _construct_uuid)
+TemplateLoader.add_constructor("!ref", _construct_realm_ref)
+TemplateLoader.add_multi_constructor("!", _construct_secret_ref)
+
+
+def load_template(stream: Any) -> Any:
+    return yaml.load(stream, Loader=TemplateLoader)  # noqa: S506
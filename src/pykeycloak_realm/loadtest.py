@@ -0,0 +1,205 @@
+import asyncio
+import itertools
+import math
+import ssl
+import time
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import quote, urlencode, urlsplit
+
+JsonDict = dict[str, Any]
+
+# Token endpoint load test: confidential clients of a built realm request
+# tokens with the client_credentials grant from coroutines on one event loop.
+# Each coroutine keeps its own HTTP/1.1 connection open across requests, so
+# the numbers are those of the token endpoint rather than of TCP and TLS
+# handshakes. A connection the server closes is opened again.
+
+DEFAULT_REQUESTS = 1000
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 10.0
+
+
+class LoadTestError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class LoadTestResult:
+    requests: int
+    failures: int  # not answered with 200
+    connections: int  # opened, including reconnects
+    seconds: float
+    p50: float  # latency in seconds, over all requests
+    p95: float
+    p99: float
+    statuses: dict[int, int] = field(default_factory=dict)  # 0: no response
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.seconds if self.seconds else 0.0
+
+
+def confidential_clients(realm: JsonDict) -> list[tuple[str, str]]:
+    # (clientId, secret) of the clients that can use client_credentials;
+    # the secrets are the ones injected from envs.clients
+    return [
+        (client["clientId"], client["secret"])
+        for client in realm.get("clients") or ()
+        if client.get("secret")
+        and client.get("serviceAccountsEnabled")
+        and not client.get("publicClient")
+        and not client.get("bearerOnly")
+    ]
+
+
+def token_url(base_url: str, realm: str) -> str:
+    return f"{base_url.rstrip('/')}/realms/{quote(realm)}/protocol/openid-connect/token"
+
+
+def percentile(ordered: Sequence[float], p: float) -> float:
+    # nearest rank
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+class _Target:
+    def __init__(self, url: str, timeout: float) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Invalid token endpoint URL: {url!r}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.path = parts.path or "/"
+        self.authority = parts.netloc.rpartition("@")[2]
+        self.timeout = timeout  # per request, connecting included
+
+    def request(self, client_id: str, secret: str) -> bytes:
+        body = urlencode(
+            {
+                "grant_type": "client_credentials",
+                "client_id": client_id,
+                "client_secret": secret,
+            }
+        ).encode()
+        head = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"Host: {self.authority}\r\n"
+            "Content-Type: application/x-www-form-urlencoded\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        )
+        return head.encode("latin-1") + body
+
+
+async def _exchange(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, request: bytes
+) -> tuple[int, bool]:
+    # (status, whether the server closes the connection)
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("Connection closed")
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, status_line.startswith(b"HTTP/1.0")
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        match name.strip().lower(), value.strip().lower():
+            case "content-length", length_value:
+                length = int(length_value)
+            case "transfer-encoding", encoding:
+                chunked = encoding == "chunked"
+            case "connection", option:
+                close = option == "close"
+    if chunked:
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def _worker(
+    target: _Target,
+    requests: Iterator[bytes],
+    latencies: list[float],
+    statuses: Counter[int],
+) -> int:
+    # one connection at a time; returns how many were opened
+    connections = 0
+    stream: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+    for request in requests:
+        started = time.perf_counter()
+        try:
+            async with asyncio.timeout(target.timeout):
+                if stream is None:
+                    stream = await asyncio.open_connection(
+                        target.host, target.port, ssl=target.ssl
+                    )
+                    connections += 1
+                status, close = await _exchange(*stream, request)
+        except (OSError, TimeoutError, ValueError, asyncio.IncompleteReadError):
+            status, close = 0, True
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+        if close and stream is not None:
+            stream[1].close()
+            stream = None
+    if stream is not None:
+        stream[1].close()
+    return connections
+
+
+async def _run(
+    target: _Target,
+    clients: Sequence[tuple[str, str]],
+    requests: int,
+    concurrency: int,
+) -> LoadTestResult:
+    # workers take the next request from one shared iterator, round-robin
+    # over the clients; the loop is single-threaded, so no lock is needed
+    prepared = [target.request(client_id, secret) for client_id, secret in clients]
+    pending = itertools.islice(itertools.cycle(prepared), requests)
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+
+    started = time.perf_counter()
+    connections = await asyncio.gather(
+        *(
+            _worker(target, pending, latencies, statuses)
+            for _ in range(min(concurrency, requests))
+        )
+    )
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return LoadTestResult(
+        requests=len(latencies),
+        failures=len(latencies) - statuses[200],
+        connections=sum(connections),
+        seconds=seconds,
+        p50=percentile(latencies, 50),
+        p95=percentile(latencies, 95),
+        p99=percentile(latencies, 99),
+        statuses=dict(sorted(statuses.items())),
+    )
+
+
+def run_load_test(
+    url: str,
+    clients: Sequence[tuple[str, str]],
+    requests: int = DEFAULT_REQUESTS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> LoadTestResult:
+    if not clients:
+        raise LoadTestError("No confidential clients with a secret")
+    if requests < 1 or concurrency < 1:
+        raise ValueError("Requests and concurrency must be at least 1")
+    return asyncio.run(_run(_Target(url, timeout), clients, requests, concurrency))
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import sys
+from collections.abc import Iterator, MutableMapping
+from typing import Any, ClassVar, Self
+
+JsonDict = dict[str, Any]
+
+# Compact representation of the high-volume entities of a realm (users with
+# their credentials and role mappings, authorization policies). Known keys
+# live in __slots__; anything else goes to a per-object `_extra` dict. The
+# original key order is kept as a "shape" tuple that is interned, so 100k
+# users with the same keys share one tuple. Models behave like mutable
+# mappings, which lets the transformer stages and the writer use them in
+# place of dicts, and to_dict() gives back exactly the dict they came from.
+
+_shapes: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+
+def _intern_shape(keys: tuple[str, ...]) -> tuple[str, ...]:
+    return _shapes.setdefault(keys, keys)
+
+
+def _intern_strings(value: Any) -> Any:
+    # role names, groups and required actions repeat across users
+    match value:
+        case str():
+            return sys.intern(value)
+        case list():
+            return [_intern_strings(v) for v in value]
+        case dict():
+            return {sys.intern(k): _intern_strings(v) for k, v in value.items()}
+        case _:
+            return value
+
+
+class SlotModel:
+    __slots__ = ("_shape", "_extra")
+
+    FIELDS: ClassVar[tuple[str, ...]] = ()
+    # list fields holding nested models
+    NESTED: ClassVar[dict[str, type[SlotModel]]] = {}
+    # fields whose strings are interned
+    INTERNED: ClassVar[frozenset[str]] = frozenset()
+
+    _shape: tuple[str, ...]
+    _extra: JsonDict | None
+
+    @classmethod
+    def from_dict(cls, data: JsonDict) -> Self:
+        obj = cls.__new__(cls)
+        extra = None
+        fields = cls._field_set
+        for key, value in data.items():
+            if key in fields:
+                object.__setattr__(obj, key, obj._convert(key, value))
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        obj._extra = extra
+        obj._shape = _intern_shape(tuple(data))
+        return obj
+
+    _field_set: ClassVar[frozenset[str]] = frozenset()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    def _convert(self, key: str, value: Any) -> Any:
+        model = self.NESTED.get(key)
+        if model is not None and isinstance(value, list):
+            return [model.from_dict(v) if isinstance(v, dict) else v for v in value]
+        if key in self.INTERNED:
+            return _intern_strings(value)
+        return value
+
+    def to_dict(self) -> JsonDict:
+        # deep: nested models become dicts as well
+        return {
+            key: (
+                [v.to_dict() if isinstance(v, SlotModel) else v for v in value]
+                if key in self.NESTED and isinstance(value, list)
+                else value
+            )
+            for key, value in self.items()
+        }
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._shape:
+            self._shape = _intern_shape((*self._shape, key))
+        if key in self._field_set:
+            object.__setattr__(self, key, self._convert(key, value))
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._shape:
+            raise KeyError(key)
+        if key in self._field_set:
+            object.__delattr__(self, key)
+        elif self._extra is not None:
+            del self._extra[key]
+        self._shape = _intern_shape(tuple(k for k in self._shape if k != key))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._shape
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._shape)
+
+    def __len__(self) -> int:
+        return len(self._shape)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SlotModel | dict):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> tuple[str, ...]:
+        return self._shape
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        for key in self._shape:
+            yield key, self[key]
+
+    def values(self) -> Iterator[Any]:
+        for key in self._shape:
+            yield self[key]
+
+
+MutableMapping.register(SlotModel)
+
+
+class Credential(SlotModel):
+    FIELDS = (
+        "id",
+        "type",
+        "userLabel",
+        "createdDate",
+        "secretData",
+        "credentialData",
+        "priority",
+        "value",
+        "temporary",
+        "hashedSaltedValue",
+        "salt",
+        "hashIterations",
+        "algorithm",
+    )
+    INTERNED = frozenset({"type", "algorithm"})
+    __slots__ = FIELDS
+
+
+class User(SlotModel):
+    FIELDS = (
+        "id",
+        "username",
+        "email",
+        "firstName",
+        "lastName",
+        "enabled",
+        "emailVerified",
+        "createdTimestamp",
+        "totp",
+        "attributes",
+        "credentials",
+        "realmRoles",
+        "clientRoles",
+        "groups",
+        "requiredActions",
+        "disableableCredentialTypes",
+        "notBefore",
+        "federationLink",
+        "serviceAccountClientId",
+    )
+    NESTED = {"credentials": Credential}
+    # role mappings: realmRoles is a list of role names, clientRoles maps
+    # clientId to a list of role names
+    INTERNED = frozenset(
+        {
+            "realmRoles",
+            "clientRoles",
+            "groups",
+            "requiredActions",
+            "disableableCredentialTypes",
+        }
+    )
+    __slots__ = FIELDS
+
+
+class Policy(SlotModel):
+    FIELDS = (
+        "id",
+        "name",
+        "description",
+        "type",
+        "logic",
+        "decisionStrategy",
+        "config",
+    )
+    INTERNED = frozenset({"type", "logic", "decisionStrategy"})
+    __slots__ = FIELDS
+
+
+def compact_realm(realm: JsonDict) -> JsonDict:
+    # Replaces users and authorization policies in place; other entities
+    # stay plain dicts.
+    users = realm.get("users")
+    if isinstance(users, list):
+        realm["users"] = [
+            User.from_dict(u) if isinstance(u, dict) else u for u in users
+        ]
+
+    for client in realm.get("clients", ()):
+        auth = client.get("authorizationSettings") if isinstance(client, dict) else None
+        if isinstance(auth, dict) and isinstance(auth.get("policies"), list):
+            auth["policies"] = [
+                Policy.from_dict(p) if isinstance(p, dict) else p
+                for p in auth["policies"]
+            ]
+
+    return realm
+
+
+def to_json(value: Any) -> Any:
+    # json.dumps(default=to_json): models are written as the dict they hold
+    if isinstance(value, SlotModel):
+        return dict(value.items())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
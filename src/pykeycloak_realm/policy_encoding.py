@@ -0,0 +1,96 @@
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+
+JsonDict = dict[str, Any]
+
+# Keycloak expects some policy config fields (roles of a role policy, clients
+# of a client policy, groups of a group policy) as JSON encoded strings.
+# Policies are selected by name prefix.
+DEFAULT_POLICY_ENCODING: dict[str, tuple[str, ...]] = {"policy_role__": ("roles",)}
+
+
+class PolicyEncoder:
+    def __init__(
+        self, rules: Mapping[str, Sequence[str]] = DEFAULT_POLICY_ENCODING
+    ) -> None:
+        self.rules = {prefix: tuple(fields) for prefix, fields in rules.items()}
+        self.prefixes = tuple(self.rules)
+        self._encoded: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def collect(
+        self, clients: Iterable[JsonDict]
+    ) -> list[tuple[JsonDict, tuple[str, ...]]]:
+        # the matching policies and the fields to encode in their configs
+        matches = []
+        prefixes = self.prefixes
+        fields_for = self._fields_for
+
+        for client in clients:
+            auth = client.get("authorizationSettings")
+            if not auth:
+                continue
+
+            for policy in auth.get("policies", ()):
+                name = policy.get("name", "")
+                if name.startswith(prefixes) and policy.get("config"):
+                    matches.append((policy, fields_for(name)))
+
+        return matches
+
+    def apply(self, clients: Iterable[JsonDict]) -> int:
+        # Lists shared through YAML aliases are the same object, so identity
+        # is checked first. Otherwise repr() is the cache key: it is several
+        # times cheaper than encoding and, for JSON data, equal reprs always
+        # encode to the same string (True/1/1.0 included).
+        import json
+
+        by_id: dict[int, tuple[Any, str]] = {}
+        encoded_by_repr = self._encoded
+        encode = json.JSONEncoder().encode
+        hits = misses = 0
+
+        for policy, fields in self.collect(clients):
+            config = policy["config"]
+            updates: dict[str, str] = {}
+            for field in fields:
+                value = config.get(field, [])
+                # already encoded, e.g. a policy shared through a YAML alias
+                if isinstance(value, str):
+                    continue
+
+                cached = by_id.get(id(value))
+                if cached is not None:
+                    hits += 1
+                    updates[field] = cached[1]
+                    continue
+
+                key = repr(value)
+                encoded = encoded_by_repr.get(key)
+                if encoded is None:
+                    misses += 1
+                    encoded = encoded_by_repr[key] = encode(value)
+                else:
+                    hits += 1
+
+                by_id[id(value)] = (value, encoded)
+                updates[field] = encoded
+
+            # configs may be shared through YAML aliases with policies that
+            # are not encoded, so each policy gets its own copy
+            if updates:
+                policy["config"] = config | updates
+
+        self.hits += hits
+        self.misses += misses
+        return hits + misses
+
+    def _fields_for(self, name: str) -> tuple[str, ...]:
+        if len(self.rules) == 1:
+            return self.rules[self.prefixes[0]]
+
+        for prefix, fields in self.rules.items():
+            if name.startswith(prefix):
+                return fields
+        return ()
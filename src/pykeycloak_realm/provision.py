@@ -0,0 +1,195 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Self
+
+from pykeycloak_realm.export_reader import ExportReader
+from pykeycloak_realm.upload import KeycloakAdmin
+
+logger = logging.getLogger(__name__)
+
+JsonDict = dict[str, Any]
+
+# Bulk user provisioning: instead of importing every user with the realm,
+# users are streamed from a built export (or a user shard: a JSON object
+# with a `users` list, or a .jsonl file with one user per line) and sent in
+# batches to the partialImport endpoint of an existing realm, with a bounded
+# number of batches in flight. Only those batches are held in memory.
+#
+# Each finished batch is recorded in a checkpoint next to the source
+# (`<source>.provision.json`), so an interrupted run resumes with the
+# batches that were not imported. The checkpoint is only used for the same
+# realm, source file (size and mtime) and batch size.
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CONCURRENCY = 4
+CHECKPOINT_SUFFIX = ".provision.json"
+CHECKPOINT_VERSION = 1
+IF_RESOURCE_EXISTS = ("FAIL", "SKIP", "OVERWRITE")
+COUNTS = ("added", "overwritten", "skipped")
+
+
+@dataclass(frozen=True, slots=True)
+class ProvisionResult:
+    realm: str
+    batches: int  # read from the source; all of them unless one failed
+    resumed: int  # batches a previous run imported
+    imported: int  # batches imported by this run
+    added: int  # users, over all runs
+    overwritten: int
+    skipped: int
+    seconds: float
+    failed_batch: int | None = None
+    error: str | None = None
+
+
+def checkpoint_path(source: str | os.PathLike[str]) -> Path:
+    path = Path(source)
+    return path.with_name(path.name + CHECKPOINT_SUFFIX)
+
+
+def _stamp(source: Path) -> list[int]:
+    stat = source.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class Checkpoint:
+    # batch numbers already imported, with the user counts Keycloak returned
+    def __init__(
+        self,
+        path: Path,
+        key: JsonDict,
+        done: Iterable[int] = (),
+        counts: JsonDict | None = None,
+    ) -> None:
+        self.path = path
+        self.key = key
+        self.done = set(done)
+        self.counts = dict.fromkeys(COUNTS, 0) | (counts or {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, key: JsonDict) -> Self:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(path, key)
+        if not isinstance(data, dict) or data.get("key") != key:
+            logger.info("Ignoring checkpoint %s of another run", path)
+            return cls(path, key)
+        return cls(path, key, data.get("done") or (), data.get("counts"))
+
+    def mark(self, batch: int, response: JsonDict) -> None:
+        with self._lock:
+            self.done.add(batch)
+            for name in COUNTS:
+                self.counts[name] += int(response.get(name) or 0)
+            self._save()
+
+    def _save(self) -> None:
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "key": self.key,
+            "done": sorted(self.done),
+            "counts": self.counts,
+        }
+        # replaced at once, so an interrupted write leaves the previous one
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+
+def iter_users(source: str | os.PathLike[str]) -> Iterator[JsonDict]:
+    source = Path(source)
+    if source.name.endswith(".jsonl"):
+        with source.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with ExportReader(source) as reader:
+        yield from reader.iter_users()
+
+
+def iter_batches(users: Iterable[JsonDict], size: int) -> Iterator[list[JsonDict]]:
+    users = iter(users)
+    while batch := list(islice(users, size)):
+        yield batch
+
+
+def import_batch(
+    admin: KeycloakAdmin, realm: str, users: list[JsonDict], if_exists: str
+) -> JsonDict:
+    body = json.dumps({"ifResourceExists": if_exists, "users": users})
+    return admin.partial_import(realm, body.encode())
+
+
+def provision_users(
+    admin: KeycloakAdmin,
+    realm: str,
+    source: str | os.PathLike[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    if_exists: str = "OVERWRITE",
+    restart: bool = False,
+) -> ProvisionResult:
+    if batch_size < 1 or concurrency < 1:
+        raise ValueError("Batch size and concurrency must be at least 1")
+    if if_exists not in IF_RESOURCE_EXISTS:
+        raise ValueError(f"Invalid ifResourceExists policy: {if_exists!r}")
+
+    started = time.perf_counter()
+    source = Path(source)
+    path = checkpoint_path(source)
+    key = {"realm": realm, "source": _stamp(source), "batch_size": batch_size}
+    checkpoint = Checkpoint(path, key) if restart else Checkpoint.load(path, key)
+    resumed = len(checkpoint.done)
+
+    batches = imported = 0
+    failures: dict[int, str] = {}
+    pending: dict[Future[JsonDict], int] = {}
+
+    def collect() -> None:
+        nonlocal imported
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            batch = pending.pop(future)
+            try:
+                checkpoint.mark(batch, future.result())
+                imported += 1
+            except Exception as e:
+                logger.exception("Batch %d of %s failed", batch, realm)
+                failures[batch] = str(e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch, users in enumerate(iter_batches(iter_users(source), batch_size)):
+            batches += 1
+            if batch in checkpoint.done:
+                continue
+            while len(pending) >= concurrency:
+                collect()
+            # the batches in flight finish, nothing new is sent
+            if failures:
+                break
+            pending[pool.submit(import_batch, admin, realm, users, if_exists)] = batch
+        while pending:
+            collect()
+
+    failed_batch = min(failures, default=None)
+    return ProvisionResult(
+        realm,
+        batches,
+        resumed,
+        imported,
+        seconds=time.perf_counter() - started,
+        failed_batch=failed_batch,
+        error=None if failed_batch is None else failures[failed_batch],
+        **checkpoint.counts,
+    )
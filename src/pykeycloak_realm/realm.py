@@ -1,13 +1,65 @@
+from __future__ import annotations
+
 import argparse
-import logging
+import sys
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any
 
-from pykeycloak_realm.builder import export
-from pykeycloak_realm.config import RealmBuilderConfig
+# Keep this module cheap to import: `--help` and commands that do not touch
+# templates must not pay for yaml, json or the builder. Heavy modules are
+# imported inside the command handlers below.
 
+if TYPE_CHECKING:
+    from pathlib import Path
 
-def main() -> None:
-    parser = argparse.ArgumentParser(
-        description="Export a Keycloak realm from a template to a JSON file."
+    from pykeycloak_realm.config import RealmBuilderConfig
+
+DEFAULT_COMMAND = "export"
+
+
+def export(
+    from_template: str,
+    to_file: str,
+    config: RealmBuilderConfig,
+    metrics_path: str | None = None,
+) -> None:
+    from pykeycloak_realm.builder import export as build_export
+    from pykeycloak_realm.metrics import RealmMetrics, write_metrics
+
+    metrics = RealmMetrics()
+    build_export(
+        from_template=from_template, to_file=to_file, config=config, metrics=metrics
+    )
+    if metrics_path:
+        write_metrics(metrics_path, {to_file: metrics})
+
+
+def _run_export(args: argparse.Namespace) -> None:
+    from pykeycloak_realm.config import RealmBuilderConfig
+
+    config = RealmBuilderConfig()
+    export(
+        from_template=args.from_realm,
+        to_file=args.to_realm,
+        config=config,
+        metrics_path=args.metrics or config.metrics_path,
+    )
+
+
+def _add_metrics_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--metrics",
+        metavar="PREFIX",
+        help="Write build metrics to PREFIX.json and PREFIX.prom "
+        "(default: KEYCLOAK_BUILDER_METRICS_PATH, if set)",
+    )
+
+
+def _add_export_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "export",
+        help="Export a realm template to a JSON file (default command).",
+        description="Export a Keycloak realm from a template to a JSON file.",
     )
     parser.add_argument(
         "--from-realm",
@@ -19,19 +71,679 @@ def main() -> None:
         required=True,
         help="Name for the output realm file, e.g. 'otago'. Will create ./data/realms/export/{name}.realm.json",
     )
+    _add_metrics_argument(parser)
+    parser.set_defaults(handler=_run_export)
+
+
+def _resolve_export_path(name: str) -> Path:
+    from pathlib import Path
+
+    from pykeycloak_realm.artifacts import find_artifact
+    from pykeycloak_realm.config import RealmBuilderConfig
+
+    # compressed exports are found by their plain name too
+    path = find_artifact(Path(name))
+    if path.is_file():
+        return path
+    return find_artifact(RealmBuilderConfig().get_realm_filename(name))
+
+
+def _run_query(args: argparse.Namespace) -> None:
+    import json
+
+    from pykeycloak_realm.export_reader import ExportReader, query
+
+    path = _resolve_export_path(args.export)
+    if not path.is_file():
+        raise SystemExit(f"Export not found: {path}")
+
+    with ExportReader(path) as reader:
+        try:
+            result = query(reader, args.entity, args.name, args.client)
+        except ValueError as e:
+            raise SystemExit(str(e)) from e
+
+    if result is None:
+        raise SystemExit(f"{args.entity} {args.name!r} not found in {path}")
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+def _add_query_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "query",
+        help="Look up entities in an exported realm without parsing all of it.",
+        description="Answer questions about an export using a cached offset index "
+        "(written next to the export as *.index.json).",
+    )
+    parser.add_argument(
+        "export", help="Export file, or realm name in the export directory"
+    )
+    parser.add_argument(
+        "entity",
+        choices=(
+            "sections",
+            "section",
+            "client",
+            "role",
+            "user",
+            "group",
+            "policy",
+            "role-refs",
+        ),
+        help="What to look up; role-refs lists clients referencing a role",
+    )
+    parser.add_argument(
+        "name", nargs="?", help="clientId, role/group/policy name, username or section"
+    )
+    parser.add_argument("--client", help="clientId for client roles")
+    parser.set_defaults(handler=_run_query)
+
+
+def _run_validate(args: argparse.Namespace) -> None:
+    import json
+
+    from pykeycloak_realm.artifacts import open_artifact
+
+    path = _resolve_export_path(args.export)
+    if not path.is_file():
+        raise SystemExit(f"Export not found: {path}")
+
+    try:
+        with open_artifact(path) as f:
+            realm = json.load(f)
+    except (OSError, EOFError, ValueError) as e:
+        raise SystemExit(f"Invalid JSON in {path}: {e}") from e
+
+    if not isinstance(realm, dict):
+        raise SystemExit(f"Invalid realm export {path}: top level is not an object")
+
+    print(f"{path}: valid ({len(realm)} sections)")
+
+
+def _add_validate_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "validate",
+        help="Check that an export (plain, .gz or .zst) is valid JSON.",
+        description="Parse an export completely and check that it is a JSON object.",
+    )
+    parser.add_argument(
+        "export", help="Export file, or realm name in the export directory"
+    )
+    parser.set_defaults(handler=_run_validate)
+
+
+def _run_diff(args: argparse.Namespace) -> None:
+    from pykeycloak_realm.diff import diff_exports
+
+    paths = [_resolve_export_path(name) for name in (args.old, args.new)]
+    for path in paths:
+        if not path.is_file():
+            raise SystemExit(f"Export not found: {path}")
 
-    args = parser.parse_args()
+    sections, changes = diff_exports(*paths)
+
+    for name, kind in sections.items():
+        print(f"{name}: {kind}")
+    if not args.sections:
+        for change in changes:
+            print(change)
+
+    # like diff(1): 1 when the exports differ
+    if sections:
+        raise SystemExit(1)
+
+
+def _add_diff_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "diff",
+        help="Compare two exports section by section.",
+        description="Compare two exports. Sections with equal fingerprints "
+        "(*.fingerprint.json, written by export) are skipped without being read; "
+        "changed sections get a structural diff. Exits with 1 if they differ.",
+    )
+    parser.add_argument(
+        "old", help="Export file, or realm name in the export directory"
+    )
+    parser.add_argument(
+        "new", help="Export file, or realm name in the export directory"
+    )
+    parser.add_argument(
+        "--sections", action="store_true", help="Only list the changed sections"
+    )
+    parser.set_defaults(handler=_run_diff)
+
+
+def _run_lint(args: argparse.Namespace) -> None:
+    from pathlib import Path
+
+    from pykeycloak_realm.config import RealmBuilderConfig
+    from pykeycloak_realm.lint import lint_template
+
+    path = Path(args.template)
+    if not path.is_file():
+        config = RealmBuilderConfig()
+        path = Path(config.template_dir_path) / (
+            f"{args.template}{config.template_file_suffix}"
+        )
+    if not path.is_file():
+        raise SystemExit(f"Template not found: {path}")
+
+    findings = lint_template(path)
+    for finding in findings:
+        print(f"{path}:{finding}")
+
+    if findings:
+        raise SystemExit(1)
+
+
+def _add_lint_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "lint",
+        help="Report unused anchors and cid_alias entries in a template.",
+        description="Scan a template once and report anchors that nothing built "
+        "from realm/envs/hierarchy references, and envs.clients cid_alias "
+        "entries without a $alias. Exits with 1 if anything is found.",
+    )
+    parser.add_argument(
+        "template", help="Template file, or realm name in the templates directory"
+    )
+    parser.set_defaults(handler=_run_lint)
+
+
+def _run_snapshot(args: argparse.Namespace) -> None:
+    from pykeycloak_realm.config import RealmBuilderConfig
+    from pykeycloak_realm.snapshot import check_templates, find_templates
+
+    config = RealmBuilderConfig()
+    templates_dir = args.templates or config.template_dir_path
+    templates = find_templates(templates_dir, config.template_file_suffix)
+    if not templates:
+        raise SystemExit(f"No templates in {templates_dir}")
+
+    results = check_templates(
+        templates,
+        args.golden or config.golden_dir_path,
+        config,
+        update=args.update,
+        jobs=args.jobs,
+    )
+
+    for result in results:
+        print(f"{result.template}: {result.status}")
+        for name, kind in result.sections.items():
+            print(f"  {name}: {kind}")
+        for change in result.changes:
+            print(f"  {change}")
+
+    if any(result.status in ("changed", "missing") for result in results):
+        raise SystemExit(1)
+
+
+def _add_snapshot_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "snapshot",
+        help="Check that templates still build to their golden exports.",
+        description="Build every template of a directory in parallel and compare "
+        "the hash of each output with the fingerprint of its golden export; "
+        "templates whose output differs get a structural diff. Exits with 1 "
+        "if any output differs or has no golden export.",
+    )
+    parser.add_argument(
+        "templates", nargs="?", help="Templates directory (default: configured one)"
+    )
+    parser.add_argument(
+        "--golden",
+        help="Golden exports directory (default: KEYCLOAK_BUILDER_GOLDEN_PATH)",
+    )
+    parser.add_argument(
+        "--update", action="store_true", help="Rewrite the golden exports"
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="Worker processes (default: one per CPU)"
+    )
+    parser.set_defaults(handler=_run_snapshot)
+
+
+def _run_build(args: argparse.Namespace) -> None:
+    import time
+
+    from pykeycloak_realm.config import RealmBuilderConfig
+    from pykeycloak_realm.graph import build_realms
+    from pykeycloak_realm.metrics import write_metrics
+    from pykeycloak_realm.realm_refs import RealmRefError
+    from pykeycloak_realm.snapshot import find_templates
+
+    config = RealmBuilderConfig()
+    names = [
+        path.name.removesuffix(config.template_file_suffix)
+        for path in find_templates(
+            config.template_dir_path, config.template_file_suffix
+        )
+    ]
+    if not names:
+        raise SystemExit(f"No templates in {config.template_dir_path}")
+
+    started = time.perf_counter()
+    try:
+        results = build_realms(
+            args.templates or names,
+            config,
+            jobs=args.jobs,
+            force=args.force,
+            available=names if args.templates else (),
+        )
+    except (RealmRefError, ValueError, FileNotFoundError) as e:
+        # a cycle or a reference to a missing template: nothing was built
+        raise SystemExit(str(e)) from e
+    elapsed = time.perf_counter() - started
+
+    for result in results:
+        timing = f" ({result.seconds:.2f} s)" if result.status == "built" else ""
+        print(f"{result.template}: {result.status}{timing}")
+        if result.error:
+            print(f"  {result.error}")
+    print(f"{len(results)} realms in {elapsed:.2f} s")
+
+    metrics_path = args.metrics or config.metrics_path
+    if metrics_path:
+        # realms that were not built this time have no metrics
+        write_metrics(
+            metrics_path,
+            {r.template: r.metrics for r in results if r.metrics is not None},
+        )
+
+    if any(result.status in ("failed", "skipped") for result in results):
+        raise SystemExit(1)
+
+
+def _add_build_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "build",
+        help="Export realms in the order their !ref references need.",
+        description="Export the given realms (default: every template), the "
+        "realms they reference and the realms that reference them. Realms "
+        "are built once the realms they reference are, independent ones in "
+        "parallel; referenced values are passed on in memory. Realms whose "
+        "template, secrets and referenced values did not change are not "
+        "built again. Exits with 1 on a dependency cycle or a failed build.",
+    )
+    parser.add_argument(
+        "templates", nargs="*", help="Realm names (default: every template)"
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="Worker processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Build unchanged realms too"
+    )
+    _add_metrics_argument(parser)
+    parser.set_defaults(handler=_run_build)
+
+
+def _run_deploy(args: argparse.Namespace) -> None:
+    import time
+
+    from pykeycloak_realm.config import KeycloakAdminConfig, RealmBuilderConfig
+    from pykeycloak_realm.snapshot import find_templates
+    from pykeycloak_realm.upload import KeycloakAdmin, deploy_realms
+
+    if args.uploaders < 1 or args.queue < 1:
+        raise SystemExit("--uploaders and --queue must be at least 1")
+
+    config = RealmBuilderConfig()
+    templates = args.templates or [
+        path.name.removesuffix(config.template_file_suffix)
+        for path in find_templates(
+            config.template_dir_path, config.template_file_suffix
+        )
+    ]
+    if not templates:
+        raise SystemExit(f"No templates in {config.template_dir_path}")
+
+    started = time.perf_counter()
+    results = deploy_realms(
+        templates,
+        KeycloakAdmin(KeycloakAdminConfig()),
+        config,
+        builders=args.builders,
+        uploaders=args.uploaders,
+        queue_size=args.queue,
+        force=args.force,
+        without_users=args.without_users,
+    )
+    elapsed = time.perf_counter() - started
+
+    for result in results:
+        print(
+            f"{result.template}: {result.status} (build {result.build_seconds:.2f} s, "
+            f"upload {result.upload_seconds:.2f} s)"
+        )
+        if result.error:
+            print(f"  {result.error}")
+    print(f"{len(results)} realms in {elapsed:.2f} s")
+
+    if any(result.status.endswith("failed") for result in results):
+        raise SystemExit(1)
+
+
+def _add_deploy_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "deploy",
+        help="Build realms and upload them to Keycloak, overlapping both.",
+        description="Build templates in worker processes and upload each realm "
+        "through the admin REST API (KEYCLOAK_ADMIN_URL) as soon as it is built. "
+        "Realms deployed with the same fingerprint are skipped. Exits with 1 if "
+        "any build or upload fails.",
+    )
+    parser.add_argument(
+        "templates", nargs="*", help="Realm names (default: every template)"
+    )
+    parser.add_argument(
+        "--builders", type=int, help="Builder processes (default: one per CPU)"
+    )
+    parser.add_argument("--uploaders", type=int, default=2, help="Upload threads")
+    parser.add_argument(
+        "--queue", type=int, default=2, help="Built realms waiting for an uploader"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Upload unchanged realms too"
+    )
+    parser.add_argument(
+        "--without-users",
+        action="store_true",
+        help="Leave the users out, to provision them afterwards (see provision)",
+    )
+    parser.set_defaults(handler=_run_deploy)
+
+
+def _run_provision(args: argparse.Namespace) -> None:
+    from pykeycloak_realm.config import KeycloakAdminConfig
+    from pykeycloak_realm.export_reader import ExportReader
+    from pykeycloak_realm.provision import provision_users
+    from pykeycloak_realm.upload import KeycloakAdmin
+
+    path = _resolve_export_path(args.source)
+    if not path.is_file():
+        raise SystemExit(f"Source not found: {path}")
+    realm = args.realm
+    if realm is None and not path.name.endswith(".jsonl"):
+        with ExportReader(path) as reader:
+            realm = reader.section("realm")
+    if not realm:
+        raise SystemExit(f"No realm name in {path}, pass --realm")
+
+    result = provision_users(
+        KeycloakAdmin(KeycloakAdminConfig()),
+        realm,
+        path,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        if_exists=args.if_exists,
+        restart=args.restart,
+    )
+    print(
+        f"{realm}: {result.imported} batches imported, {result.resumed} resumed, "
+        f"of {result.batches} in {result.seconds:.2f} s ({result.added} users added, "
+        f"{result.overwritten} overwritten, {result.skipped} skipped)"
+    )
+    if result.error:
+        print(f"  batch {result.failed_batch}: {result.error}")
+        raise SystemExit(1)
+
+
+def _add_provision_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "provision",
+        help="Import the users of an export into an existing realm in batches.",
+        description="Stream users from an export or a user shard (JSON with a "
+        "users list, or .jsonl with one user per line) and send them in batches "
+        "to the partialImport endpoint (KEYCLOAK_ADMIN_URL), a few at a time. "
+        "Finished batches are recorded in <source>.provision.json; running the "
+        "command again resumes after an interruption. Exits with 1 if a batch "
+        "fails.",
+    )
+    parser.add_argument(
+        "source", help="Export or shard file, or realm name in the export directory"
+    )
+    parser.add_argument("--realm", help="Target realm (default: the export's)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Users per batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches in flight")
+    parser.add_argument(
+        "--if-exists",
+        choices=["FAIL", "SKIP", "OVERWRITE"],
+        default="OVERWRITE",
+        help="What Keycloak does with users that already exist",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint")
+    parser.set_defaults(handler=_run_provision)
+
+
+def _run_loadtest(args: argparse.Namespace) -> None:
+    from pykeycloak_realm.builder import create_realm_config_file
+    from pykeycloak_realm.config import KeycloakAdminConfig, RealmBuilderConfig
+    from pykeycloak_realm.loadtest import (
+        LoadTestError,
+        confidential_clients,
+        run_load_test,
+        token_url,
+    )
+
+    if args.requests < 1 or args.concurrency < 1:
+        raise SystemExit("--requests and --concurrency must be at least 1")
+
+    realm = create_realm_config_file(
+        template_name=args.template, config=RealmBuilderConfig()
+    )
+    name = realm.get("realm") or args.template
+    clients = [
+        (client_id, secret)
+        for client_id, secret in confidential_clients(realm)
+        if not args.client or client_id in args.client
+    ]
+    url = token_url(KeycloakAdminConfig().url, name)
+    try:
+        result = run_load_test(
+            url, clients, args.requests, args.concurrency, args.timeout
+        )
+    except LoadTestError as e:
+        raise SystemExit(f"{name}: {e}") from e
+
+    print(
+        f"{name}: {result.requests} requests from {len(clients)} clients in "
+        f"{result.seconds:.2f} s ({result.throughput:.1f}/s) over "
+        f"{result.connections} connections, {result.failures} failed"
+    )
+    print(
+        f"  latency p50 {result.p50 * 1000:.1f} ms, p95 {result.p95 * 1000:.1f} ms, "
+        f"p99 {result.p99 * 1000:.1f} ms"
+    )
+    if result.failures:
+        statuses = ", ".join(
+            f"{k or 'no response'}: {v}" for k, v in result.statuses.items()
+        )
+        print(f"  statuses: {statuses}")
+        raise SystemExit(1)
+
+
+def _add_loadtest_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "loadtest",
+        help="Request tokens for the confidential clients of a realm under load.",
+        description="Build the realm and send client_credentials token requests "
+        "for its confidential clients (secrets from envs.clients) to "
+        "KEYCLOAK_ADMIN_URL, from concurrent connections that are kept open. "
+        "Reports throughput and p50/p95/p99 latency; exits with 1 if a request "
+        "fails.",
+    )
+    parser.add_argument("template", help="Realm name, e.g. 'otago'")
+    parser.add_argument(
+        "--requests", type=int, default=1000, help="Token requests in total"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=16, help="Connections in parallel"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10.0, help="Seconds per request"
+    )
+    parser.add_argument(
+        "--client",
+        action="append",
+        help="Only this clientId (repeatable; default: all confidential clients)",
+    )
+    parser.set_defaults(handler=_run_loadtest)
+
+
+def _live_snapshot_path(realm: str) -> Path:
+    from pykeycloak_realm.config import RealmBuilderConfig
+
+    return RealmBuilderConfig().get_realm_filename(f"{realm}.live")
+
+
+def _pull(realm: str, concurrency: int) -> Path:
+    from pykeycloak_realm.config import KeycloakAdminConfig
+    from pykeycloak_realm.live import pull_snapshot
+    from pykeycloak_realm.upload import KeycloakAdmin, KeycloakError
+
+    snapshot = _live_snapshot_path(realm)
+    try:
+        sections, stats = pull_snapshot(
+            KeycloakAdmin(KeycloakAdminConfig()), realm, snapshot, concurrency
+        )
+    except KeycloakError as e:
+        raise SystemExit(f"Could not pull {realm}: {e}") from e
+
+    print(
+        f"{realm}: {stats.requests} requests ({stats.not_modified} not modified, "
+        f"{stats.unchanged} unchanged, {stats.changed} changed) -> {snapshot}"
+    )
+    for name, kind in sections.items():
+        print(f"  {name}: {kind}")
+    return snapshot
+
+
+def _run_pull(args: argparse.Namespace) -> None:
+    _pull(args.realm, args.concurrency)
+
+
+def _add_pull_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "pull",
+        help="Fetch a live realm from Keycloak into <realm>.live.realm.json.",
+        description="Fetch the realm, clients (with roles and authorization "
+        "settings), realm roles, groups and users through the admin API "
+        "(KEYCLOAK_ADMIN_URL) with a bounded number of concurrent requests, and "
+        "store them as an export next to the built ones. Responses are cached "
+        "with their ETags and hashes; the snapshot is only rewritten when one "
+        "of them changed.",
+    )
+    parser.add_argument("realm", help="Realm name")
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent requests"
+    )
+    parser.set_defaults(handler=_run_pull)
+
+
+def _run_drift(args: argparse.Namespace) -> None:
+    import json
+
+    from pykeycloak_realm.artifacts import open_artifact
+    from pykeycloak_realm.live import drift_report
+
+    path = _resolve_export_path(args.export)
+    if not path.is_file():
+        raise SystemExit(f"Export not found: {path}")
+    with open_artifact(path) as f:
+        export = json.load(f)
+    realm = export.get("realm") or args.export
+
+    snapshot = _live_snapshot_path(realm)
+    if not args.cached:
+        snapshot = _pull(realm, args.concurrency)
+    elif not snapshot.is_file():
+        raise SystemExit(f"No live snapshot of {realm}: {snapshot}")
+    with snapshot.open(encoding="utf-8") as f:
+        live = json.load(f)
+
+    changes = drift_report(export, live)
+    for change in changes:
+        print(change)
+
+    # like diff: 1 when the live realm drifted from the export
+    if changes:
+        raise SystemExit(1)
+
+
+def _add_drift_parser(subparsers: argparse._SubParsersAction[Any]) -> None:
+    parser = subparsers.add_parser(
+        "drift",
+        help="Compare a live realm with its export.",
+        description="Pull the live realm (see pull) and diff it with the export. "
+        "Only what the export declares is compared: settings Keycloak fills in "
+        "are ignored, records the export does not have (except the ones "
+        "Keycloak creates itself) are reported. Exits with 1 on drift.",
+    )
+    parser.add_argument(
+        "export", help="Export file, or realm name in the export directory"
+    )
+    parser.add_argument(
+        "--cached", action="store_true", help="Use the last pulled snapshot"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent requests"
+    )
+    parser.set_defaults(handler=_run_drift)
+
+
+COMMANDS: dict[str, Callable[[argparse._SubParsersAction[Any]], None]] = {
+    "export": _add_export_parser,
+    "query": _add_query_parser,
+    "diff": _add_diff_parser,
+    "validate": _add_validate_parser,
+    "lint": _add_lint_parser,
+    "snapshot": _add_snapshot_parser,
+    "build": _add_build_parser,
+    "deploy": _add_deploy_parser,
+    "provision": _add_provision_parser,
+    "loadtest": _add_loadtest_parser,
+    "pull": _add_pull_parser,
+    "drift": _add_drift_parser,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Build, inspect and deploy Keycloak realms from templates."
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+
+    for add_parser in COMMANDS.values():
+        add_parser(subparsers)
+
+    return parser
+
+
+def _with_default_command(argv: list[str]) -> list[str]:
+    # `realm.py --from-realm x --to-realm y` predates subcommands
+    if argv and (argv[0] in COMMANDS or argv[0] in ("-h", "--help")):
+        return argv
+
+    return [DEFAULT_COMMAND, *argv]
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(
+        _with_default_command(sys.argv[1:] if argv is None else argv)
+    )
+
+    import logging
 
     logging.basicConfig(
         level=logging.DEBUG,
         format="%(levelname)s: %(name)s ---> %(asctime)s ====  %(message)s",
     )
 
-    export(
-        from_template=args.from_realm,
-        to_file=args.to_realm,
-        config=RealmBuilderConfig(),
-    )
+    args.handler(args)
 
 
 if __name__ == "__main__":
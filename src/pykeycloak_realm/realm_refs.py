@@ -0,0 +1,121 @@
+import json
+import os
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pykeycloak_realm.artifacts import find_artifact, open_artifact
+from pykeycloak_realm.diff import RECORD_KEYS
+from pykeycloak_realm.model import SlotModel, to_json
+
+JsonDict = dict[str, Any]
+
+# Cross-realm references are written in templates as `!ref <realm>/<path>`,
+# e.g. `!ref partner/clients/broker/secret`: the value at <path> in the built
+# output of the template <realm>. A path segment is a key of a mapping, or
+# in a list the record whose clientId, username, alias, name or id (the
+# first that matches) is the segment, or an index. References stay
+# unresolved until the realm they point to is built.
+
+
+class RealmRefError(LookupError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class RealmRef:
+    realm: str
+    path: tuple[str, ...]
+
+    def __str__(self) -> str:
+        return "!ref " + "/".join((self.realm, *self.path))
+
+
+Resolver = Callable[[RealmRef], Any]
+
+
+def parse_ref(text: str) -> RealmRef:
+    realm, *path = text.strip().strip("/").split("/")
+    if not realm or not path or not all(path):
+        raise ValueError(f"Invalid realm reference {text!r}, expected <realm>/<path>")
+    return RealmRef(realm, tuple(path))
+
+
+def find_refs(data: Any, kind: type[Any] = RealmRef) -> list[tuple[Any, Any, Any]]:
+    # (container, key, reference) of every `kind` reference in `data`
+    found = []
+    stack = [data]
+    seen: set[int] = set()
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        items = enumerate(node) if isinstance(node, list) else node.items()
+        for key, value in items:
+            if isinstance(value, kind):
+                found.append((node, key, value))
+            elif isinstance(value, (dict, list, SlotModel)):
+                stack.append(value)
+    return found
+
+
+def dependencies(data: Any) -> set[str]:
+    return {ref.realm for _, _, ref in find_refs(data)}
+
+
+def _record(items: list[Any], segment: str) -> Any:
+    for key in RECORD_KEYS:
+        for item in items:
+            if isinstance(item, (dict, SlotModel)) and item.get(key) == segment:
+                return item
+    if segment.isdigit() and int(segment) < len(items):
+        return items[int(segment)]
+    raise KeyError(segment)
+
+
+def lookup(realm: Any, ref: RealmRef) -> Any:
+    # plain JSON data, also when the realm holds slotted models
+    value = realm
+    for i, segment in enumerate(ref.path):
+        try:
+            if isinstance(value, list):
+                value = _record(value, segment)
+            elif isinstance(value, (dict, SlotModel)):
+                value = value[segment]
+            else:
+                raise KeyError(segment)
+        except KeyError:
+            where = "/".join((ref.realm, *ref.path[:i]))
+            raise RealmRefError(f"{ref}: no {segment!r} in {where}") from None
+    return json.loads(json.dumps(value, default=to_json))
+
+
+def resolve_realm_refs(data: Any, resolve: Resolver | None) -> int:
+    slots = find_refs(data)
+    if not slots:
+        return 0
+    if resolve is None:
+        raise RealmRefError(f"Unresolved reference {slots[0][2]}")
+    for container, key, ref in slots:
+        container[key] = resolve(ref)
+    return len(slots)
+
+
+class ExportValues:
+    # Resolves references from the exports of a directory, e.g. when one
+    # realm is built on its own after the realms it references.
+    def __init__(self, directory: str | os.PathLike[str], suffix: str) -> None:
+        self.directory = Path(directory)
+        self.suffix = suffix
+        self._exports: dict[str, JsonDict] = {}
+
+    def __call__(self, ref: RealmRef) -> Any:
+        if ref.realm not in self._exports:
+            path = find_artifact(self.directory / f"{ref.realm}{self.suffix}")
+            if not path.is_file():
+                raise RealmRefError(f"{ref}: {ref.realm} is not built ({path})")
+            with open_artifact(path) as f:
+                self._exports[ref.realm] = json.load(f)
+        return lookup(self._exports[ref.realm], ref)
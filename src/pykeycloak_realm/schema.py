@@ -0,0 +1,505 @@
+from collections.abc import Callable
+from functools import cache
+from typing import Any
+
+from pykeycloak_realm.model import SlotModel
+
+JsonDict = dict[str, Any]
+
+# Schema of the part of the realm representation the templates use, written
+# in a small JSON Schema subset: type, enum, properties, additionalProperties,
+# items and required. It is compiled once into nested validator functions;
+# validating a realm calls them without looking at the schema again. Keys of
+# closed objects (additionalProperties: False) are checked for typos, sections
+# outside the subset are accepted as they are.
+#
+# null is accepted for every field, as it is by Keycloak.
+
+Errors = list[str]
+Validator = Callable[[Any, str, Errors], None]
+
+STRING = {"type": "string"}
+BOOLEAN = {"type": "boolean"}
+INTEGER = {"type": "integer"}
+STRINGS = {"type": "array", "items": STRING}
+# attribute values are sent as strings, scalars are converted by Keycloak
+ATTRIBUTE = {"type": ["string", "number", "boolean"]}
+DECISION_STRATEGY = {"enum": ["UNANIMOUS", "AFFIRMATIVE", "CONSENSUS"]}
+
+ROLE = {
+    "type": "object",
+    "required": ["name"],
+    "properties": {
+        "id": STRING,
+        "name": STRING,
+        "description": STRING,
+        "scopeParamRequired": BOOLEAN,
+        "composite": BOOLEAN,
+        "composites": {
+            "type": "object",
+            "properties": {
+                "realm": STRINGS,
+                "client": {"type": "object", "additionalProperties": STRINGS},
+            },
+            "additionalProperties": False,
+        },
+        "clientRole": BOOLEAN,
+        "containerId": STRING,
+        "attributes": {"type": "object", "additionalProperties": STRINGS},
+    },
+    "additionalProperties": False,
+}
+
+ROLES = {
+    "type": "object",
+    "properties": {
+        "realm": {"type": "array", "items": ROLE},
+        "client": {
+            "type": "object",
+            "additionalProperties": {"type": "array", "items": ROLE},
+        },
+    },
+    "additionalProperties": False,
+}
+
+RESOURCE = {
+    "type": "object",
+    "required": ["name"],
+    "properties": {
+        "_id": STRING,
+        "name": STRING,
+        "displayName": STRING,
+        "type": STRING,
+        "uri": STRING,
+        "uris": STRINGS,
+        "icon_uri": STRING,
+        "owner": {},
+        "ownerManagedAccess": BOOLEAN,
+        "attributes": {"type": "object", "additionalProperties": STRINGS},
+        "scopes": {"type": "array"},
+    },
+    "additionalProperties": False,
+}
+
+POLICY = {
+    "type": "object",
+    "required": ["name", "type"],
+    "properties": {
+        "id": STRING,
+        "name": STRING,
+        "description": STRING,
+        "type": STRING,
+        "logic": {"enum": ["POSITIVE", "NEGATIVE"]},
+        "decisionStrategy": DECISION_STRATEGY,
+        "owner": STRING,
+        "policies": STRINGS,
+        "resources": STRINGS,
+        "scopes": STRINGS,
+        "resourceType": STRING,
+        # role, client and group lists must already be encoded to strings
+        "config": {"type": "object", "additionalProperties": STRING},
+    },
+    "additionalProperties": False,
+}
+
+SCOPE = {
+    "type": "object",
+    "required": ["name"],
+    "properties": {
+        "id": STRING,
+        "name": STRING,
+        "displayName": STRING,
+        "iconUri": STRING,
+        "policies": {"type": "array"},
+        "resources": {"type": "array"},
+    },
+    "additionalProperties": False,
+}
+
+AUTHORIZATION_SETTINGS = {
+    "type": "object",
+    "properties": {
+        "id": STRING,
+        "clientId": STRING,
+        "name": STRING,
+        "allowRemoteResourceManagement": BOOLEAN,
+        "policyEnforcementMode": {"enum": ["ENFORCING", "PERMISSIVE", "DISABLED"]},
+        "decisionStrategy": DECISION_STRATEGY,
+        "resources": {"type": "array", "items": RESOURCE},
+        "policies": {"type": "array", "items": POLICY},
+        "scopes": {"type": "array", "items": SCOPE},
+        "authorizationSchema": {"type": "object"},
+    },
+    "additionalProperties": False,
+}
+
+CLIENT = {
+    "type": "object",
+    "required": ["clientId"],
+    "properties": {
+        "id": STRING,
+        "clientId": STRING,
+        "name": STRING,
+        "description": STRING,
+        "type": STRING,
+        "rootUrl": STRING,
+        "adminUrl": STRING,
+        "baseUrl": STRING,
+        "surrogateAuthRequired": BOOLEAN,
+        "enabled": BOOLEAN,
+        "alwaysDisplayInConsole": BOOLEAN,
+        "clientAuthenticatorType": STRING,
+        "secret": STRING,
+        "registrationAccessToken": STRING,
+        "defaultRoles": STRINGS,
+        "redirectUris": STRINGS,
+        "webOrigins": STRINGS,
+        "notBefore": INTEGER,
+        "bearerOnly": BOOLEAN,
+        "consentRequired": BOOLEAN,
+        "standardFlowEnabled": BOOLEAN,
+        "implicitFlowEnabled": BOOLEAN,
+        "directAccessGrantsEnabled": BOOLEAN,
+        "serviceAccountsEnabled": BOOLEAN,
+        "authorizationServicesEnabled": BOOLEAN,
+        "directGrantsOnly": BOOLEAN,
+        "publicClient": BOOLEAN,
+        "frontchannelLogout": BOOLEAN,
+        "protocol": STRING,
+        "attributes": {"type": "object", "additionalProperties": ATTRIBUTE},
+        "authenticationFlowBindingOverrides": {
+            "type": "object",
+            "additionalProperties": STRING,
+        },
+        "fullScopeAllowed": BOOLEAN,
+        "nodeReRegistrationTimeout": INTEGER,
+        "registeredNodes": {"type": "object", "additionalProperties": INTEGER},
+        "protocolMappers": {"type": "array", "items": {"type": "object"}},
+        "defaultClientScopes": STRINGS,
+        "optionalClientScopes": STRINGS,
+        "authorizationSettings": AUTHORIZATION_SETTINGS,
+        "access": {"type": "object", "additionalProperties": BOOLEAN},
+        "origin": STRING,
+    },
+    "additionalProperties": False,
+}
+
+CREDENTIAL = {
+    "type": "object",
+    "properties": {
+        "id": STRING,
+        "type": STRING,
+        "userLabel": STRING,
+        "createdDate": INTEGER,
+        "secretData": STRING,
+        "credentialData": STRING,
+        "priority": INTEGER,
+        "value": STRING,
+        "temporary": BOOLEAN,
+    },
+}
+
+USER = {
+    "type": "object",
+    "required": ["username"],
+    "properties": {
+        "id": STRING,
+        "username": STRING,
+        "email": STRING,
+        "firstName": STRING,
+        "lastName": STRING,
+        "enabled": BOOLEAN,
+        "emailVerified": BOOLEAN,
+        "createdTimestamp": INTEGER,
+        "totp": BOOLEAN,
+        "attributes": {"type": "object", "additionalProperties": STRINGS},
+        "credentials": {"type": "array", "items": CREDENTIAL},
+        "realmRoles": STRINGS,
+        "clientRoles": {"type": "object", "additionalProperties": STRINGS},
+        "groups": STRINGS,
+        "requiredActions": STRINGS,
+        "disableableCredentialTypes": STRINGS,
+        "notBefore": INTEGER,
+        "federationLink": STRING,
+        "serviceAccountClientId": STRING,
+        "federatedIdentities": {"type": "array", "items": {"type": "object"}},
+        "clientConsents": {"type": "array", "items": {"type": "object"}},
+        "access": {"type": "object", "additionalProperties": BOOLEAN},
+        "origin": STRING,
+        "self": STRING,
+    },
+    "additionalProperties": False,
+}
+
+# top-level keys of the realm representation; sections other than clients,
+# roles and users are not checked further
+REALM_KEYS = (
+    "id realm displayName displayNameHtml notBefore defaultSignatureAlgorithm "
+    "revokeRefreshToken refreshTokenMaxReuse accessTokenLifespan "
+    "accessTokenLifespanForImplicitFlow ssoSessionIdleTimeout ssoSessionMaxLifespan "
+    "ssoSessionIdleTimeoutRememberMe ssoSessionMaxLifespanRememberMe "
+    "offlineSessionIdleTimeout offlineSessionMaxLifespanEnabled "
+    "offlineSessionMaxLifespan clientSessionIdleTimeout clientSessionMaxLifespan "
+    "clientOfflineSessionIdleTimeout clientOfflineSessionMaxLifespan "
+    "accessCodeLifespan accessCodeLifespanUserAction accessCodeLifespanLogin "
+    "actionTokenGeneratedByAdminLifespan actionTokenGeneratedByUserLifespan "
+    "actionTokenGeneratedByUserLifespanOverrides oauth2DeviceCodeLifespan "
+    "oauth2DevicePollingInterval enabled sslRequired passwordCredentialGrantAllowed "
+    "registrationAllowed registrationEmailAsUsername rememberMe verifyEmail "
+    "loginWithEmailAllowed duplicateEmailsAllowed resetPasswordAllowed "
+    "editUsernameAllowed userCacheEnabled realmCacheEnabled bruteForceProtected "
+    "permanentLockout maxTemporaryLockouts bruteForceStrategy maxFailureWaitSeconds "
+    "minimumQuickLoginWaitSeconds waitIncrementSeconds quickLoginCheckMilliSeconds "
+    "maxDeltaTimeSeconds failureFactor privateKey publicKey certificate codeSecret "
+    "roles groups defaultRoles defaultRole adminPermissionsClient defaultGroups "
+    "requiredCredentials passwordPolicy otpPolicyType otpPolicyAlgorithm "
+    "otpPolicyInitialCounter otpPolicyDigits otpPolicyLookAheadWindow "
+    "otpPolicyPeriod otpPolicyCodeReusable otpSupportedApplications "
+    "localizationTexts webAuthnPolicyRpEntityName webAuthnPolicySignatureAlgorithms "
+    "webAuthnPolicyRpId webAuthnPolicyAttestationConveyancePreference "
+    "webAuthnPolicyAuthenticatorAttachment webAuthnPolicyRequireResidentKey "
+    "webAuthnPolicyUserVerificationRequirement webAuthnPolicyCreateTimeout "
+    "webAuthnPolicyAvoidSameAuthenticatorRegister webAuthnPolicyAcceptableAaguids "
+    "webAuthnPolicyExtraOrigins webAuthnPolicyPasswordlessRpEntityName "
+    "webAuthnPolicyPasswordlessSignatureAlgorithms webAuthnPolicyPasswordlessRpId "
+    "webAuthnPolicyPasswordlessAttestationConveyancePreference "
+    "webAuthnPolicyPasswordlessAuthenticatorAttachment "
+    "webAuthnPolicyPasswordlessRequireResidentKey "
+    "webAuthnPolicyPasswordlessUserVerificationRequirement "
+    "webAuthnPolicyPasswordlessCreateTimeout "
+    "webAuthnPolicyPasswordlessAvoidSameAuthenticatorRegister "
+    "webAuthnPolicyPasswordlessAcceptableAaguids "
+    "webAuthnPolicyPasswordlessExtraOrigins webAuthnPolicyPasswordlessPasskeysEnabled "
+    "clientProfiles clientPolicies users federatedUsers scopeMappings "
+    "clientScopeMappings clients clientScopes defaultDefaultClientScopes "
+    "defaultOptionalClientScopes browserSecurityHeaders smtpServer "
+    "userFederationProviders userFederationMappers loginTheme accountTheme "
+    "adminTheme emailTheme eventsEnabled eventsExpiration eventsListeners "
+    "enabledEventTypes adminEventsEnabled adminEventsDetailsEnabled "
+    "identityProviders identityProviderMappers protocolMappers components "
+    "internationalizationEnabled supportedLocales defaultLocale "
+    "authenticationFlows authenticatorConfig requiredActions browserFlow "
+    "registrationFlow directGrantFlow resetCredentialsFlow clientAuthenticationFlow "
+    "dockerAuthenticationFlow firstBrokerLoginFlow attributes keycloakVersion "
+    "userManagedAccessAllowed organizationsEnabled organizations "
+    "verifiableCredentialsEnabled adminPermissionsEnabled"
+).split()
+
+REALM_SCHEMA = {
+    "type": "object",
+    "required": ["realm"],
+    "properties": {key: {} for key in REALM_KEYS}
+    | {
+        "realm": STRING,
+        "enabled": BOOLEAN,
+        "clients": {"type": "array", "items": CLIENT},
+        "roles": ROLES,
+        "users": {"type": "array", "items": USER},
+    },
+    "additionalProperties": False,
+}
+
+
+class SchemaValidationError(ValueError):
+    def __init__(self, errors: Errors) -> None:
+        self.errors = errors
+        lines = "\n".join(f"  {e}" for e in errors)
+        super().__init__(f"Realm does not match the schema ({len(errors)}):\n{lines}")
+
+
+TYPES: dict[str, tuple[type, ...]] = {
+    "string": (str,),
+    "boolean": (bool,),
+    "integer": (int,),
+    "number": (int, float),
+    "object": (dict, SlotModel),
+    "array": (list,),
+}
+
+SCALARS = frozenset({"string", "boolean", "integer", "number"})
+
+
+def _key_path(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _json_type(value: Any) -> str:
+    match value:
+        case bool():
+            return "boolean"
+        case int() | float():
+            return "number"
+        case str():
+            return "string"
+        case list():
+            return "array"
+        case dict() | SlotModel():
+            return "object"
+        case _:
+            return type(value).__name__
+
+
+class _Type:
+    # isinstance() check for one or more JSON types, with the exact classes
+    # kept apart for the common case: `type(v) in exact` is a set lookup and
+    # does not let bool pass for an integer.
+    __slots__ = ("types", "exact", "reject_bool", "expected")
+
+    def __init__(self, names: list[str]) -> None:
+        self.types = tuple(t for name in names for t in TYPES[name])
+        self.exact = frozenset(self.types)
+        self.reject_bool = bool not in self.types
+        self.expected = " or ".join(names)
+
+    def matches(self, value: Any) -> bool:
+        if type(value) in self.exact:
+            return True
+        return isinstance(value, self.types) and not (
+            self.reject_bool and isinstance(value, bool)
+        )
+
+    def error(self, path: str, value: Any) -> str:
+        return f"{path or 'realm'}: expected {self.expected}, got {_json_type(value)}"
+
+
+def _type_of(schema: JsonDict) -> _Type | None:
+    if "type" not in schema:
+        return None
+    names = schema["type"]
+    return _Type(names if isinstance(names, list) else [names])
+
+
+def _scalar_type(schema: JsonDict) -> _Type | None:
+    # schemas that only name scalar types are checked inline by their parent
+    if set(schema) != {"type"}:
+        return None
+    names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    return _Type(names) if SCALARS.issuperset(names) else None
+
+
+def _accept(value: Any, path: str, errors: Errors) -> None:
+    pass
+
+
+def _unknown_key(value: Any, path: str, errors: Errors) -> None:
+    errors.append(f"{path}: unknown key")
+
+
+OBJECT = _Type(["object"])
+ARRAY = _Type(["array"])
+
+
+def compile_schema(schema: JsonDict) -> Validator:
+    if not schema:
+        return _accept
+
+    checks: list[Validator] = []
+    if "properties" in schema or "additionalProperties" in schema:
+        checks.append(_compile_object(schema))
+    if "items" in schema:
+        checks.append(_compile_items(schema["items"]))
+
+    # object and array validators check their own type
+    type_ = _type_of(schema)
+    if checks and type_ is not None and type_.expected in ("object", "array"):
+        type_ = None
+
+    if "enum" in schema:
+        allowed = frozenset(schema["enum"])
+        listed = ", ".join(schema["enum"])
+
+        def check_enum(value: Any, path: str, errors: Errors) -> None:
+            if value not in allowed:
+                errors.append(f"{path}: {value!r} is not one of {listed}")
+
+        checks.append(check_enum)
+
+    if type_ is None and len(checks) == 1:
+        return checks[0]
+
+    def check(value: Any, path: str, errors: Errors) -> None:
+        # the other checks only run on a value of the right type
+        if type_ is not None and not type_.matches(value):
+            errors.append(type_.error(path, value))
+            return
+        for nested in checks:
+            nested(value, path, errors)
+
+    return check
+
+
+def _compile_items(schema: JsonDict) -> Validator:
+    scalar = _scalar_type(schema)
+    item = None if scalar is not None else compile_schema(schema)
+
+    def check_items(value: Any, path: str, errors: Errors) -> None:
+        if value.__class__ is not list:
+            errors.append(ARRAY.error(path, value))
+        elif scalar is not None:
+            exact = scalar.exact
+            for i, v in enumerate(value):
+                if type(v) not in exact and v is not None and not scalar.matches(v):
+                    errors.append(scalar.error(f"{path}[{i}]", v))
+        elif item is not _accept:
+            for i, v in enumerate(value):
+                if v is not None:
+                    item(v, f"{path}[{i}]", errors)  # type: ignore[misc]
+
+    return check_items
+
+
+def _compile_object(schema: JsonDict) -> Validator:
+    # One lookup per key gives what to do with its value: None (nothing to
+    # check), a scalar _Type checked inline, or a nested validator that gets
+    # the key's path. Paths are only built on errors and on the way into
+    # nested values.
+    plan: dict[str, _Type | Validator | None] = {
+        key: _plan(sub) for key, sub in schema.get("properties", {}).items()
+    }
+    additional = schema.get("additionalProperties", True)
+    default = _unknown_key if additional is False else _plan(additional)
+    required = tuple(schema.get("required", ()))
+
+    def check_object(value: Any, path: str, errors: Errors) -> None:
+        if not isinstance(value, dict | SlotModel):
+            errors.append(OBJECT.error(path, value))
+            return
+        for key, v in value.items():
+            entry = plan.get(key, default)
+            if entry is None:
+                continue
+            if v is None:
+                # null means unset for a known key, but is no excuse for a typo
+                if entry is _unknown_key:
+                    _unknown_key(v, _key_path(path, key), errors)
+                continue
+            if entry.__class__ is _Type:
+                if type(v) not in entry.exact and not entry.matches(v):
+                    errors.append(entry.error(_key_path(path, key), v))
+            else:
+                entry(v, _key_path(path, key), errors)  # type: ignore[operator]
+        for key in required:
+            if value.get(key) is None:
+                errors.append(f"{_key_path(path, key)}: required")
+
+    return check_object
+
+
+def _plan(schema: Any) -> _Type | Validator | None:
+    if not isinstance(schema, dict) or not schema:
+        return None
+    scalar = _scalar_type(schema)
+    if scalar is not None:
+        return scalar
+    return compile_schema(schema)
+
+
+@cache
+def realm_validator() -> Validator:
+    return compile_schema(REALM_SCHEMA)
+
+
+def validate_realm(realm: JsonDict) -> Errors:
+    errors: Errors = []
+    realm_validator()(realm, "", errors)
+    return errors
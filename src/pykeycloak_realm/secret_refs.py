@@ -0,0 +1,220 @@
+import logging
+import os
+import shlex
+import subprocess  # noqa: S404
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Collection
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from pykeycloak_realm.model import SlotModel
+
+logger = logging.getLogger(__name__)
+
+# Secret references are written in templates as YAML tags (`!env NAME`,
+# `!file path`, `!file path#key`, `!cmd key`) and stay unresolved until
+# build time. Every backend receives all of its keys in one call and keeps
+# the values for the lifetime of the process.
+
+
+SECRET_MASK = "**********"  # noqa: S105
+
+
+class SecretResolutionError(LookupError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class SecretRef:
+    backend: str
+    key: str
+
+
+class SecretBackend(ABC):
+    def __init__(self) -> None:
+        self._cache: dict[str, str] = {}
+        self.calls = 0
+
+    def make_ref(self, tag: str, key: str, origin: Path | None) -> SecretRef:
+        return SecretRef(tag, key)
+
+    def resolve_many(self, keys: Collection[str]) -> dict[str, str]:
+        missing = [k for k in keys if k not in self._cache]
+        if missing:
+            self.calls += 1
+            self._cache.update(self._fetch(missing))
+
+        unresolved = [k for k in keys if k not in self._cache]
+        if unresolved:
+            raise SecretResolutionError(
+                f"{type(self).__name__} could not resolve: {', '.join(sorted(unresolved))}"
+            )
+
+        return {k: self._cache[k] for k in keys}
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+        self.calls = 0
+
+    @abstractmethod
+    def _fetch(self, keys: list[str]) -> dict[str, str]: ...
+
+
+class EnvSecretBackend(SecretBackend):
+    def _fetch(self, keys: list[str]) -> dict[str, str]:
+        return {k: os.environ[k] for k in keys if k in os.environ}
+
+
+# `!file path` is the whole (stripped) file, `!file path#key` one entry of a
+# JSON object or KEY=VALUE file. Each file is read once per process however
+# many keys point into it. Relative paths are relative to the template.
+class FileSecretBackend(SecretBackend):
+    def make_ref(self, tag: str, key: str, origin: Path | None) -> SecretRef:
+        path, sep, entry = key.partition("#")
+        if origin is not None and not Path(path).is_absolute():
+            path = str(origin.parent / path)
+        return SecretRef(tag, f"{path}{sep}{entry}")
+
+    def _fetch(self, keys: list[str]) -> dict[str, str]:
+        by_file: dict[str, list[str]] = defaultdict(list)
+        for key in keys:
+            by_file[key.partition("#")[0]].append(key)
+
+        values = {}
+        for path, file_keys in by_file.items():
+            try:
+                content = Path(path).read_text(encoding="utf-8")
+            except OSError as e:
+                raise SecretResolutionError(f"Cannot read secret file {path}") from e
+
+            entries = None
+            for key in file_keys:
+                _, sep, entry = key.partition("#")
+                if not sep:
+                    values[key] = content.strip()
+                    continue
+
+                if entries is None:
+                    entries = self._parse_entries(path, content)
+                if entry in entries:
+                    values[key] = entries[entry]
+
+        return values
+
+    @staticmethod
+    def _parse_entries(path: str, content: str) -> dict[str, str]:
+        if path.endswith(".json"):
+            import json
+
+            return {k: str(v) for k, v in json.loads(content).items()}
+
+        entries = {}
+        for line in content.splitlines():
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            name, _, value = line.partition("=")
+            entries[name.strip()] = value.strip().strip("\"'")
+        return entries
+
+
+# Runs KEYCLOAK_BUILDER_SECRETS_COMMAND once with a JSON list of all keys on
+# stdin; the command prints a JSON object mapping keys to values.
+class CommandSecretBackend(SecretBackend):
+    def __init__(self, command: str | None = None) -> None:
+        super().__init__()
+        self.command = command
+
+    def _fetch(self, keys: list[str]) -> dict[str, str]:
+        import json
+
+        command = self.command or os.getenv("KEYCLOAK_BUILDER_SECRETS_COMMAND")
+        if not command:
+            raise SecretResolutionError(
+                "KEYCLOAK_BUILDER_SECRETS_COMMAND is not set, cannot resolve !cmd secrets"
+            )
+
+        logger.debug("Resolving %d secrets with %s", len(keys), command)
+        try:
+            result = subprocess.run(  # noqa: S603
+                shlex.split(command),
+                input=json.dumps(keys),
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            raise SecretResolutionError(f"Secrets command failed: {command}") from e
+
+        return {k: str(v) for k, v in json.loads(result.stdout).items()}
+
+
+BACKENDS: dict[str, SecretBackend] = {
+    "env": EnvSecretBackend(),
+    "file": FileSecretBackend(),
+    "cmd": CommandSecretBackend(),
+}
+
+
+def register_backend(tag: str, backend: SecretBackend) -> None:
+    BACKENDS[tag] = backend
+
+
+def clear_caches() -> None:
+    for backend in BACKENDS.values():
+        backend.clear_cache()
+
+
+def _secret_slots(data: Any) -> list[tuple[Any, Any, SecretRef]]:
+    # (container, key, ref) of every reference in data
+    slots: list[tuple[Any, Any, SecretRef]] = []
+    stack = [data]
+    seen: set[int] = set()
+
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        items = enumerate(node) if isinstance(node, list) else node.items()
+        for key, value in items:
+            if isinstance(value, SecretRef):
+                slots.append((node, key, value))
+            elif isinstance(value, (dict, list, SlotModel)):
+                stack.append(value)
+    return slots
+
+
+def resolve_secrets(data: Any) -> int:
+    # Collect every reference first so each backend gets one batched call,
+    # then write the values straight into their containers.
+    slots = _secret_slots(data)
+    if not slots:
+        return 0
+
+    keys_by_backend: dict[str, set[str]] = defaultdict(set)
+    for _, _, ref in slots:
+        keys_by_backend[ref.backend].add(ref.key)
+
+    resolved = {}
+    for tag, keys in keys_by_backend.items():
+        if tag not in BACKENDS:
+            raise SecretResolutionError(f"Unknown secret backend: !{tag}")
+        for key, value in BACKENDS[tag].resolve_many(keys).items():
+            resolved[SecretRef(tag, key)] = value
+
+    for container, key, ref in slots:
+        container[key] = resolved[ref]
+
+    return len(slots)
+
+
+def mask_secrets(data: Any) -> int:
+    # Keycloak's own placeholder, for builds that must not hold the values
+    # (golden snapshots); no backend is called
+    slots = _secret_slots(data)
+    for container, key, _ in slots:
+        container[key] = SECRET_MASK
+    return len(slots)
@@ -0,0 +1,116 @@
+import json
+import os
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pykeycloak_realm.builder import (
+    realm_transformer,
+    template_load,
+    write_to_realm_import_file,
+)
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.diff import Change, diff_values
+from pykeycloak_realm.export_reader import ExportReader
+from pykeycloak_realm.fingerprint import changed_sections, dump_realm, read_fingerprint
+from pykeycloak_realm.realm_refs import ExportValues
+
+JsonDict = dict[str, Any]
+
+# Golden snapshots: every template of a directory is built and the hash of
+# its output is compared with the fingerprint of a committed golden export.
+# Equal hashes are the whole check; only a template whose output differs
+# gets a structural diff of its changed sections. Templates are built in
+# parallel worker processes.
+
+
+@dataclass(frozen=True, slots=True)
+class SnapshotResult:
+    template: str
+    status: str  # "ok", "changed", "missing" or "updated"
+    sections: dict[str, str] = field(default_factory=dict)
+    changes: list[Change] = field(default_factory=list)
+
+
+def golden_path(golden_dir: str | os.PathLike[str], name: str, suffix: str) -> Path:
+    return Path(golden_dir) / f"{name}{suffix}"
+
+
+def build_template(
+    template: Path, config: RealmBuilderConfig, golden_dir: str | os.PathLike[str]
+) -> JsonDict:
+    return realm_transformer(
+        template_load(template.name, config.template_file_suffix, str(template.parent)),
+        config,
+        # references to other realms are resolved from their golden exports
+        realm_refs=ExportValues(golden_dir, config.realm_file_suffix),
+        # goldens are committed, so they must not hold secret values
+        mask_secrets=True,
+    ).apply()
+
+
+def check_template(
+    template: Path,
+    golden_dir: str | os.PathLike[str],
+    config: RealmBuilderConfig,
+    update: bool = False,
+) -> SnapshotResult:
+    name = template.name.removesuffix(config.template_file_suffix)
+    golden = golden_path(golden_dir, name, config.realm_file_suffix)
+    realm = build_template(template, config, golden_dir)
+
+    if update:
+        golden.parent.mkdir(parents=True, exist_ok=True)
+        write_to_realm_import_file(realm, golden, overwrite=True)
+        return SnapshotResult(name, "updated")
+
+    expected = read_fingerprint(golden) if golden.is_file() else None
+    if expected is None:
+        return SnapshotResult(name, "missing")
+
+    # the bytes the export would have, hashed as they are produced
+    output = bytearray()
+    actual = dump_realm(realm, output.extend)
+    sections = changed_sections(expected, actual)
+    if not sections:
+        return SnapshotResult(name, "ok")
+
+    new = json.loads(output)
+    changes: list[Change] = []
+    with ExportReader(golden, use_cache=False) as old:
+        for section, kind in sections.items():
+            match kind:
+                case "added":
+                    changes.append(Change(kind, section, new=new[section]))
+                case "removed":
+                    changes.append(Change(kind, section, old=old.section(section)))
+                case _:
+                    changes.extend(
+                        diff_values(old.section(section), new[section], section)
+                    )
+    return SnapshotResult(name, "changed", sections, changes)
+
+
+def find_templates(templates_dir: str | os.PathLike[str], suffix: str) -> list[Path]:
+    return sorted(Path(templates_dir).glob(f"*{suffix}"))
+
+
+def check_templates(
+    templates: Iterable[Path],
+    golden_dir: str | os.PathLike[str],
+    config: RealmBuilderConfig,
+    update: bool = False,
+    jobs: int | None = None,
+) -> list[SnapshotResult]:
+    templates = list(templates)
+    jobs = min(jobs or os.cpu_count() or 1, len(templates))
+    args = [(t, golden_dir, config, update) for t in templates]
+
+    # a single template is not worth starting a worker for
+    if jobs <= 1:
+        return [check_template(*a) for a in args]
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(check_template, *zip(*args, strict=True)))
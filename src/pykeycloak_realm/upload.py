@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+from urllib.error import HTTPError
+from urllib.parse import quote, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from pykeycloak_realm.builder import create_realm_config_file
+from pykeycloak_realm.config import KeycloakAdminConfig, RealmBuilderConfig
+from pykeycloak_realm.fingerprint import (
+    content_fingerprint,
+    dump_realm,
+    fingerprint_path,
+    write_fingerprint,
+)
+
+logger = logging.getLogger(__name__)
+
+JsonDict = dict[str, Any]
+
+# Batch deploy: builder processes turn templates into export bytes and hand
+# them over a bounded queue to uploader threads as soon as each one is
+# built, so building the next realms overlaps with uploading the previous
+# ones. The uploaded body is the in-memory serialization, hashed while it is
+# produced; nothing is written and parsed again to check it.
+#
+# Like bin/realm_upload, an existing realm is deleted and imported again,
+# unless it was deployed with the same fingerprint
+# (`<export>.deployed.fingerprint.json`, shared with realm_upload).
+
+DEPLOYED_SUFFIX = ".deployed"
+
+
+class KeycloakError(RuntimeError):
+    pass
+
+
+class KeycloakAdmin:
+    # The few admin REST calls imports and live snapshots need, over urllib. Safe to share
+    # between threads; the token is fetched again once when it expires.
+    def __init__(self, config: KeycloakAdminConfig) -> None:
+        if urlsplit(config.url).scheme not in ("http", "https"):
+            raise ValueError(f"Invalid Keycloak URL: {config.url!r}")
+        self.config = config
+        self.url = config.url.rstrip("/")
+        self._token: str | None = None
+        self._lock = threading.Lock()
+
+    def _authenticate(self) -> str:
+        data = urlencode(
+            {
+                "grant_type": "password",
+                "client_id": "admin-cli",
+                "username": self.config.username,
+                "password": self.config.password,
+            }
+        ).encode()
+        url = f"{self.url}/realms/master/protocol/openid-connect/token"
+        timeout = self.config.timeout
+        try:
+            with urlopen(url, data, timeout=timeout) as response:  # noqa: S310
+                return str(json.load(response)["access_token"])
+        except HTTPError as e:
+            raise KeycloakError(f"Authentication failed: HTTP {e.code}") from e
+
+    def _token_for(self, stale: str | None = None) -> str:
+        with self._lock:
+            if self._token is None or self._token == stale:
+                self._token = self._authenticate()
+            return self._token
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        body: bytes | None = None,
+        etag: str | None = None,
+    ) -> tuple[int, bytes, str | None]:
+        # (status, body, ETag of the response); 304 and 404 are returned,
+        # other errors raise
+        token = self._token_for()
+        timeout = self.config.timeout
+        for retry in (True, False):
+            request = Request(  # noqa: S310
+                f"{self.url}/admin/realms{path}", body, method=method
+            )
+            request.add_header("Authorization", f"Bearer {token}")
+            if body is not None:
+                request.add_header("Content-Type", "application/json")
+            if etag is not None:
+                request.add_header("If-None-Match", etag)
+            try:
+                with urlopen(request, timeout=timeout) as response:  # noqa: S310
+                    return (
+                        int(response.status),
+                        response.read(),
+                        response.headers.get("ETag"),
+                    )
+            except HTTPError as e:
+                e.close()  # the error response holds the connection
+                if e.code == 401 and retry:
+                    token = self._token_for(stale=token)
+                    continue
+                if e.code in (304, 404):
+                    return e.code, b"", e.headers.get("ETag")
+                raise KeycloakError(f"{method} {path or '/'}: HTTP {e.code}") from e
+        raise AssertionError("unreachable")
+
+    def _request(self, method: str, path: str, body: bytes | None = None) -> int:
+        return self._send(method, path, body)[0]
+
+    def get(self, path: str, etag: str | None = None) -> tuple[int, bytes, str | None]:
+        # path below /admin/realms, e.g. /otago/clients?first=0&max=100
+        return self._send("GET", path, etag=etag)
+
+    def realm_exists(self, realm: str) -> bool:
+        return self._request("GET", f"/{quote(realm)}") != 404
+
+    def delete_realm(self, realm: str) -> None:
+        self._request("DELETE", f"/{quote(realm)}")
+
+    def create_realm(self, body: bytes) -> None:
+        self._request("POST", "", body)
+
+    def partial_import(self, realm: str, body: bytes) -> JsonDict:
+        # counts of added, overwritten and skipped resources
+        status, response, _ = self._send("POST", f"/{quote(realm)}/partialImport", body)
+        if status == 404:
+            raise KeycloakError(f"Realm not found: {realm}")
+        return json.loads(response) if response else {}
+
+
+@dataclass(frozen=True, slots=True)
+class BuiltRealm:
+    template: str
+    realm: str
+    body: bytes
+    fingerprint: JsonDict
+    build_seconds: float
+    built_at: float
+
+
+@dataclass(frozen=True, slots=True)
+class DeployResult:
+    template: str
+    status: str  # "uploaded", "unchanged", "build failed" or "upload failed"
+    build_seconds: float = 0.0
+    upload_seconds: float = 0.0
+    error: str | None = None
+    built_at: float = 0.0
+    upload_started_at: float = 0.0
+
+
+def build_realm(
+    template: str, config: RealmBuilderConfig, without_users: bool = False
+) -> BuiltRealm:
+    # runs in a builder process
+    started = time.perf_counter()
+    realm = create_realm_config_file(template_name=template, config=config)
+    if without_users:
+        # provisioned afterwards in batches (see provision.py)
+        realm.pop("users", None)
+    body = bytearray()
+    fingerprint = dump_realm(realm, body.extend)
+    return BuiltRealm(
+        template,
+        realm.get("realm") or template,
+        bytes(body),
+        fingerprint,
+        time.perf_counter() - started,
+        time.time(),
+    )
+
+
+def deployed_fingerprint_path(export: Path) -> Path:
+    return fingerprint_path(export.with_name(export.name + DEPLOYED_SUFFIX))
+
+
+def _deployed_hash(export: Path) -> str | None:
+    try:
+        fingerprint = json.loads(deployed_fingerprint_path(export).read_text("utf-8"))
+    except (OSError, ValueError):
+        return None
+    return fingerprint.get("realm") if isinstance(fingerprint, dict) else None
+
+
+def upload_realm(
+    admin: KeycloakAdmin, built: BuiltRealm, export: Path, force: bool = False
+) -> str:
+    exists = admin.realm_exists(built.realm)
+    if exists and not force and _deployed_hash(export) == built.fingerprint["realm"]:
+        return "unchanged"
+
+    if exists:
+        admin.delete_realm(built.realm)
+    admin.create_realm(built.body)
+    write_fingerprint(
+        export.with_name(export.name + DEPLOYED_SUFFIX),
+        content_fingerprint(built.fingerprint),
+    )
+    return "uploaded"
+
+
+def deploy_realms(
+    templates: Sequence[str],
+    admin: KeycloakAdmin,
+    config: RealmBuilderConfig,
+    builders: int | None = None,
+    uploaders: int = 2,
+    queue_size: int = 2,
+    force: bool = False,
+    without_users: bool = False,
+) -> list[DeployResult]:
+    # no uploader would never drain the queue; a queue of 0 is unbounded
+    if uploaders < 1 or queue_size < 1:
+        raise ValueError("Uploaders and queue size must be at least 1")
+    if not templates:
+        return []
+    builders = min(builders or os.cpu_count() or 1, len(templates))
+    built: queue.Queue[BuiltRealm | None] = queue.Queue(maxsize=queue_size)
+    results: dict[str, DeployResult] = {}
+
+    def upload_worker() -> None:
+        while (item := built.get()) is not None:
+            started_at = time.time()
+            started = time.perf_counter()
+            status, error = "upload failed", None
+            try:
+                export = config.get_realm_filename(item.template)
+                status = upload_realm(admin, item, export, force)
+            except Exception as e:
+                error = str(e)
+                logger.exception("Upload of %s failed", item.template)
+            results[item.template] = DeployResult(
+                item.template,
+                status,
+                item.build_seconds,
+                time.perf_counter() - started,
+                error,
+                item.built_at,
+                started_at,
+            )
+
+    def hand_over(pending: dict[Future[BuiltRealm], str]) -> None:
+        # waits while the queue is full, so at most builders + queue_size +
+        # uploaders realms are held at a time
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            template = pending.pop(future)
+            try:
+                built.put(future.result())
+            except Exception as e:
+                logger.exception("Build of %s failed", template)
+                results[template] = DeployResult(template, "build failed", error=str(e))
+
+    threads = [
+        threading.Thread(target=upload_worker, name=f"uploader-{i}", daemon=True)
+        for i in range(uploaders)
+    ]
+    with ProcessPoolExecutor(max_workers=builders) as pool:
+        pending: dict[Future[BuiltRealm], str] = {}
+        started = False
+        for template in templates:
+            while len(pending) >= builders:
+                hand_over(pending)
+            pending[pool.submit(build_realm, template, config, without_users)] = (
+                template
+            )
+            # started once the pool has its workers, so none is forked
+            # while an uploader holds a lock
+            if not started:
+                for thread in threads:
+                    thread.start()
+                started = True
+        while pending:
+            hand_over(pending)
+
+    for _ in threads:
+        built.put(None)
+    for thread in threads:
+        thread.join()
+    return [results[template] for template in templates]
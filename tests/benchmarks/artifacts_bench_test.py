@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.artifacts import read_artifact, zstd_available
+from pykeycloak_realm.builder import write_to_realm_import_file
+
+CLIENTS = 1_000
+POLICIES_PER_CLIENT = 10
+USERS = 50_000
+
+
+def make_realm():
+    return {
+        "realm": "bench",
+        "clients": [
+            {
+                "clientId": f"client-{c}",
+                "protocol": "openid-connect",
+                "redirectUris": [f"https://client-{c}.example.com/*"],
+                "authorizationSettings": {
+                    "policies": [
+                        {
+                            "name": f"policy_role__{c}_{p}",
+                            "type": "role",
+                            "config": {"roles": f'[{{"id":"r-{p}"}}]'},
+                        }
+                        for p in range(POLICIES_PER_CLIENT)
+                    ]
+                },
+            }
+            for c in range(CLIENTS)
+        ],
+        "users": [
+            {
+                "username": f"user-{u}",
+                "email": f"user-{u}@example.com",
+                "enabled": True,
+                "realmRoles": [f"role-{u % 500}"],
+            }
+            for u in range(USERS)
+        ],
+    }
+
+
+@pytest.mark.slow
+class TestArtifactsBenchmark:
+    def test_size_and_throughput(self, tmp_path):
+        # Arrange
+        realm = make_realm()
+        compressions = ["none", "gzip"] + (["zstd"] if zstd_available() else [])
+        results = {}
+
+        # Act
+        for compression in compressions:
+            started = time.perf_counter()
+            path = write_to_realm_import_file(
+                realm, tmp_path / f"{compression}.realm.json", compression=compression
+            )
+            written = time.perf_counter() - started
+
+            started = time.perf_counter()
+            data = read_artifact(path)
+            read = time.perf_counter() - started
+
+            results[compression] = (path.stat().st_size, len(data), written, read)
+
+        # Assert
+        plain_size = results["none"][0]
+        print()
+        for compression, (size, raw, written, read) in results.items():
+            print(
+                f"{compression:>5}: {size / 1e6:6.2f} MB ({size / plain_size:6.1%}), "
+                f"write {raw / 1e6 / written:6.1f} MB/s, read {raw / 1e6 / read:7.1f} MB/s"
+            )
+        for size, raw, _, _ in results.values():
+            assert raw == plain_size
+            assert size <= plain_size
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.authz_matrix import expand_matrix
+
+RESOURCES = 500
+SCOPES = 20
+POLICIES = 50
+
+
+def make_client(resources):
+    # every policy grants every scope on every tenth resource
+    scopes = {f"scope-{s}": f"Scope {s}" for s in range(SCOPES)}
+    return {
+        "clientId": "bench",
+        "authorizationSettings": {
+            "matrix": {
+                "scopes": scopes,
+                "resources": {f"/bench/{r}": {} for r in range(resources)},
+                "policies": {
+                    f"policy-{p}": {"type": "role", "config": {"roles": []}}
+                    for p in range(POLICIES)
+                },
+                "grants": {
+                    f"policy-{p}": {
+                        f"/bench/{r}": list(scopes)
+                        for r in range(p % 10, resources, 10)
+                    }
+                    for p in range(POLICIES)
+                },
+            }
+        },
+    }
+
+
+def timed(resources, runs=3):
+    # best of a few runs, so a collection pause does not skew the ratio
+    best = float("inf")
+    for _ in range(runs):
+        client = make_client(resources)
+        started = time.perf_counter()
+        count = expand_matrix(client)
+        best = min(best, time.perf_counter() - started)
+    return count, best
+
+
+@pytest.mark.slow
+class TestAuthzMatrixBenchmark:
+    def test_scales_linearly(self):
+        # Act
+        half_count, half = timed(RESOURCES // 2)
+        count, elapsed = timed(RESOURCES)
+
+        # Assert
+        print(
+            f"\n{RESOURCES}x{SCOPES}x{POLICIES}: {count} entries in "
+            f"{elapsed * 1000:.0f} ms (half size {half * 1000:.0f} ms)"
+        )
+        assert count == SCOPES + RESOURCES + POLICIES + RESOURCES * SCOPES
+        assert half_count < count
+        assert elapsed < 3 * half + 0.05
+        assert elapsed < 1.0
@@ -0,0 +1,102 @@
+import copy
+import os
+import time
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.fingerprint import dump_realm
+
+SIZES = (1_000, 4_000, 16_000)  # clients, with as many users
+POLICIES_PER_CLIENT = 5
+WORKERS = 4
+CHUNK_SIZE = 500
+POLICY_ENCODING = {"policy_role__": ("roles",)}
+
+
+def make_template(size):
+    return {
+        "envs": {
+            "clients": [
+                {"clientId": f"client-{c}", "secret": f"s-{c}", "cid_alias": f"c{c}"}
+                | {"cid": f"id-{c}"}
+                for c in range(0, size, 10)
+            ]
+        },
+        "realm": {
+            "realm": "big",
+            "clients": [
+                {
+                    "clientId": f"client-{c}",
+                    "authorizationSettings": {
+                        "policies": [
+                            {
+                                "name": f"policy_role__{c}_{p}",
+                                "config": {
+                                    "roles": [{"id": f"$c{c - c % 10}/role-{p}"}]
+                                },
+                            }
+                            for p in range(POLICIES_PER_CLIENT)
+                        ]
+                    },
+                }
+                for c in range(size)
+            ],
+            "users": [
+                {
+                    "username": f"user-{u}",
+                    "clientRoles": {f"$c{u % size - u % 10}": ["role-0"]},
+                }
+                for u in range(size)
+            ],
+        },
+    }
+
+
+def timed_build(template, **kwargs):
+    template = copy.deepcopy(template)
+    started = time.perf_counter()
+    realm = RealmTransformer(
+        template, policy_encoding=POLICY_ENCODING, **kwargs
+    ).apply()
+    seconds = time.perf_counter() - started
+    output = bytearray()
+    dump_realm(realm, output.extend)
+    return seconds, bytes(output)
+
+
+@pytest.mark.slow
+class TestChunkedTransformBenchmark:
+    def test_break_even(self):
+        # Arrange
+        rows = []
+
+        # Act
+        for size in SIZES:
+            template = make_template(size)
+            serial, expected = min(timed_build(template) for _ in range(2))
+            chunked, output = min(
+                timed_build(
+                    template,
+                    transform_workers=WORKERS,
+                    transform_chunk_size=CHUNK_SIZE,
+                )
+                for _ in range(2)
+            )
+            assert output == expected
+            rows.append((size, serial, chunked))
+
+        # Assert
+        print(f"\n{os.cpu_count()} CPUs, {WORKERS} workers, chunks of {CHUNK_SIZE}")
+        for size, serial, chunked in rows:
+            print(
+                f"{size} clients + {size} users: serial {serial * 1000:.0f} ms, "
+                f"chunked {chunked * 1000:.0f} ms ({serial / chunked:.2f}x)"
+            )
+        # the smallest size from which the chunked transform stays faster
+        break_even = None
+        for size, serial, chunked in reversed(rows):
+            if chunked >= serial:
+                break
+            break_even = size
+        print(f"break-even: {break_even or 'none'}")
@@ -0,0 +1,85 @@
+import json
+import time
+
+import pytest
+
+from pykeycloak_realm.export_reader import ExportReader
+
+CLIENTS = 2_000
+POLICIES_PER_CLIENT = 10
+USERS = 50_000
+
+
+def write_export(path):
+    realm = {
+        "realm": "bench",
+        "roles": {
+            "realm": [{"id": f"r-{i}", "name": f"role-{i}"} for i in range(500)],
+            "client": {},
+        },
+        "clients": [
+            {
+                "clientId": f"client-{c}",
+                "protocol": "openid-connect",
+                "authorizationSettings": {
+                    "policies": [
+                        {
+                            "name": f"policy_role__{c}_{p}",
+                            "type": "role",
+                            "config": {"roles": json.dumps([{"id": f"r-{p}"}])},
+                        }
+                        for p in range(POLICIES_PER_CLIENT)
+                    ]
+                },
+            }
+            for c in range(CLIENTS)
+        ],
+        "users": [
+            {
+                "username": f"user-{u}",
+                "email": f"user-{u}@example.com",
+                "enabled": True,
+                "realmRoles": [f"role-{u % 500}"],
+                "credentials": [{"type": "password", "value": "password"}],
+            }
+            for u in range(USERS)
+        ],
+    }
+    path.write_text(json.dumps(realm, indent=2))
+
+
+@pytest.mark.slow
+class TestExportReaderBenchmark:
+    def test_cached_lookups_beat_full_parse(self, tmp_path):
+        # Arrange
+        path = tmp_path / "bench.realm.json"
+        write_export(path)
+
+        started = time.perf_counter()
+        with path.open() as f:
+            json.load(f)
+        full_parse = time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExportReader(path) as reader:
+            reader.client("client-0")
+        first_index = time.perf_counter() - started
+
+        # Act
+        started = time.perf_counter()
+        with ExportReader(path) as reader:
+            client = reader.client(f"client-{CLIENTS - 1}")
+            user = reader.user(f"user-{USERS - 1}")
+            policies = reader.policy("policy_role__7_3")
+        cached_query = time.perf_counter() - started
+
+        # Assert
+        print(
+            f"\n{path.stat().st_size / 1e6:.1f} MB export: json.load "
+            f"{full_parse * 1000:.0f} ms, first index {first_index * 1000:.0f} ms, "
+            f"cached query {cached_query * 1000:.1f} ms"
+        )
+        assert client["clientId"] == f"client-{CLIENTS - 1}"
+        assert user["username"] == f"user-{USERS - 1}"
+        assert policies[0][0] == "client-7"
+        assert cached_query < full_parse
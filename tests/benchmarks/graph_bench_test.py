@@ -0,0 +1,57 @@
+import os
+import time
+
+import pytest
+
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.graph import build_realms
+
+REALMS = 8  # one shared realm and REALMS - 1 that reference it
+CLIENTS = 2_000
+
+
+def realm_template(name, shared):
+    ref = "" if shared else "        secret: !ref shared/clients/client-0/secret\n"
+    lines = [f"realm:\n  realm: {name}\n  clients:\n"]
+    lines.append(f"    - clientId: broker\n{ref.replace('        ', '      ')}")
+    lines.extend(
+        f"    - clientId: client-{c}\n      secret: s-{c}\n" for c in range(CLIENTS)
+    )
+    return "".join(lines)
+
+
+def timed(templates, config, **kwargs):
+    started = time.perf_counter()
+    results = build_realms(templates, config, **kwargs)
+    return time.perf_counter() - started, results
+
+
+@pytest.mark.slow
+class TestRealmGraphBenchmark:
+    def test_full_and_incremental_builds(self, tmp_path):
+        # Arrange
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        (templates / "shared.realm.yml").write_text(realm_template("shared", True))
+        names = ["shared"]
+        for i in range(1, REALMS):
+            names.append(f"realm-{i}")
+            (templates / f"realm-{i}.realm.yml").write_text(
+                realm_template(f"realm-{i}", False)
+            )
+        config = RealmBuilderConfig(
+            _template_dir_path=str(templates),
+            _template_export_dir_path=str(tmp_path),
+        )
+        jobs = os.cpu_count() or 1
+
+        # Act
+        serial, _ = timed(names, config, jobs=1, force=True)
+        parallel, _ = timed(names, config, jobs=jobs, force=True)
+        noop, results = timed(names, config, jobs=jobs)
+
+        # Assert
+        assert {result.status for result in results} == {"unchanged"}
+        print(f"\n{jobs} CPUs, {REALMS} realms of {CLIENTS} clients")
+        print(f"serial {serial * 1000:.0f} ms, {jobs} jobs {parallel * 1000:.0f} ms")
+        print(f"nothing changed: {noop * 1000:.0f} ms ({serial / noop:.1f}x)")
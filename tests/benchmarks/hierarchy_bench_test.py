@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.hierarchy import expand_hierarchy
+
+LAYERS = 10
+ROLES_PER_LAYER = 500
+FAN_OUT = 3
+GROUPS = 1_000
+
+
+def make_declaration():
+    # each role includes FAN_OUT roles of the next layer and, redundantly,
+    # one role two layers down
+    roles = {}
+    for layer in range(LAYERS):
+        for i in range(ROLES_PER_LAYER):
+            refs = []
+            if layer + 1 < LAYERS:
+                refs += [
+                    f"r{layer + 1}_{(i + k) % ROLES_PER_LAYER}" for k in range(FAN_OUT)
+                ]
+            if layer + 2 < LAYERS:
+                refs.append(f"r{layer + 2}_{i}")
+            roles[f"r{layer}_{i}"] = refs
+    groups = {
+        f"g{g // 100}/g{g // 10}/g{g}": [f"r{g % LAYERS}_{g % ROLES_PER_LAYER}"]
+        for g in range(GROUPS)
+    }
+    return {"roles": roles, "groups": groups}
+
+
+@pytest.mark.slow
+class TestHierarchyBenchmark:
+    def test_thousands_of_roles(self):
+        # Arrange
+        declaration = make_declaration()
+
+        # Act
+        started = time.perf_counter()
+        realm = expand_hierarchy({}, declaration)
+        elapsed = time.perf_counter() - started
+
+        # Assert
+        roles = len(realm["roles"]["realm"])
+        print(f"\n{roles} roles, {GROUPS} groups: {elapsed * 1000:.0f} ms")
+        assert roles == LAYERS * ROLES_PER_LAYER
+        assert elapsed < 1.0
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.ids import stable_id
+
+ENTITIES = 20_000
+REFERENCES = 10
+
+
+@pytest.mark.slow
+class TestStableIdBenchmark:
+    def test_repeated_references_hit_the_cache(self):
+        # Arrange
+        stable_id.cache_clear()
+        keys = [f"role/otago_{e}" for e in range(ENTITIES)]
+
+        # Act
+        started = time.perf_counter()
+        for key in keys:
+            stable_id(key)
+        first = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(REFERENCES):
+            for key in keys:
+                stable_id(key)
+        repeated = (time.perf_counter() - started) / REFERENCES
+
+        # Assert
+        print(
+            f"\n{ENTITIES} ids: first {first * 1000:.1f} ms, "
+            f"repeated {repeated * 1000:.1f} ms"
+        )
+        assert stable_id.cache_info().hits == ENTITIES * REFERENCES
+        assert repeated < first
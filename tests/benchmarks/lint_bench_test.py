@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.lint import lint_template
+
+ANCHORS = 20_000
+SETS = 2_000
+CLIENTS = 2_000
+
+
+def make_template():
+    # ~40k lines: scalar anchors, sets of aliases and clients using both
+    lines = ["envs:", "  clients:"]
+    for c in range(CLIENTS):
+        lines += [f"    - clientId: client-{c}", f"      cid_alias: cid_{c}"]
+    lines += ["vars:", "  names:"]
+    lines += [f"    n{a}: &name_{a} role-{a}" for a in range(ANCHORS)]
+    lines.append("  sets:")
+    for s in range(SETS):
+        lines.append(f"    s{s}: &set_{s}")
+        lines += [f"      - *name_{(s * 4 + i) % ANCHORS}" for i in range(4)]
+    lines += ["realm:", "  clients:"]
+    # every other set and every other cid_alias is used
+    for c in range(CLIENTS):
+        lines.append(f"    - clientId: $cid_{c - c % 2}")
+        lines.append(f"      roles: *set_{c - c % 2}")
+    return "\n".join(lines) + "\n"
+
+
+@pytest.mark.slow
+class TestLintBenchmark:
+    def test_large_template(self, tmp_path):
+        # Arrange
+        path = tmp_path / "large.realm.yml"
+        path.write_text(make_template())
+        line_count = path.read_text().count("\n")
+
+        # Act
+        started = time.perf_counter()
+        findings = lint_template(path)
+        elapsed = time.perf_counter() - started
+
+        # Assert
+        print(
+            f"\n{line_count} lines: {elapsed * 1000:.0f} ms "
+            f"({line_count / elapsed / 1000:.0f}k lines/s), {len(findings)} findings"
+        )
+        kinds = [f.kind for f in findings]
+        assert kinds.count("cid_alias") == CLIENTS // 2
+        # each used set reaches 4 names; the rest of the names and sets are dead
+        used_sets = CLIENTS // 2
+        assert kinds.count("anchor") == ANCHORS - 4 * used_sets + SETS - used_sets
@@ -0,0 +1,62 @@
+import json
+import time
+
+import pytest
+
+from pykeycloak_realm.config import KeycloakAdminConfig
+from pykeycloak_realm.live import pull_snapshot
+from pykeycloak_realm.upload import KeycloakAdmin
+
+CLIENTS = 50
+USERS = 5_000
+READ_DELAY = 0.01
+
+
+def make_realm():
+    return {
+        "realm": "bench",
+        "clients": [
+            {
+                "clientId": f"client-{c}",
+                "authorizationServicesEnabled": c % 2 == 0,
+                "authorizationSettings": {"policies": [{"name": f"p-{c}"}]},
+            }
+            for c in range(CLIENTS)
+        ],
+        "roles": {
+            "realm": [{"name": f"role-{r}"} for r in range(100)],
+            "client": {f"client-{c}": [{"name": "reader"}] for c in range(CLIENTS)},
+        },
+        "users": [{"username": f"user-{u}", "enabled": True} for u in range(USERS)],
+    }
+
+
+def timed_pull(admin, snapshot, concurrency):
+    started = time.perf_counter()
+    _, stats = pull_snapshot(admin, "bench", snapshot, concurrency)
+    return stats, time.perf_counter() - started
+
+
+@pytest.mark.slow
+class TestPullBenchmark:
+    def test_concurrent_and_conditional_pulls(self, fake_keycloak, tmp_path):
+        # Arrange
+        admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+        admin.create_realm(json.dumps(make_realm()).encode())
+        fake_keycloak.read_delay = READ_DELAY
+        fake_keycloak.etags = True
+
+        # Act
+        stats, sequential = timed_pull(admin, tmp_path / "a.realm.json", 1)
+        _, concurrent = timed_pull(admin, tmp_path / "b.realm.json", 8)
+        cached, conditional = timed_pull(admin, tmp_path / "b.realm.json", 8)
+
+        # Assert
+        print(
+            f"\n{stats.requests} requests ({READ_DELAY * 1000:.0f} ms each): "
+            f"1 at a time {sequential:.2f} s, 8 concurrent {concurrent:.2f} s, "
+            f"again with ETags {conditional:.2f} s "
+            f"({cached.not_modified} not modified)"
+        )
+        assert cached.not_modified == cached.requests
+        assert concurrent < sequential
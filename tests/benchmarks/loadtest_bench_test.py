@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from pykeycloak_realm.config import KeycloakAdminConfig
+from pykeycloak_realm.loadtest import confidential_clients, run_load_test, token_url
+from pykeycloak_realm.upload import KeycloakAdmin
+
+REQUESTS = 2_000
+TOKEN_DELAY = 0.005  # per token request
+CLIENTS = 10
+
+
+@pytest.mark.slow
+class TestLoadTestBenchmark:
+    def test_throughput_by_concurrency(self, fake_keycloak):
+        # Arrange
+        realm = {
+            "realm": "bench",
+            "clients": [
+                {
+                    "clientId": f"client-{c}",
+                    "secret": f"secret-{c}",
+                    "serviceAccountsEnabled": True,
+                }
+                for c in range(CLIENTS)
+            ],
+        }
+        admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+        admin.create_realm(json.dumps(realm).encode())
+        fake_keycloak.token_delay = TOKEN_DELAY
+        url = token_url(fake_keycloak.url, "bench")
+        clients = confidential_clients(realm)
+
+        # Act
+        results = {
+            concurrency: run_load_test(url, clients, REQUESTS, concurrency)
+            for concurrency in (1, 4, 16)
+        }
+
+        # Assert
+        print(f"\n{REQUESTS} token requests ({TOKEN_DELAY * 1000:.0f} ms each):")
+        for concurrency, result in results.items():
+            print(
+                f"{concurrency:>2} connections: {result.throughput:.0f}/s, "
+                f"p50 {result.p50 * 1000:.1f} ms, p95 {result.p95 * 1000:.1f} ms, "
+                f"p99 {result.p99 * 1000:.1f} ms"
+            )
+            assert result.failures == 0
+            assert result.connections == concurrency
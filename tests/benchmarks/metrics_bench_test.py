@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.metrics import (
+    RealmMetrics,
+    count_entities,
+    metrics_document,
+    prometheus_text,
+)
+
+SIZE = 16_000  # clients, with as many users
+POLICY_ENCODING = {"policy_role__": ("roles",)}
+
+
+def make_template(size):
+    return {
+        "envs": {
+            "clients": [
+                {"clientId": f"client-{c}", "cid_alias": f"c{c}", "cid": f"id-{c}"}
+                for c in range(0, size, 10)
+            ]
+        },
+        "realm": {
+            "realm": "big",
+            "clients": [
+                {
+                    "clientId": f"client-{c}",
+                    "authorizationSettings": {
+                        "policies": [
+                            {
+                                "name": f"policy_role__{c}_{p}",
+                                "config": {"roles": [{"id": f"role-{p}"}]},
+                            }
+                            for p in range(5)
+                        ]
+                    },
+                }
+                for c in range(size)
+            ],
+            "users": [
+                {"username": f"user-{u}", "clientRoles": {f"$c{u - u % 10}": ["r"]}}
+                for u in range(size)
+            ],
+        },
+    }
+
+
+@pytest.mark.slow
+class TestMetricsBenchmark:
+    def test_collection_overhead(self):
+        # Arrange
+        transformer = RealmTransformer(
+            make_template(SIZE), policy_encoding=POLICY_ENCODING
+        )
+
+        # Act
+        started = time.perf_counter()
+        realm = transformer.apply()
+        build = time.perf_counter() - started
+
+        # what the metrics add to a build: the stage clock reads, counting
+        # the entities and rendering both files
+        started = time.perf_counter()
+        metrics = RealmMetrics()
+        for stage in transformer.metrics.stages:
+            with metrics.stage(stage):
+                pass
+        count_entities(realm)
+        metrics_document({"big": transformer.metrics})
+        prometheus_text({"big": transformer.metrics})
+        overhead = time.perf_counter() - started
+
+        # Assert
+        m = transformer.metrics
+        print(f"\n{SIZE} clients + {SIZE} users, build {build * 1000:.0f} ms")
+        print(
+            f"metrics: {overhead * 1000:.2f} ms ({overhead / build:.3%}), "
+            f"{m.aliases_replaced} aliases replaced, "
+            f"{m.cache_hits} hits / {m.cache_misses} misses"
+        )
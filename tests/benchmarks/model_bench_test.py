@@ -0,0 +1,79 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from pykeycloak_realm.model import Policy, User
+
+USERS = 100_000
+POLICIES = 50_000
+DISTINCT_ROLES = 200
+
+
+def make_users():
+    # role names are built per user, as they would be when parsed from YAML
+    return [
+        {
+            "username": f"user-{u}",
+            "email": f"user-{u}@example.com",
+            "firstName": "User",
+            "lastName": f"{u}",
+            "enabled": True,
+            "emailVerified": False,
+            "credentials": [
+                {"type": "password", "value": f"pw-{u}", "temporary": False}
+            ],
+            "realmRoles": [f"role-{u % DISTINCT_ROLES}", "default-roles-bench"],
+            "clientRoles": {"bench": [f"client-role-{u % DISTINCT_ROLES}"]},
+            "requiredActions": [],
+        }
+        for u in range(USERS)
+    ]
+
+
+def make_policies():
+    return [
+        {
+            "name": f"policy_role__{p}",
+            "type": "role",
+            "logic": "POSITIVE",
+            "decisionStrategy": "UNANIMOUS",
+            "config": {"roles": f'[{{"id":"role-{p % DISTINCT_ROLES}"}}]'},
+        }
+        for p in range(POLICIES)
+    ]
+
+
+def allocated(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        data = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del data
+    return size
+
+
+@pytest.mark.slow
+class TestModelBenchmark:
+    @pytest.mark.parametrize(
+        ("name", "count", "make", "model"),
+        [
+            ("users", USERS, make_users, User),
+            ("policies", POLICIES, make_policies, Policy),
+        ],
+    )
+    def test_models_use_less_memory_than_dicts(self, name, count, make, model):
+        # Act
+        as_dicts = allocated(make)
+        as_models = allocated(lambda: [model.from_dict(d) for d in make()])
+
+        # Assert
+        print(
+            f"\n{count} {name}: dict {as_dicts / count:.0f} B/entity, "
+            f"model {as_models / count:.0f} B/entity "
+            f"({1 - as_models / as_dicts:.0%} less)"
+        )
+        assert as_models < as_dicts
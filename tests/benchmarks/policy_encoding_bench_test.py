@@ -0,0 +1,118 @@
+import copy
+import gc
+import json
+import time
+
+import pytest
+
+from pykeycloak_realm.policy_encoding import PolicyEncoder
+
+CLIENTS = 20
+POLICIES_PER_CLIENT = 2_500
+DISTINCT_ROLE_SETS = 200
+
+
+def make_realm():
+    role_sets = [
+        [{"id": f"role-{i}"}, {"id": f"role-{i + 1}", "required": True}]
+        for i in range(DISTINCT_ROLE_SETS)
+    ]
+    return {
+        "clients": [
+            {
+                "clientId": f"client-{c}",
+                "authorizationSettings": {
+                    "policies": [
+                        {
+                            "name": f"policy_role__{c}_{p}",
+                            "type": "role",
+                            "logic": "POSITIVE",
+                            "config": {
+                                "roles": copy.deepcopy(
+                                    role_sets[p % DISTINCT_ROLE_SETS]
+                                )
+                            },
+                        }
+                        for p in range(POLICIES_PER_CLIENT)
+                    ]
+                },
+            }
+            for c in range(CLIENTS)
+        ]
+    }
+
+
+def transform_authorizations(realm):
+    # the per-policy path the builder used before PolicyEncoder
+    def transform_client(client):
+        auth = client.get("authorizationSettings")
+        if not auth:
+            return client
+
+        policies = [
+            (
+                policy
+                if not (
+                    policy.get("name", "").startswith("policy_role__")
+                    and policy.get("config")
+                )
+                else policy
+                | {
+                    "config": policy["config"]
+                    | {"roles": json.dumps(policy["config"].get("roles", []))}
+                }
+            )
+            for policy in auth.get("policies", [])
+        ]
+
+        return client | {"authorizationSettings": auth | {"policies": policies}}
+
+    return realm | {"clients": [transform_client(c) for c in realm.get("clients", [])]}
+
+
+def best_of(runs, fn, make_input):
+    best = float("inf")
+    for _ in range(runs):
+        data = make_input()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            fn(data)
+            best = min(best, time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return best
+
+
+@pytest.mark.slow
+class TestPolicyEncodingBenchmark:
+    def test_batch_path_beats_per_policy_path(self):
+        # Arrange
+        realm = make_realm()
+
+        # Act
+        per_policy = best_of(3, transform_authorizations, lambda: realm)
+        batch = best_of(
+            3,
+            lambda r: PolicyEncoder().apply(r["clients"]),
+            lambda: copy.deepcopy(realm),
+        )
+
+        # Assert
+        policies = CLIENTS * POLICIES_PER_CLIENT
+        print(
+            f"\n{policies} policies: per-policy {per_policy * 1000:.1f} ms, "
+            f"batch {batch * 1000:.1f} ms ({per_policy / batch:.1f}x)"
+        )
+        assert batch < per_policy
+
+    def test_batch_path_output_is_identical(self):
+        # Arrange
+        realm = make_realm()
+        expected = transform_authorizations(realm)
+
+        # Act
+        PolicyEncoder().apply(realm["clients"])
+
+        # Assert
+        assert realm == expected
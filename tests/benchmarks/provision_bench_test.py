@@ -0,0 +1,66 @@
+import time
+import tracemalloc
+
+import pytest
+
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.config import KeycloakAdminConfig
+from pykeycloak_realm.provision import provision_users
+from pykeycloak_realm.upload import KeycloakAdmin
+
+USERS = 20_000
+BATCH_SIZE = 500
+IMPORT_DELAY = 0.05  # per partialImport request
+
+
+def timed_provision(admin, export, **kwargs):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = provision_users(admin, "bench", export, batch_size=BATCH_SIZE, **kwargs)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+@pytest.mark.slow
+class TestProvisionBenchmark:
+    def test_concurrent_batches_and_resume(self, tmp_path, fake_keycloak):
+        # Arrange
+        export = tmp_path / "bench.realm.json"
+        users = [
+            {
+                "username": f"user-{u}",
+                "enabled": True,
+                "email": f"user-{u}@example.org",
+                "realmRoles": [f"role-{u % 50}"],
+            }
+            for u in range(USERS)
+        ]
+        write_to_realm_import_file({"realm": "bench", "users": users}, export, True)
+        del users
+        admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+        admin.create_realm(b'{"realm": "bench"}')
+        fake_keycloak.import_delay = IMPORT_DELAY
+
+        # Act
+        _, one, _ = timed_provision(admin, export, concurrency=1, restart=True)
+        _, four, peak = timed_provision(admin, export, concurrency=4, restart=True)
+        fake_keycloak.import_limit = 20
+        failed, _, _ = timed_provision(admin, export, concurrency=4, restart=True)
+        fake_keycloak.import_limit = None
+        resumed, rest, _ = timed_provision(admin, export, concurrency=4)
+
+        # Assert
+        batches = USERS // BATCH_SIZE
+        print(
+            f"\n{USERS} users in {batches} batches "
+            f"({IMPORT_DELAY * 1000:.0f} ms per import): 1 in flight {one:.2f} s, "
+            f"4 in flight {four:.2f} s ({USERS / four:.0f} users/s, "
+            f"peak {peak / 2**20:.1f} MiB traced); interrupted after "
+            f"{failed.imported} batches, resumed {resumed.imported} in {rest:.2f} s"
+        )
+        assert failed.error is not None
+        assert resumed.resumed + resumed.imported == batches
+        assert resumed.error is None
+        assert len(fake_keycloak.users["bench"]) == USERS
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.schema import realm_validator, validate_realm
+
+CLIENTS = 1_000
+POLICIES_PER_CLIENT = 50
+USERS = 50_000
+
+
+def make_template():
+    return {
+        "realm": {
+            "realm": "bench",
+            "enabled": True,
+            "clients": [
+                {
+                    "clientId": f"client-{c}",
+                    "enabled": True,
+                    "redirectUris": [f"https://client-{c}.example.com/*"],
+                    "attributes": {"pkce.code.challenge.method": "S256"},
+                    "authorizationSettings": {
+                        "policyEnforcementMode": "ENFORCING",
+                        "policies": [
+                            {
+                                "name": f"policy_role__{c}_{p}",
+                                "type": "role",
+                                "logic": "POSITIVE",
+                                "config": {"roles": [{"id": f"role-{p}"}]},
+                            }
+                            for p in range(POLICIES_PER_CLIENT)
+                        ],
+                    },
+                }
+                for c in range(CLIENTS)
+            ],
+            "users": [
+                {
+                    "username": f"user-{u}",
+                    "email": f"user-{u}@example.com",
+                    "enabled": True,
+                    "credentials": [
+                        {"type": "password", "value": "x", "temporary": False}
+                    ],
+                    "realmRoles": [f"role-{u % 500}"],
+                    "clientRoles": {"client-1": ["viewer"]},
+                }
+                for u in range(USERS)
+            ],
+        }
+    }
+
+
+def walk(value):
+    # lower bound: visiting every value without checking anything
+    if type(value) is dict:
+        for v in value.values():
+            walk(v)
+    elif type(value) is list:
+        for v in value:
+            walk(v)
+
+
+def best_of(runs, fn):
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+@pytest.mark.slow
+class TestSchemaBenchmark:
+    def test_validation_of_100k_entities(self):
+        # Arrange
+        realm = RealmTransformer(make_template()).apply()
+        realm_validator()
+        entities = CLIENTS * (POLICIES_PER_CLIENT + 1) + USERS
+
+        # Act
+        errors = validate_realm(realm)
+        validation = best_of(3, lambda: validate_realm(realm))
+        traversal = best_of(3, lambda: walk(realm))
+
+        # Assert
+        print(
+            f"\n{entities} entities: validation {validation * 1000:.0f} ms "
+            f"({validation / entities * 1e6:.1f} us/entity), "
+            f"bare traversal {traversal * 1000:.0f} ms"
+        )
+        assert errors == []
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC_PATH = Path(__file__).resolve().parents[2] / "src"
+
+# Cumulative `-X importtime` budget for `import pykeycloak_realm.realm`,
+# best of RUNS. Override on slow runners with PYKEYCLOAK_REALM_IMPORT_BUDGET_MS.
+IMPORT_BUDGET_MS = float(os.getenv("PYKEYCLOAK_REALM_IMPORT_BUDGET_MS", "50"))
+RUNS = 5
+
+HEAVY_MODULES = ("yaml", "json", "pykeycloak_realm.builder")
+
+
+def import_times(*args: str) -> dict[str, int]:
+    env = os.environ | {
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [str(SRC_PATH), os.getenv("PYTHONPATH")])
+        )
+    }
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class TestStartup:
+    @pytest.mark.slow
+    def test_import_realm_within_budget(self):
+        # Act
+        best_us = min(
+            import_times("-c", "import pykeycloak_realm.realm")[
+                "pykeycloak_realm.realm"
+            ]
+            for _ in range(RUNS)
+        )
+
+        # Assert
+        print(f"import pykeycloak_realm.realm: {best_us / 1000:.1f} ms")
+        assert best_us / 1000 <= IMPORT_BUDGET_MS
+
+    def test_import_realm_skips_heavy_modules(self):
+        # Act
+        times = import_times("-c", "import pykeycloak_realm.realm")
+
+        # Assert
+        assert not [m for m in HEAVY_MODULES if m in times]
+
+    def test_help_skips_heavy_modules(self):
+        # Act
+        times = import_times("-m", "pykeycloak_realm.realm", "--help")
+
+        # Assert
+        assert not [m for m in HEAVY_MODULES if m in times]
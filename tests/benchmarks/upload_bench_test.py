@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from pykeycloak_realm.config import KeycloakAdminConfig, RealmBuilderConfig
+from pykeycloak_realm.upload import (
+    KeycloakAdmin,
+    build_realm,
+    deploy_realms,
+    upload_realm,
+)
+
+REALMS = 8
+USERS = 300
+IMPORT_DELAY = 0.3
+
+
+def write_templates(templates):
+    users = "".join(
+        f"    - username: user-{u}\n"
+        f"      enabled: true\n"
+        f"      realmRoles: [role-{u % 50}]\n"
+        for u in range(USERS)
+    )
+    names = [f"bench{r}" for r in range(REALMS)]
+    for name in names:
+        (templates / f"{name}.realm.yml").write_text(
+            f"realm:\n  realm: {name}\n  users:\n{users}"
+        )
+    return names
+
+
+@pytest.mark.slow
+class TestDeployBenchmark:
+    def test_pipeline_overlaps_build_and_upload(self, tmp_path, fake_keycloak):
+        # Arrange
+        (tmp_path / "templates").mkdir()
+        (tmp_path / "export").mkdir()
+        names = write_templates(tmp_path / "templates")
+        config = RealmBuilderConfig(
+            _template_dir_path=str(tmp_path / "templates"),
+            _template_export_dir_path=str(tmp_path / "export"),
+        )
+        admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+        fake_keycloak.import_delay = IMPORT_DELAY
+
+        # Act
+        started = time.perf_counter()
+        for name in names:
+            built = build_realm(name, config)
+            upload_realm(admin, built, config.get_realm_filename(name), force=True)
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = deploy_realms(
+            names, admin, config, builders=2, uploaders=2, force=True
+        )
+        pipelined = time.perf_counter() - started
+
+        # Assert
+        build = sum(r.build_seconds for r in results)
+        print(
+            f"\n{REALMS} realms ({USERS} users, {IMPORT_DELAY * 1000:.0f} ms import): "
+            f"sequential {REALMS / sequential:.1f} realms/s, "
+            f"pipeline {REALMS / pipelined:.1f} realms/s "
+            f"(build {build:.2f} s in total)"
+        )
+        assert {r.status for r in results} == {"uploaded"}
+        assert pipelined < sequential
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+SECTIONS = ("clients", "roles", "groups", "users")
+
+
+class FakeKeycloak:
+    # The admin endpoints realm imports and live snapshots use, served from
+    # memory. Imports take `import_delay` seconds, like a real import of a
+    # small realm, reads `read_delay`; with `etags`, reads send ETags and
+    # answer 304. Users sent to partialImport are kept in `users` (realm ->
+    # username -> user); after `import_limit` of them it answers 500.
+    # Confidential clients of the imported realms get tokens with the
+    # client_credentials grant after `token_delay` seconds; connections are
+    # kept open between requests (HTTP/1.1).
+    def __init__(self, import_delay=0.0):
+        self.import_delay = import_delay
+        self.etags = False
+        self.read_delay = 0.0
+        self.realms = {}
+        self.parsed = {}
+        self.calls = []
+        self.fail_realms = set()
+        self.users = {}
+        self.import_limit = None
+        self.token_delay = 0.0
+        self.connections = 0
+        self.tokens = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeKeycloakHandler)
+        self.server.daemon_threads = True
+        self.server.fake = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def expire_tokens(self):
+        with self.lock:
+            self.tokens.clear()
+
+    def methods(self):
+        return [method for method, _ in self.calls]
+
+    def edit(self, name, change):
+        # a change made in the admin console
+        realm = json.loads(self.realms[name])
+        change(realm)
+        self.realms[name] = json.dumps(realm).encode()
+
+    def partial_import(self, name, body):
+        # one transaction per request, like Keycloak
+        policy = body.get("ifResourceExists", "FAIL")
+        with self.lock:
+            if self.import_limit is not None and self.import_limit <= 0:
+                return 500, {"error": "unavailable"}
+            users = self.users.setdefault(name, {})
+            if policy == "FAIL" and any(u["username"] in users for u in body["users"]):
+                return 409, {"errorMessage": "User exists"}
+            result = {"overwritten": 0, "added": 0, "skipped": 0, "results": []}
+            for user in body.get("users", []):
+                username = user["username"]
+                if username not in users:
+                    action = "ADDED"
+                elif policy == "SKIP":
+                    action = "SKIPPED"
+                else:
+                    action = "OVERWRITTEN"
+                if action != "SKIPPED":
+                    users[username] = user
+                result[action.lower()] += 1
+                result["results"].append(
+                    {"action": action, "resourceType": "USER", "resourceName": username}
+                )
+            if self.import_limit is not None:
+                self.import_limit -= 1
+        return 200, result
+
+    def parse(self, name):
+        body = self.realms[name]
+        parsed = self.parsed.get(name)
+        if parsed is None or parsed[0] is not body:
+            parsed = self.parsed[name] = (body, json.loads(body))
+        return parsed[1]
+
+    def client_secret(self, name, client_id):
+        if name not in self.realms:
+            return None
+        clients = self.parse(name).get("clients") or []
+        return next(
+            (c.get("secret") for c in clients if c.get("clientId") == client_id),
+            None,
+        )
+
+    def read(self, name, parts, query):
+        realm = self.parse(name)
+        clients = realm.get("clients") or []
+        for client in clients:
+            client.setdefault("id", f"id-{client['clientId']}")
+        roles = realm.get("roles") or {}
+        first = int(query.get("first", ["0"])[0])
+        page = slice(first, first + int(query.get("max", ["100"])[0]))
+
+        match parts:
+            case []:
+                return {k: v for k, v in realm.items() if k not in SECTIONS}
+            case ["clients"]:
+                return [
+                    {k: v for k, v in c.items() if k != "authorizationSettings"}
+                    for c in clients
+                ]
+            case ["clients", client_id, *rest]:
+                client = next(c for c in clients if c["id"] == client_id)
+                if rest == ["roles"]:
+                    return (roles.get("client") or {}).get(client["clientId"], [])
+                return _settings_as_read(client.get("authorizationSettings") or {})
+            case ["roles"]:
+                return roles.get("realm") or []
+            case ["users", "count"]:
+                return len(realm.get("users") or [])
+            case ["groups", "count"]:
+                return {"count": len(realm.get("groups") or [])}
+            case ["users"]:
+                return [
+                    {k: v for k, v in user.items() if k not in NOT_READ_USER_KEYS}
+                    for user in (realm.get("users") or [])[page]
+                ]
+            case [section]:
+                return (realm.get(section) or [])[page]
+
+
+# what GET /users leaves out: role mappings and group memberships have
+# endpoints of their own, credentials are never returned
+NOT_READ_USER_KEYS = frozenset({"realmRoles", "clientRoles", "groups", "credentials"})
+
+# declared as lists, read back as JSON encoded names in the config
+POLICY_REFS = {
+    "resources": "resources",
+    "scopes": "scopes",
+    "policies": "applyPolicies",
+}
+
+
+def _settings_as_read(settings):
+    # like GET .../authz/resource-server/settings
+    policies = []
+    for policy in settings.get("policies") or []:
+        config = dict(policy.get("config") or {})
+        for key, field in POLICY_REFS.items():
+            if key in policy:
+                config[field] = json.dumps(policy[key])
+        policy = {k: v for k, v in policy.items() if k not in POLICY_REFS}
+        if config:
+            policy["config"] = config
+        policies.append(policy)
+    return settings | {"policies": policies} if policies else settings
+
+
+class _FakeKeycloakHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body are separate writes; without this, every response on
+    # a kept-open connection waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections += 1
+
+    def _reply(self, status, body=None, etag=None):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if status != 204:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _authorized(self):
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        with self.server.fake.lock:
+            return token in self.server.fake.tokens
+
+    def _handle(self, method):
+        fake = self.server.fake
+        with fake.lock:
+            fake.calls.append((method, self.path))
+
+        if method == "POST" and self.path.endswith("/openid-connect/token"):
+            form = parse_qs(self._body().decode())
+            if form.get("grant_type") == ["client_credentials"]:
+                return self._client_token(form)
+            if form.get("username") != ["admin"] or form.get("password") != ["admin"]:
+                return self._reply(401, {"error": "invalid_grant"})
+            with fake.lock:
+                token = f"token-{len(fake.calls)}"
+                fake.tokens.add(token)
+            return self._reply(200, {"access_token": token})
+
+        if not self.path.startswith("/admin/realms"):
+            return self._reply(404)
+        if not self._authorized():
+            return self._reply(401)
+
+        name = unquote(
+            urlsplit(self.path).path.removeprefix("/admin/realms").strip("/")
+        ).split("/")[0]
+        if method == "POST" and self.path.endswith("/partialImport"):
+            body = json.loads(self._body())
+            if name not in fake.realms:
+                return self._reply(404)
+            time.sleep(fake.import_delay)
+            return self._reply(*fake.partial_import(name, body))
+        if method == "POST":
+            body = self._body()
+            name = json.loads(body)["realm"]
+            if name in fake.fail_realms:
+                return self._reply(500)
+            if name in fake.realms:
+                return self._reply(409)
+            time.sleep(fake.import_delay)
+            fake.realms[name] = body
+            return self._reply(201)
+        if name not in fake.realms:
+            return self._reply(404)
+        if method == "DELETE":
+            del fake.realms[name]
+            return self._reply(204)
+        return self._read()
+
+    def _client_token(self, form):
+        fake = self.server.fake
+        realm = unquote(self.path.removeprefix("/realms/").split("/")[0])
+        client_id = form.get("client_id", [""])[0]
+        time.sleep(fake.token_delay)
+        secret = fake.client_secret(realm, client_id)
+        if secret is None or form.get("client_secret") != [secret]:
+            return self._reply(401, {"error": "unauthorized_client"})
+        return self._reply(200, {"access_token": f"token-{client_id}"})
+
+    def _read(self):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        name, *parts = unquote(url.path.removeprefix("/admin/realms/")).split("/")
+        time.sleep(fake.read_delay)
+        body = fake.read(name, parts, parse_qs(url.query))
+        if not fake.etags:
+            return self._reply(200, body)
+        etag = '"' + hashlib.sha256(json.dumps(body).encode()).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            return self._reply(304, etag=etag)
+        return self._reply(200, body, etag)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+@pytest.fixture
+def fake_keycloak():
+    fake = FakeKeycloak()
+    fake.thread.start()
+    yield fake
+    fake.server.shutdown()
+    fake.server.server_close()
@@ -0,0 +1,165 @@
+import gzip
+import json
+
+import pytest
+
+from pykeycloak_realm.artifacts import (
+    artifact_path,
+    detect_compression,
+    find_artifact,
+    open_artifact_writer,
+    read_artifact,
+    zstd_available,
+)
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.diff import diff_exports
+from pykeycloak_realm.export_reader import ExportReader
+from pykeycloak_realm.fingerprint import fingerprint_export, read_fingerprint
+from pykeycloak_realm.realm import main
+
+REALM = {
+    "realm": "otago",
+    "clients": [{"clientId": "otago", "description": "Отаго"}],
+    "users": [{"username": "admin"}],
+}
+
+COMPRESSIONS = [
+    "gzip",
+    pytest.param(
+        "zstd",
+        marks=pytest.mark.skipif(
+            not zstd_available(), reason="compression.zstd needs Python 3.14"
+        ),
+    ),
+]
+
+
+class TestArtifacts:
+    @pytest.mark.parametrize("compression", ["none", *COMPRESSIONS])
+    def test_roundtrip(self, tmp_path, compression):
+        # Arrange
+        path = artifact_path(tmp_path / "x.realm.json", compression)
+
+        # Act
+        with open_artifact_writer(path, compression) as f:
+            f.write(b'{"a": 1}')
+
+        # Assert
+        assert read_artifact(path) == b'{"a": 1}'
+        assert detect_compression(path.read_bytes()[:4]) == compression
+
+    def test_gzip_output_is_reproducible(self, tmp_path):
+        # Arrange
+        first, second = tmp_path / "a.gz", tmp_path / "b.gz"
+
+        # Act
+        for path in (first, second):
+            with open_artifact_writer(path, "gzip") as f:
+                f.write(b"{}")
+
+        # Assert
+        assert first.read_bytes() == second.read_bytes()
+
+    def test_unknown_compression(self, tmp_path):
+        # Act & Assert
+        with pytest.raises(ValueError, match="Unknown export compression"):
+            write_to_realm_import_file(REALM, tmp_path / "x.json", compression="lz4")
+
+    def test_find_artifact(self, tmp_path):
+        # Arrange
+        plain = tmp_path / "x.realm.json"
+        (tmp_path / "x.realm.json.gz").write_bytes(b"")
+
+        # Act & Assert
+        assert find_artifact(plain) == tmp_path / "x.realm.json.gz"
+        assert find_artifact(tmp_path / "y.realm.json") == tmp_path / "y.realm.json"
+
+
+class TestCompressedExport:
+    @pytest.mark.parametrize("compression", COMPRESSIONS)
+    def test_readers_open_compressed_export(self, tmp_path, compression):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+
+        # Act
+        written = write_to_realm_import_file(REALM, target, compression=compression)
+
+        # Assert
+        assert written == artifact_path(target, compression)
+        assert json.loads(read_artifact(written)) == REALM
+        with ExportReader(written) as reader:
+            assert reader.client("otago") == REALM["clients"][0]
+        assert fingerprint_export(written) == read_fingerprint(written)
+
+    def test_hashes_do_not_depend_on_compression(self, tmp_path):
+        # Arrange
+        plain = write_to_realm_import_file(REALM, tmp_path / "a.realm.json")
+        packed = write_to_realm_import_file(
+            REALM, tmp_path / "b.realm.json", compression="gzip"
+        )
+
+        # Act
+        result = diff_exports(plain, packed)
+
+        # Assert
+        assert result == ({}, [])
+        assert read_fingerprint(packed)["size"] == packed.stat().st_size
+
+    def test_switching_compression_replaces_previous_variant(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target)
+
+        # Act
+        written = write_to_realm_import_file(
+            REALM, target, overwrite=True, compression="gzip"
+        )
+
+        # Assert
+        assert not target.exists()
+        assert not (tmp_path / "otago.realm.json.fingerprint.json").exists()
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "otago.realm.json.gz",
+            "otago.realm.json.gz.fingerprint.json",
+        ]
+        assert written.suffix == ".gz"
+
+    def test_existing_compressed_variant_is_not_overwritten(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target, compression="gzip")
+
+        # Act & Assert
+        with pytest.raises(FileExistsError, match="already exists"):
+            write_to_realm_import_file(REALM, target)
+
+
+class TestValidateCommand:
+    def test_valid_compressed_export_by_plain_name(self, tmp_path, capsys):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target, compression="gzip")
+
+        # Act
+        main(["validate", str(target)])
+
+        # Assert
+        assert capsys.readouterr().out.strip() == f"{target}.gz: valid (3 sections)"
+
+    def test_invalid_json(self, tmp_path):
+        # Arrange
+        target = tmp_path / "broken.realm.json.gz"
+        target.write_bytes(gzip.compress(b'{"realm": '))
+
+        # Act & Assert
+        with pytest.raises(SystemExit, match="Invalid JSON"):
+            main(["validate", str(target)])
+
+    def test_not_an_object(self, tmp_path):
+        # Arrange
+        target = tmp_path / "list.realm.json"
+        target.write_text("[]")
+
+        # Act & Assert
+        with pytest.raises(SystemExit, match="not an object"):
+            main(["validate", str(target)])
@@ -0,0 +1,203 @@
+import pytest
+
+from pykeycloak_realm.authz_matrix import (
+    MatrixError,
+    expand_matrix,
+    iter_matrix,
+    matrix_id,
+)
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.schema import validate_realm
+
+
+def make_client():
+    return {
+        "clientId": "otago",
+        "authorizationSettings": {
+            "policies": [{"name": "deny_all", "type": "time", "config": {}}],
+            "matrix": {
+                "scopes": {"view": "View Scope", "update": None},
+                "resources": {
+                    "/otago/users": {"type": "urn:section", "displayName": "Users"},
+                    "/otago/roles": {"scopes": ["view"]},
+                },
+                "policies": {
+                    "policy_role__otago_admin": {
+                        "type": "role",
+                        "config": {"roles": [{"id": "admin"}]},
+                    }
+                },
+                "grants": {
+                    "policy_role__otago_admin": {
+                        "/otago/users": ["view", "update"],
+                        "/otago/roles": ["view"],
+                    },
+                    "deny_all": {"/otago/users": ["update"]},
+                },
+            },
+        },
+    }
+
+
+class TestExpandMatrix:
+    def test_generates_all_sections(self):
+        # Arrange
+        client = make_client()
+
+        # Act
+        count = expand_matrix(client)
+
+        # Assert
+        auth = client["authorizationSettings"]
+        assert "matrix" not in auth
+        assert count == 2 + 2 + 1 + 3
+        assert auth["scopes"] == [
+            {
+                "id": matrix_id("otago", "scope", "view"),
+                "name": "view",
+                "displayName": "View Scope",
+            },
+            {"id": matrix_id("otago", "scope", "update"), "name": "update"},
+        ]
+        users, roles = auth["resources"]
+        assert users == {
+            "_id": matrix_id("otago", "resource", "/otago/users"),
+            "name": "/otago/users",
+            "uri": "/otago/users",
+            "type": "urn:section",
+            "displayName": "Users",
+            "scopes": ["view", "update"],
+        }
+        assert roles["scopes"] == ["view"]
+        assert [p["name"] for p in auth["policies"]] == [
+            "deny_all",
+            "policy_role__otago_admin",
+            "view:/otago/users",
+            "update:/otago/users",
+            "view:/otago/roles",
+        ]
+        assert auth["policies"][3] == {
+            "id": matrix_id("otago", "permission", "update:/otago/users"),
+            "name": "update:/otago/users",
+            "type": "scope",
+            "logic": "POSITIVE",
+            "decisionStrategy": "AFFIRMATIVE",
+            "resources": ["/otago/users"],
+            "scopes": ["update"],
+            "policies": ["policy_role__otago_admin", "deny_all"],
+        }
+
+    def test_ids_are_stable(self):
+        # Act
+        first = list(
+            iter_matrix("otago", make_client()["authorizationSettings"]["matrix"])
+        )
+        second = list(
+            iter_matrix("otago", make_client()["authorizationSettings"]["matrix"])
+        )
+
+        # Assert
+        assert first == second
+        assert matrix_id("otago", "scope", "view") != matrix_id(
+            "other", "scope", "view"
+        )
+
+    def test_permission_options(self):
+        # Arrange
+        client = make_client()
+        matrix = client["authorizationSettings"]["matrix"]
+        matrix["permission_name"] = "{resource} ({scope})"
+        matrix["permission"] = {"decisionStrategy": "UNANIMOUS"}
+
+        # Act
+        expand_matrix(client)
+
+        # Assert
+        permission = client["authorizationSettings"]["policies"][-1]
+        assert permission["name"] == "/otago/roles (view)"
+        assert permission["decisionStrategy"] == "UNANIMOUS"
+
+    def test_name_collision(self):
+        # Arrange
+        client = make_client()
+        client["authorizationSettings"]["matrix"]["permission_name"] = "{resource}"
+
+        # Act & Assert
+        with pytest.raises(
+            MatrixError, match="Duplicate name .* otago: policies '/otago/users'"
+        ):
+            expand_matrix(client)
+
+    def test_collision_with_declared_entry(self):
+        # Arrange
+        client = make_client()
+        client["authorizationSettings"]["scopes"] = [{"name": "view"}]
+
+        # Act & Assert
+        with pytest.raises(MatrixError, match="scopes 'view'"):
+            expand_matrix(client)
+
+    def test_unknown_policy(self):
+        # Arrange
+        client = make_client()
+        client["authorizationSettings"]["matrix"]["grants"]["missing_policy"] = {}
+
+        # Act & Assert
+        with pytest.raises(MatrixError, match="Unknown policies .*: missing_policy"):
+            expand_matrix(client)
+
+    def test_unknown_resource_and_scope(self):
+        # Arrange
+        client = make_client()
+        client["authorizationSettings"]["matrix"]["grants"]["deny_all"] = {
+            "/otago/nope": ["view"],
+            "/otago/roles": ["delete"],
+        }
+
+        # Act & Assert
+        with pytest.raises(
+            MatrixError,
+            match=r"resource '/otago/nope' \(granted by deny_all\), "
+            r"scope 'delete' \(granted by deny_all\)",
+        ):
+            expand_matrix(client)
+
+    def test_shared_settings_are_left_as_they_were(self):
+        # Arrange
+        client = make_client()
+        other = {
+            "clientId": "other",
+            "authorizationSettings": client["authorizationSettings"],
+        }
+
+        # Act
+        expand_matrix(client)
+
+        # Assert
+        assert "matrix" in other["authorizationSettings"]
+        assert other["authorizationSettings"]["policies"] == [
+            {"name": "deny_all", "type": "time", "config": {}}
+        ]
+        assert "scopes" not in other["authorizationSettings"]
+
+    def test_client_without_matrix(self):
+        # Arrange
+        client = {"clientId": "x", "authorizationSettings": {"policies": []}}
+
+        # Act & Assert
+        assert expand_matrix(client) == 0
+        assert client == {"clientId": "x", "authorizationSettings": {"policies": []}}
+
+
+class TestTransformerStage:
+    def test_generated_policies_are_encoded_and_valid(self):
+        # Arrange
+        template = {"realm": {"realm": "otago", "clients": [make_client()]}}
+
+        # Act
+        realm = RealmTransformer(template, validate_schema=True).apply()
+
+        # Assert
+        policies = realm["clients"][0]["authorizationSettings"]["policies"]
+        assert policies[1]["config"] == {"roles": '[{"id": "admin"}]'}
+        assert validate_realm(realm) == []
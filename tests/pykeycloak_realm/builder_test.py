@@ -312,13 +312,13 @@ class TestRealmTransformer:
         # Assert
         assert result["clients"][0] == {"clientId": "test-client"}
 
-    def test_transform_authorizations(self, sample_template):
+    def test_encode_policies(self, sample_template):
         """Тест трансформации авторизаций"""
         # Arrange
         transformer = RealmTransformer(sample_template)
 
         # Act
-        result = transformer._transform_authorizations(transformer.realm)
+        result = transformer._encode_policies(transformer.realm)
 
         # Assert
         auth_client = next(
@@ -338,13 +338,13 @@ class TestRealmTransformer:
             regular_policy["config"]["setting"] == "value"
         )  # Original config should remain
 
-    def test_transform_authorizations_no_auth_settings(self):
+    def test_encode_policies_no_auth_settings(self):
         # Arrange
         template = {"realm": {"clients": [{"clientId": "simple-client"}]}, "envs": {}}
         transformer = RealmTransformer(template)
 
         # Act
-        result = transformer._transform_authorizations(transformer.realm)
+        result = transformer._encode_policies(transformer.realm)
 
         # Assert
         assert result["clients"][0]["clientId"] == "simple-client"
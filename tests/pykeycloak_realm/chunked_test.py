@@ -0,0 +1,137 @@
+import copy
+from pathlib import Path
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.chunked import chunks, worth_chunking
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.fingerprint import dump_realm
+from pykeycloak_realm.snapshot import check_templates, find_templates
+
+DATA = Path(__file__).parents[2] / "data" / "realms"
+
+POLICY_ENCODING = {"policy_role__": ("roles",), "policy_group__": ("groups",)}
+
+
+def make_template(clients=7, users=11):
+    shared_roles = [{"id": "$web_cid/admin", "required": True}]
+    return {
+        "envs": {
+            "clients": [
+                {"clientId": "web", "cid": "id-web", "cid_alias": "web_cid"},
+                {"clientId": "client-3", "secret": "s3", "id": "id-3"},
+            ]
+        },
+        "realm": {
+            "realm": "big",
+            "enabled": True,
+            "clients": [{"clientId": "web"}]
+            + [
+                {
+                    "clientId": f"client-{c}",
+                    "authorizationSettings": {
+                        "policies": [
+                            {
+                                "name": f"policy_role__{c}",
+                                "config": {"roles": shared_roles},
+                            },
+                            {
+                                "name": f"policy_group__{c}",
+                                "config": {"groups": [f"/team-{c % 3}"]},
+                            },
+                        ]
+                    },
+                }
+                for c in range(clients - 1)
+            ],
+            "roles": {"client": {"$web_cid": [{"name": "admin"}]}},
+            "users": [
+                {
+                    "username": f"user-{u}",
+                    "clientRoles": {"$web_cid": ["admin"]},
+                    "credentials": [{"type": "password", "value": f"pw-{u}"}],
+                }
+                for u in range(users)
+            ],
+        },
+    }
+
+
+def build(template, **kwargs):
+    realm = RealmTransformer(
+        copy.deepcopy(template), policy_encoding=POLICY_ENCODING, **kwargs
+    ).apply()
+    output = bytearray()
+    dump_realm(realm, output.extend)
+    return bytes(output)
+
+
+class TestChunks:
+    def test_keeps_order_and_last_partial_chunk(self):
+        # Act
+        result = chunks(list(range(7)), 3)
+
+        # Assert
+        assert result == [[0, 1, 2], [3, 4, 5], [6]]
+
+    @pytest.mark.parametrize(
+        ("workers", "chunk_size", "expected"),
+        [(2, 5, True), (1, 5, False), (2, 100, False), (2, 0, False)],
+    )
+    def test_worth_chunking(self, workers, chunk_size, expected):
+        # Arrange
+        realm = make_template()["realm"]
+
+        # Act & Assert
+        assert worth_chunking(realm, workers, chunk_size) is expected
+
+
+class TestChunkedTransform:
+    @pytest.mark.parametrize("compact_model", [False, True])
+    @pytest.mark.parametrize("chunk_size", [1, 4, 10])
+    def test_same_bytes_as_serial(self, compact_model, chunk_size):
+        # Arrange
+        template = make_template()
+
+        # Act
+        serial = build(template, compact_model=compact_model)
+        chunked = build(
+            template,
+            compact_model=compact_model,
+            transform_workers=2,
+            transform_chunk_size=chunk_size,
+        )
+
+        # Assert
+        assert chunked == serial
+        assert b'"$web_cid"' not in chunked
+        assert b'"secret": "s3"' in chunked
+
+    def test_realm_without_clients(self):
+        # Arrange
+        template = make_template()
+        del template["realm"]["clients"]
+
+        # Act
+        serial = build(template)
+        chunked = build(template, transform_workers=2, transform_chunk_size=3)
+
+        # Assert
+        assert chunked == serial
+
+    def test_bundled_templates_match_golden_exports(self):
+        # Arrange
+        config = RealmBuilderConfig(
+            policy_encoding="policy_role__=roles;policy_client__=clients;policy_group__=groups",
+            validate_schema=True,
+            transform_workers=2,
+            transform_chunk_size=1,
+        )
+        templates = find_templates(DATA / "templates", config.template_file_suffix)
+
+        # Act
+        results = check_templates(templates, DATA / "golden", config, jobs=1)
+
+        # Assert
+        assert [r.status for r in results] == ["ok"] * len(templates)
@@ -2,7 +2,7 @@ from pathlib import Path
 
 import pytest
 
-from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.config import KeycloakAdminConfig, RealmBuilderConfig
 
 
 class TestRealmBuilderConfig:
@@ -171,3 +171,198 @@ class TestRealmBuilderConfig:
         assert config.template_file_suffix == ".valid.yml"
         assert config.realm_file_suffix == ".valid.json"
         assert config.overwrite_existing_realm is True
+
+
+class TestPolicyEncodingRules:
+    def test_default_rules(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_POLICY_ENCODING", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.policy_encoding_rules == {"policy_role__": ("roles",)}
+
+    def test_multiple_rules(self):
+        # Act
+        config = RealmBuilderConfig(
+            policy_encoding="policy_role__=roles; policy_group__=groups,roles;"
+        )
+
+        # Assert
+        assert config.policy_encoding_rules == {
+            "policy_role__": ("roles",),
+            "policy_group__": ("groups", "roles"),
+        }
+
+    def test_invalid_rule(self):
+        # Arrange
+        config = RealmBuilderConfig(policy_encoding="policy_role__")
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="Invalid policy encoding rule"):
+            _ = config.policy_encoding_rules
+
+
+class TestExportCompression:
+    def test_default_is_plain_json(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_EXPORT_COMPRESSION", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.export_compression == "none"
+
+    def test_from_environment(self, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_EXPORT_COMPRESSION", "gzip")
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.export_compression == "gzip"
+
+
+class TestCompactModel:
+    def test_disabled_by_default(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_COMPACT_MODEL", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.compact_model is False
+
+    def test_from_environment(self, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_COMPACT_MODEL", "True")
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.compact_model is True
+
+
+class TestValidateSchema:
+    def test_disabled_by_default(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_VALIDATE_SCHEMA", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.validate_schema is False
+
+    def test_from_environment(self, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_VALIDATE_SCHEMA", "True")
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.validate_schema is True
+
+
+class TestGoldenPath:
+    def test_default(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_GOLDEN_PATH", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.golden_dir_path == str(Path("./data/realms/golden").resolve())
+
+    def test_from_environment(self, monkeypatch, tmp_path):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_GOLDEN_PATH", str(tmp_path))
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.golden_dir_path == str(tmp_path.resolve())
+
+
+class TestKeycloakAdminConfig:
+    def test_defaults(self, monkeypatch):
+        # Arrange
+        for name in ("KEYCLOAK_ADMIN_URL", "KEYCLOAK_INSTANCE_PORT"):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setenv("KEYCLOAK_INSTANCE_PASSWORD", "secret")
+
+        # Act
+        config = KeycloakAdminConfig()
+
+        # Assert
+        assert config.url == "http://127.0.0.1:8089"
+        assert config.password == "secret"  # noqa: S105
+        assert "secret" not in repr(config)
+
+    def test_url_follows_published_port(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_ADMIN_URL", raising=False)
+        monkeypatch.setenv("KEYCLOAK_INSTANCE_PORT", "9090")
+
+        # Act
+        config = KeycloakAdminConfig()
+
+        # Assert
+        assert config.url == "http://127.0.0.1:9090"
+
+
+class TestTransformWorkers:
+    def test_serial_by_default(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_TRANSFORM_WORKERS", raising=False)
+        monkeypatch.delenv("KEYCLOAK_BUILDER_TRANSFORM_CHUNK_SIZE", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.transform_workers == 0
+        assert config.transform_chunk_size == 2000
+
+    def test_from_environment(self, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TRANSFORM_WORKERS", "4")
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TRANSFORM_CHUNK_SIZE", "500")
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.transform_workers == 4
+        assert config.transform_chunk_size == 500
+
+
+class TestMetricsPath:
+    def test_off_by_default(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_METRICS_PATH", raising=False)
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.metrics_path == ""
+
+    def test_from_environment(self, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_METRICS_PATH", "metrics/build")
+
+        # Act
+        config = RealmBuilderConfig()
+
+        # Assert
+        assert config.metrics_path == "metrics/build"
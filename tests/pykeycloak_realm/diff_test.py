@@ -0,0 +1,119 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.diff import Change, diff_exports, diff_values
+from pykeycloak_realm.realm import main
+
+OLD = {
+    "realm": "otago",
+    "enabled": True,
+    "clients": [
+        {"clientId": "account", "enabled": True},
+        {"clientId": "otago", "redirectUris": ["/a", "/b"]},
+    ],
+    "users": [{"username": "admin", "enabled": True}],
+    "smtpServer": {},
+}
+
+
+class TestDiffValues:
+    def test_equal_values(self):
+        # Act & Assert
+        assert list(diff_values(OLD, json.loads(json.dumps(OLD)))) == []
+
+    def test_records_are_matched_by_key(self):
+        # Arrange
+        new = [
+            {"clientId": "new"},
+            {"clientId": "otago", "redirectUris": ["/a", "/c"]},
+        ]
+
+        # Act
+        changes = list(diff_values(OLD["clients"], new, "clients"))
+
+        # Assert
+        assert changes == [
+            Change("removed", "clients[clientId=account]", old=OLD["clients"][0]),
+            Change("changed", "clients[clientId=otago].redirectUris[1]", "/b", "/c"),
+            Change("added", "clients[clientId=new]", new={"clientId": "new"}),
+        ]
+
+    def test_lists_without_unique_key_are_compared_by_position(self):
+        # Act
+        changes = list(diff_values([{"a": 1}, {"a": 1}], [{"a": 1}], "x"))
+
+        # Assert
+        assert changes == [Change("removed", "x[1]", old={"a": 1})]
+
+    def test_dict_keys_and_types(self):
+        # Act
+        changes = list(diff_values({"a": 1, "b": [1]}, {"b": {"c": 1}, "d": None}))
+
+        # Assert
+        assert [str(c) for c in changes] == [
+            "- a: 1",
+            '~ b: [1] -> {"c": 1}',
+            "+ d: null",
+        ]
+
+
+class TestDiffExports:
+    @pytest.fixture
+    def exports(self, tmp_path):
+        old_path = tmp_path / "old.realm.json"
+        new_path = tmp_path / "new.realm.json"
+        write_to_realm_import_file(OLD, old_path)
+        new = OLD | {"users": [{"username": "admin", "enabled": False}], "x": 1}
+        write_to_realm_import_file(new, new_path)
+        return old_path, new_path
+
+    def test_only_changed_sections_are_decoded(self, exports):
+        # Act
+        with patch(
+            "pykeycloak_realm.export_reader.ExportReader.section",
+            autospec=True,
+            side_effect=lambda reader, name: {
+                "users": [{"username": "admin", "enabled": reader.path.name[0] == "o"}],
+                "x": 1,
+            }[name],
+        ) as mock_section:
+            sections, changes = diff_exports(*exports)
+
+        # Assert
+        assert sections == {"users": "changed", "x": "added"}
+        assert {call.args[1] for call in mock_section.call_args_list} == {"users", "x"}
+        assert [str(c) for c in changes] == [
+            "~ users[username=admin].enabled: true -> false",
+            "+ x: 1",
+        ]
+
+    def test_identical_exports(self, exports):
+        # Act
+        result = diff_exports(exports[0], exports[0])
+
+        # Assert
+        assert result == ({}, [])
+
+    def test_cli_diff(self, exports, capsys):
+        # Act
+        with pytest.raises(SystemExit) as exc_info:
+            main(["diff", *map(str, exports)])
+
+        # Assert
+        assert exc_info.value.code == 1
+        assert capsys.readouterr().out.splitlines() == [
+            "users: changed",
+            "x: added",
+            "~ users[username=admin].enabled: true -> false",
+            "+ x: 1",
+        ]
+
+    def test_cli_diff_identical(self, exports, capsys):
+        # Act
+        main(["diff", str(exports[0]), str(exports[0])])
+
+        # Assert
+        assert capsys.readouterr().out == ""
@@ -0,0 +1,284 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from pykeycloak_realm.export_reader import (
+    INDEX_SUFFIX,
+    ExportReader,
+    Table,
+    build_index,
+    query,
+)
+from pykeycloak_realm.realm import main
+
+REALM = {
+    "realm": "otago",
+    "enabled": True,
+    "accessTokenLifespan": 604800,
+    "displayName": 'OTAGO, "quoted" {braces} [brackets]',
+    "roles": {
+        "realm": [{"id": "r-1", "name": "offline_access"}],
+        "client": {
+            "otago": [
+                {"id": "r-admin", "name": "system_role__otago_admin"},
+                {"id": "r-user", "name": "public_role__otago_regular_user"},
+            ]
+        },
+    },
+    "clients": [
+        {"clientId": "account", "enabled": False},
+        {
+            "clientId": "otago",
+            "defaultRoles": ["public_role__otago_regular_user"],
+            "authorizationSettings": {
+                "policies": [
+                    {
+                        "name": "policy_role__otago_admin",
+                        "config": {"roles": json.dumps([{"id": "r-admin"}])},
+                    },
+                    {"name": "system_policy_time__deny_all", "config": {}},
+                ]
+            },
+        },
+        {"clientId": "reports", "description": "mentions r-admin only in text"},
+    ],
+    "users": [
+        {"username": "admin", "clientRoles": {"otago": ["system_role__otago_admin"]}},
+        {"username": "юзер", "clientRoles": {}},
+    ],
+    "groups": [{"name": "staff", "subGroups": [{"name": "nested"}]}],
+    "smtpServer": {},
+}
+
+
+@pytest.fixture(params=[2, None], ids=["indented", "compact"])
+def export_file(request, tmp_path):
+    path = tmp_path / "otago.realm.json"
+    path.write_text(
+        json.dumps(REALM, indent=request.param, ensure_ascii=False), encoding="utf-8"
+    )
+    return path
+
+
+class TestBuildIndex:
+    def test_sections_cover_every_top_level_key(self, export_file):
+        # Arrange
+        data = export_file.read_bytes()
+
+        # Act
+        sections, _ = build_index(data)
+
+        # Assert
+        assert list(sections) == list(REALM)
+        for key, (start, end) in sections.items():
+            assert json.loads(data[start:end]) == REALM[key]
+
+    def test_records(self, export_file):
+        # Act
+        _, tables = build_index(export_file.read_bytes())
+
+        # Assert
+        assert tables["clients"].names == ["account", "otago", "reports"]
+        assert tables["users"].names == ["admin", "юзер"]
+        assert tables["groups"].names == ["staff"]
+        assert tables["roles"].names == ["offline_access"]
+        assert tables["roles/otago"].names == [
+            "system_role__otago_admin",
+            "public_role__otago_regular_user",
+        ]
+        assert tables["policies"].names == [
+            "policy_role__otago_admin",
+            "system_policy_time__deny_all",
+        ]
+        assert list(tables["policies"].owners) == [1, 1]
+
+    def test_truncated_export(self):
+        # Act & Assert
+        with pytest.raises(ValueError, match="Invalid realm export"):
+            build_index(b'{"clients": [{"clientId": "a"}')
+
+
+class TestTable:
+    def test_pack_roundtrip(self):
+        # Arrange
+        table = Table()
+        table.append(0, 10, "a")
+        table.append(12, 20, None, owner=3)
+
+        # Act
+        unpacked = Table.unpack(json.loads(json.dumps(table.pack())))
+
+        # Assert
+        assert unpacked.names == ["a", ""]
+        assert list(unpacked.starts) == [0, 12]
+        assert list(unpacked.ends) == [10, 20]
+        assert list(unpacked.owners) == [-1, 3]
+        assert unpacked.find("a") == 0
+        assert unpacked.find("") is None
+
+    def test_packed_lookups(self):
+        # Arrange
+        table = Table()
+        for i, name in enumerate(["a", "ab", "b", "a", "c", "b", "d"]):
+            table.append(i * 10, i * 10 + 5, name, owner=i)
+        packed = Table.unpack(table.pack())
+
+        # Act & Assert
+        assert packed.find_all("b") == [2, 5]
+        assert packed.find_all("a") == [0, 3]
+        assert packed.find_all("x") == []
+        assert packed.find("c") == 4
+        assert packed.find("d") == 6
+        assert [packed.span(i) for i in range(len(packed))] == [
+            table.span(i) for i in range(len(table))
+        ]
+        assert packed.item("owners", 5) == 5
+
+    def test_empty_pack_roundtrip(self):
+        # Act
+        unpacked = Table.unpack(Table().pack())
+
+        # Assert
+        assert len(unpacked) == 0
+        assert unpacked.names == []
+
+
+class TestExportReader:
+    def test_lookups_decode_single_records(self, export_file):
+        with ExportReader(export_file) as reader:
+            # Act & Assert
+            assert reader.client("otago") == REALM["clients"][1]
+            assert reader.client("missing") is None
+            assert reader.user("юзер") == REALM["users"][1]
+            assert reader.group("staff") == REALM["groups"][0]
+            assert reader.role("offline_access") == REALM["roles"]["realm"][0]
+            assert reader.role("system_role__otago_admin", "otago")["id"] == "r-admin"
+            assert reader.section("displayName") == REALM["displayName"]
+            assert reader.section("enabled") is True
+            assert list(reader.iter_users()) == REALM["users"]
+
+    def test_policy(self, export_file):
+        with ExportReader(export_file) as reader:
+            # Act
+            result = reader.policy("policy_role__otago_admin")
+
+        # Assert
+        assert result == [
+            ("otago", REALM["clients"][1]["authorizationSettings"]["policies"][0])
+        ]
+
+    def test_clients_referencing_role(self, export_file):
+        with ExportReader(export_file) as reader:
+            # Act
+            admin_refs = reader.clients_referencing_role(
+                "system_role__otago_admin", "otago"
+            )
+            user_refs = reader.clients_referencing_role(
+                "public_role__otago_regular_user", "otago"
+            )
+
+        # Assert
+        assert admin_refs == ["otago"]
+        assert user_refs == ["otago"]
+
+    def test_role_refs_match_role_names_only(self, tmp_path):
+        # Arrange
+        realm = {
+            "roles": {
+                "realm": [{"id": "r-rôle", "name": "rôle"}, {"name": "admin"}],
+                "client": {"other": [{"name": "admin"}]},
+            },
+            "clients": [
+                {"clientId": "a", "defaultRoles": ["rôle"]},
+                {
+                    "clientId": "b",
+                    "authorizationSettings": {
+                        "policies": [
+                            {
+                                "name": "policy_role__b",
+                                "config": {"roles": json.dumps([{"id": "r-rôle"}])},
+                            },
+                            {
+                                "name": "policy_role__admin",
+                                "config": {"roles": json.dumps([{"id": "admin"}])},
+                            },
+                        ]
+                    },
+                },
+                {"clientId": "other"},
+            ],
+        }
+        path = tmp_path / "otago.realm.json"
+        path.write_text(json.dumps(realm, ensure_ascii=False), encoding="utf-8")
+
+        with ExportReader(path) as reader:
+            # Act
+            non_ascii_refs = reader.clients_referencing_role("rôle")
+            realm_role_refs = reader.clients_referencing_role("admin")
+            client_role_refs = reader.clients_referencing_role("admin", "other")
+
+        # Assert
+        assert non_ascii_refs == ["a", "b"]
+        assert realm_role_refs == ["b"]
+        assert client_role_refs == ["b", "other"]
+
+    def test_index_is_cached_next_to_export(self, export_file):
+        # Arrange
+        with ExportReader(export_file) as reader:
+            reader.client("otago")
+
+        # Act
+        with patch("pykeycloak_realm.export_reader.build_index") as mock_build:
+            with ExportReader(export_file) as reader:
+                client = reader.client("otago")
+
+        # Assert
+        assert export_file.with_name(export_file.name + INDEX_SUFFIX).is_file()
+        mock_build.assert_not_called()
+        assert client == REALM["clients"][1]
+
+    def test_stale_index_is_rebuilt(self, export_file):
+        # Arrange
+        with ExportReader(export_file) as reader:
+            reader.client("otago")
+        export_file.write_text(json.dumps({"clients": [{"clientId": "new"}]}))
+
+        # Act
+        with ExportReader(export_file) as reader:
+            client = reader.client("new")
+
+        # Assert
+        assert client == {"clientId": "new"}
+
+    def test_empty_export(self, tmp_path):
+        # Arrange
+        path = tmp_path / "empty.realm.json"
+        path.write_text("")
+
+        # Act
+        with ExportReader(path, use_cache=False) as reader:
+            sections = reader.sections()
+
+        # Assert
+        assert sections == []
+
+
+class TestQuery:
+    def test_query_requires_name(self, export_file):
+        with ExportReader(export_file) as reader:
+            # Act & Assert
+            with pytest.raises(ValueError, match="needs a name"):
+                query(reader, "client", None, None)
+
+    def test_cli_query_client(self, export_file, capsys):
+        # Act
+        main(["query", str(export_file), "client", "otago"])
+
+        # Assert
+        assert json.loads(capsys.readouterr().out) == REALM["clients"][1]
+
+    def test_cli_query_not_found(self, export_file):
+        # Act & Assert
+        with pytest.raises(SystemExit, match="not found"):
+            main(["query", str(export_file), "user", "nobody"])
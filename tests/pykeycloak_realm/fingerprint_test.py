@@ -0,0 +1,173 @@
+import hashlib
+import io
+import json
+import os
+
+import pytest
+
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.fingerprint import (
+    CHUNK_RECORDS,
+    changed_sections,
+    dump_realm,
+    fingerprint_export,
+    fingerprint_path,
+    load_fingerprint,
+    read_fingerprint,
+)
+
+REALM = {
+    "realm": "otago",
+    "enabled": True,
+    "displayName": "Отаго\nline",
+    "roles": {"realm": [{"name": "offline_access"}], "client": {}},
+    "clients": [{"clientId": "otago", "redirectUris": ["/*"], "attributes": {}}],
+    "users": [],
+    "authenticationFlows": [{"alias": "browser", "authenticationExecutions": []}],
+    "components": {"org.keycloak.keys.KeyProvider": [{"name": "rsa"}]},
+}
+
+
+class TestDumpRealm:
+    @pytest.mark.parametrize(
+        "realm_data",
+        [
+            REALM,
+            {},
+            {"a": {}},
+            {"a": []},
+            {"a": [[1, [2, []]], {"k": {"x": [1]}}, "s", None]},
+            {"a": {1: "int key", "b": [True]}, "c": {"ключ": [{"x": {}}, []]}},
+        ],
+    )
+    def test_output_matches_json_dumps(self, realm_data):
+        # Arrange
+        buffer = io.BytesIO()
+
+        # Act
+        fingerprint = dump_realm(realm_data, buffer.write)
+
+        # Assert
+        expected = json.dumps(realm_data, indent=2, ensure_ascii=False).encode()
+        assert buffer.getvalue() == expected
+        assert fingerprint["realm"] == hashlib.sha256(expected).hexdigest()
+        assert fingerprint["size"] == len(expected)
+        assert list(fingerprint["sections"]) == list(realm_data)
+
+    def test_sections_are_written_in_chunks_of_records(self):
+        # Arrange
+        users = [{"username": f"user-{i}"} for i in range(4 * CHUNK_RECORDS + 1)]
+        realm_data = {"realm": "otago", "users": users}
+        writes = []
+
+        # Act
+        dump_realm(realm_data, writes.append)
+
+        # Assert
+        output = b"".join(writes)
+        assert output == json.dumps(realm_data, indent=2).encode()
+        assert max(map(len, writes)) < len(output) / 3
+
+    def test_section_hash_only_depends_on_section(self):
+        # Arrange
+        changed = REALM | {"users": [{"username": "admin"}]}
+
+        # Act
+        old = dump_realm(REALM, io.BytesIO().write)
+        new = dump_realm(changed, io.BytesIO().write)
+
+        # Assert
+        assert old["realm"] != new["realm"]
+        assert changed_sections(old, new) == {"users": "changed"}
+
+    def test_changed_sections(self):
+        # Arrange
+        old = dump_realm({"a": 1, "b": 2, "c": 3}, io.BytesIO().write)
+        new = dump_realm({"a": 1, "b": 20, "d": 4}, io.BytesIO().write)
+
+        # Act
+        result = changed_sections(old, new)
+
+        # Assert
+        assert result == {"b": "changed", "d": "added", "c": "removed"}
+
+
+class TestSidecar:
+    def test_export_writes_sidecar(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+
+        # Act
+        write_to_realm_import_file(REALM, target)
+
+        # Assert
+        fingerprint = read_fingerprint(target)
+        assert fingerprint_path(target).name == "otago.realm.json.fingerprint.json"
+        assert fingerprint["realm"] == hashlib.sha256(target.read_bytes()).hexdigest()
+        for section in (
+            "clients",
+            "roles",
+            "users",
+            "authenticationFlows",
+            "components",
+        ):
+            assert section in fingerprint["sections"]
+
+    def test_recomputed_fingerprint_matches_sidecar(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target)
+
+        # Act
+        recomputed = fingerprint_export(target)
+
+        # Assert
+        assert recomputed == read_fingerprint(target)
+
+    def test_stale_sidecar_is_ignored(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target)
+        target.write_text(json.dumps({"realm": "other"}, indent=2))
+
+        # Act
+        fingerprint = load_fingerprint(target)
+
+        # Assert
+        assert read_fingerprint(target) is None
+        assert list(fingerprint["sections"]) == ["realm"]
+
+    def test_same_size_replacement_is_detected(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file({"realm": "otago"}, target)
+        target.write_text(json.dumps({"realm": "atago"}, indent=2))
+
+        # Act & Assert
+        assert read_fingerprint(target) is None
+
+    def test_touched_export_is_hashed_again(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target)
+        stat = target.stat()
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        # Act
+        fingerprint = read_fingerprint(target)
+
+        # Assert
+        assert fingerprint is not None
+        assert fingerprint["realm"] == hashlib.sha256(target.read_bytes()).hexdigest()
+
+    def test_failed_write_removes_old_sidecar(self, tmp_path):
+        # Arrange
+        target = tmp_path / "otago.realm.json"
+        write_to_realm_import_file(REALM, target)
+
+        # Act
+        with pytest.raises(TypeError):
+            write_to_realm_import_file({"bad": object()}, target, overwrite=True)
+
+        # Assert
+        assert not fingerprint_path(target).exists()
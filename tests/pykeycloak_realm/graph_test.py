@@ -0,0 +1,250 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from pykeycloak_realm import graph
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.graph import (
+    CycleError,
+    build_realms,
+    downstream,
+    find_cycle,
+    inputs_path,
+    topological_order,
+    upstream,
+)
+from pykeycloak_realm.realm import main
+from pykeycloak_realm.realm_refs import RealmRefError
+from pykeycloak_realm.secret_refs import clear_caches
+
+PARTNER = """\
+realm:
+  realm: partner
+  displayName: Partner
+  clients:
+    - clientId: broker
+      secret: !env PARTNER_BROKER_SECRET
+"""
+
+APP = """\
+realm:
+  realm: app
+  identityProviders:
+    - alias: partner
+      config:
+        clientId: broker
+        clientSecret: !ref partner/clients/broker/secret
+"""
+
+DEPS = {"app": {"partner"}, "portal": {"app"}, "partner": set(), "other": set()}
+
+
+def write_templates(directory, **templates):
+    for name, text in templates.items():
+        (Path(directory) / f"{name}.realm.yml").write_text(text)
+
+
+def read_export(config, name):
+    return json.loads(config.get_realm_filename(name).read_text())
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    clear_caches()
+    yield
+    clear_caches()
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setenv("PARTNER_BROKER_SECRET", "s1")
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    export = tmp_path / "export"
+    export.mkdir()
+    write_templates(templates, partner=PARTNER, app=APP)
+    return RealmBuilderConfig(
+        _template_dir_path=str(templates), _template_export_dir_path=str(export)
+    )
+
+
+def statuses(results):
+    return {result.template: result.status for result in results}
+
+
+class TestOrder:
+    def test_dependencies_come_first(self):
+        # Act & Assert
+        assert topological_order(DEPS) == ["other", "partner", "app", "portal"]
+
+    def test_cycle(self):
+        # Arrange
+        deps = {"a": {"b"}, "b": {"c"}, "c": {"a"}, "d": set()}
+
+        # Act & Assert
+        assert find_cycle(deps) == ["a", "b", "c", "a"]
+        with pytest.raises(CycleError, match="Dependency cycle: a -> b -> c -> a"):
+            topological_order(deps)
+
+    def test_upstream_and_downstream(self):
+        # Act & Assert
+        assert upstream(DEPS, ["portal"]) == {"app", "partner"}
+        assert downstream(DEPS, ["partner"]) == {"app", "portal"}
+        assert downstream(DEPS, ["other"]) == set()
+
+
+class TestBuildRealms:
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_referenced_values_are_resolved(self, config, jobs):
+        # Act
+        results = build_realms(["partner", "app"], config, jobs=jobs)
+
+        # Assert
+        assert statuses(results) == {"partner": "built", "app": "built"}
+        provider = read_export(config, "app")["identityProviders"][0]
+        assert provider["config"]["clientSecret"] == "s1"
+        assert inputs_path(config.get_realm_filename("app")).is_file()
+
+    def test_referenced_realms_are_built_too(self, config):
+        # Act
+        results = build_realms(["app"], config)
+
+        # Assert
+        assert [result.template for result in results] == ["partner", "app"]
+
+    def test_unchanged_inputs_are_not_rebuilt(self, config):
+        # Arrange
+        build_realms(["partner", "app"], config)
+
+        # Act
+        results = build_realms(["partner", "app"], config)
+
+        # Assert
+        assert statuses(results) == {"partner": "unchanged", "app": "unchanged"}
+
+    def test_changed_builder_options_rebuild(self, config):
+        # Arrange
+        build_realms(["partner", "app"], config)
+        config.validate_schema = not config.validate_schema
+
+        # Act
+        results = build_realms(["partner", "app"], config)
+
+        # Assert
+        assert statuses(results) == {"partner": "built", "app": "built"}
+
+    def test_unchanged_templates_are_not_parsed(self, config, monkeypatch):
+        # Arrange
+        build_realms(["partner", "app"], config)
+        parsed = []
+        monkeypatch.setattr(graph, "_parse", lambda name, config: parsed.append(name))
+
+        # Act
+        build_realms(["partner", "app"], config)
+
+        # Assert
+        assert parsed == []
+
+    def test_force(self, config):
+        # Arrange
+        build_realms(["partner", "app"], config)
+
+        # Act
+        results = build_realms(["partner", "app"], config, force=True)
+
+        # Assert
+        assert statuses(results) == {"partner": "built", "app": "built"}
+
+    def test_changed_reference_rebuilds_dependents(self, config, monkeypatch):
+        # Arrange
+        build_realms(["partner", "app"], config)
+        monkeypatch.setenv("PARTNER_BROKER_SECRET", "s2")
+        clear_caches()
+
+        # Act
+        results = build_realms(["partner"], config, available=["partner", "app"])
+
+        # Assert
+        assert statuses(results) == {"partner": "built", "app": "built"}
+        provider = read_export(config, "app")["identityProviders"][0]
+        assert provider["config"]["clientSecret"] == "s2"
+
+    def test_unreferenced_change_leaves_dependents(self, config):
+        # Arrange
+        build_realms(["partner", "app"], config)
+        write_templates(
+            config.template_dir_path,
+            partner=PARTNER.replace("Partner", "Partner Ltd"),
+        )
+
+        # Act
+        results = build_realms(["partner"], config, available=["partner", "app"])
+
+        # Assert
+        assert statuses(results) == {"partner": "built", "app": "unchanged"}
+
+    def test_failed_dependency_skips_dependents(self, config, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("PARTNER_BROKER_SECRET")
+
+        # Act
+        results = build_realms(["partner", "app"], config)
+
+        # Assert
+        assert statuses(results) == {"partner": "failed", "app": "skipped"}
+        assert results[1].error == "Not built: partner failed"
+        assert not config.get_realm_filename("app").exists()
+
+    def test_missing_value_fails_the_referencing_realm(self, config):
+        # Arrange
+        write_templates(
+            config.template_dir_path,
+            app=APP.replace("clients/broker", "clients/portal"),
+        )
+
+        # Act
+        results = build_realms(["partner", "app"], config)
+
+        # Assert
+        assert statuses(results) == {"partner": "built", "app": "failed"}
+        assert "no 'portal' in partner/clients" in (results[1].error or "")
+
+    def test_reference_without_template(self, config):
+        # Arrange
+        write_templates(config.template_dir_path, app=APP.replace("partner/", "x/"))
+
+        # Act & Assert
+        with pytest.raises(RealmRefError, match="app references x, which has no"):
+            build_realms(["app"], config)
+
+
+class TestBuildCommand:
+    @pytest.fixture
+    def env(self, config, monkeypatch):
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TEMPLATES_PATH", config.template_dir_path)
+        monkeypatch.setenv(
+            "KEYCLOAK_BUILDER_EXPORT_PATH", config.template_export_dir_path
+        )
+        return config
+
+    def test_reports_every_realm(self, env, capsys):
+        # Act
+        main(["build", "--jobs", "1"])
+
+        # Assert
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].startswith("partner: built (")
+        assert lines[1].startswith("app: built (")
+        assert lines[2].startswith("2 realms in ")
+
+    def test_cycle_exits_with_message(self, env):
+        # Arrange
+        write_templates(
+            env.template_dir_path,
+            partner=PARTNER + "  loginTheme: !ref app/realm\n",
+        )
+
+        # Act & Assert
+        with pytest.raises(SystemExit, match="Dependency cycle: app -> partner -> app"):
+            main(["build"])
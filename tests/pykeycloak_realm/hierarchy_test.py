@@ -0,0 +1,237 @@
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.hierarchy import HierarchyError, RoleGraph, expand_hierarchy
+
+HIERARCHY = {
+    "roles": {
+        "admin": ["editor", "viewer", "otago/system_role__otago_admin"],
+        "editor": ["viewer"],
+        "viewer": None,
+    },
+    "client_roles": {"otago": {"system_role__otago_admin": ["viewer"]}},
+    "groups": {
+        "staff": ["viewer"],
+        "staff/admins": ["admin", "viewer"],
+        "/ops/oncall/": ["editor"],
+    },
+}
+
+
+def role(realm, name, client=None):
+    roles = (
+        realm["roles"]["realm"] if client is None else realm["roles"]["client"][client]
+    )
+    return next(r for r in roles if r["name"] == name)
+
+
+class TestExpandHierarchy:
+    def test_roles_and_composites(self):
+        # Act
+        realm = expand_hierarchy({"realm": "otago"}, HIERARCHY)
+
+        # Assert
+        assert role(realm, "admin") == {
+            "name": "admin",
+            "composite": True,
+            "composites": {
+                "realm": ["editor"],
+                "client": {"otago": ["system_role__otago_admin"]},
+            },
+        }
+        assert role(realm, "viewer") == {"name": "viewer", "composite": False}
+        assert role(realm, "system_role__otago_admin", "otago") == {
+            "name": "system_role__otago_admin",
+            "clientRole": True,
+            "composite": True,
+            "composites": {"realm": ["viewer"]},
+        }
+
+    def test_groups_and_subgroups(self):
+        # Act
+        realm = expand_hierarchy({"realm": "otago"}, HIERARCHY)
+
+        # Assert
+        assert realm["groups"] == [
+            {
+                "name": "staff",
+                "path": "/staff",
+                "subGroups": [
+                    {
+                        "name": "admins",
+                        "path": "/staff/admins",
+                        "subGroups": [],
+                        "realmRoles": ["admin"],
+                    }
+                ],
+                "realmRoles": ["viewer"],
+            },
+            {
+                "name": "ops",
+                "path": "/ops",
+                "subGroups": [
+                    {
+                        "name": "oncall",
+                        "path": "/ops/oncall",
+                        "subGroups": [],
+                        "realmRoles": ["editor"],
+                    }
+                ],
+            },
+        ]
+
+    def test_merges_into_existing_realm(self):
+        # Arrange
+        realm = {
+            "roles": {
+                "realm": [
+                    {"name": "viewer", "description": "Read only"},
+                    {"name": "auditor", "composites": {"realm": ["viewer"]}},
+                ]
+            },
+            "groups": [{"name": "staff", "path": "/staff", "attributes": {"a": ["1"]}}],
+        }
+
+        # Act
+        expand_hierarchy(
+            realm,
+            {
+                "roles": {"admin": ["auditor", "viewer"]},
+                "groups": {"staff/admins": ["admin"]},
+            },
+        )
+
+        # Assert
+        assert role(realm, "viewer") == {
+            "name": "viewer",
+            "description": "Read only",
+        }
+        assert role(realm, "admin")["composites"] == {"realm": ["auditor"]}
+        assert len(realm["groups"]) == 1
+        assert realm["groups"][0]["attributes"] == {"a": ["1"]}
+        assert realm["groups"][0]["subGroups"][0]["path"] == "/staff/admins"
+
+    def test_keeps_existing_group_roles(self):
+        # Arrange
+        realm = {
+            "groups": [
+                {
+                    "name": "staff",
+                    "realmRoles": ["auditor", "viewer"],
+                    "clientRoles": {"otago": ["report"], "web": ["login"]},
+                }
+            ]
+        }
+
+        # Act
+        expand_hierarchy(
+            realm,
+            {
+                "roles": {"viewer": [], "editor": []},
+                "client_roles": {"otago": {"report": [], "export": []}},
+                "groups": {"staff": ["editor", "viewer", "otago/export"]},
+            },
+        )
+
+        # Assert
+        group = realm["groups"][0]
+        assert group["realmRoles"] == ["auditor", "viewer", "editor"]
+        assert group["clientRoles"] == {
+            "otago": ["report", "export"],
+            "web": ["login"],
+        }
+
+    def test_role_without_children_is_no_longer_composite(self):
+        # Arrange
+        viewer = {"name": "viewer"}
+        editor = {
+            "name": "editor",
+            "composite": True,
+            "composites": {"realm": ["viewer"]},
+        }
+        realm = {"roles": {"realm": [viewer, editor]}}
+        other = {"roles": {"realm": [viewer, editor]}}  # shared by a YAML anchor
+
+        # Act
+        expand_hierarchy(realm, {"roles": {"editor": []}})
+
+        # Assert
+        assert role(realm, "editor") == {"name": "editor", "composite": False}
+        assert role(other, "editor")["composites"] == {"realm": ["viewer"]}
+
+    def test_cycle(self):
+        # Arrange
+        declaration = {
+            "roles": {"a": ["b"], "b": ["c"], "c": ["otago/d"]},
+            "client_roles": {"otago": {"d": ["b"]}},
+        }
+
+        # Act & Assert
+        with pytest.raises(
+            HierarchyError, match="Cycle in role hierarchy: b -> c -> otago/d -> b"
+        ):
+            expand_hierarchy({}, declaration)
+
+    def test_self_reference_is_a_cycle(self):
+        # Act & Assert
+        with pytest.raises(HierarchyError, match="a -> a"):
+            expand_hierarchy({}, {"roles": {"a": ["a"]}})
+
+    def test_unknown_roles(self):
+        # Arrange
+        declaration = {"roles": {"a": ["missing"]}, "groups": {"g": ["other/x"]}}
+
+        # Act & Assert
+        with pytest.raises(
+            HierarchyError,
+            match=r"Unknown roles in hierarchy: missing \(in a\), other/x \(in group g\)",
+        ):
+            expand_hierarchy({}, declaration)
+
+
+class TestRoleGraph:
+    def test_closure_is_memoized(self):
+        # Arrange
+        graph = RoleGraph()
+        for i in range(3):
+            graph.add((None, f"r{i}"), (None, f"r{i + 1}"))
+
+        # Act
+        closure = graph.closure(0)
+
+        # Assert
+        assert closure == 0b1110
+        assert graph._closures is not None
+        assert graph.closure(0) is closure
+
+    def test_reduce_keeps_order(self):
+        # Arrange
+        graph = RoleGraph()
+        graph.add((None, "a"), (None, "b"))
+        a, b, c = (graph.node((None, n)) for n in "abc")
+
+        # Act & Assert
+        assert graph.reduce([c, b, a, c]) == [c, a]
+        assert graph.reduce([a, c], inherited=1 << c) == [a]
+
+
+class TestTransformerStage:
+    def test_hierarchy_section(self):
+        # Arrange
+        template = {
+            "realm": {"realm": "otago"},
+            "envs": {"clients": [{"cid_alias": "ot_cid", "cid": "otago"}]},
+            "hierarchy": {
+                "roles": {"admin": ["$ot_cid/system_admin"]},
+                "client_roles": {"$ot_cid": {"system_admin": []}},
+            },
+        }
+
+        # Act
+        realm = RealmTransformer(template).apply()
+
+        # Assert
+        assert role(realm, "admin")["composites"] == {
+            "client": {"otago": ["system_admin"]}
+        }
+        assert role(realm, "system_admin", "otago")["composite"] is False
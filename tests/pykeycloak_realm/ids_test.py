@@ -0,0 +1,83 @@
+import uuid
+
+import pytest
+import yaml
+
+from pykeycloak_realm.authz_matrix import matrix_id
+from pykeycloak_realm.builder import template_load
+from pykeycloak_realm.ids import stable_id
+
+
+def write_template(tmp_path, text):
+    template_file = tmp_path / "ids.realm.yml"
+    template_file.write_text(text)
+    return template_load("ids", ".realm.yml", str(tmp_path))
+
+
+class TestStableId:
+    def test_is_fixed_across_runs(self):
+        # Act
+        generated = stable_id("client/otago")
+
+        # Assert
+        assert generated == "6e590835-f303-5a6c-9f36-8594a2defa32"
+        assert uuid.UUID(generated).version == 5
+
+    def test_is_memoized(self):
+        # Arrange
+        stable_id.cache_clear()
+
+        # Act
+        first = stable_id("role/otago_admin")
+        second = stable_id("role/otago_admin")
+
+        # Assert
+        assert first is second
+        assert stable_id.cache_info().hits == 1
+
+    def test_parts_do_not_collide_with_joined_keys(self):
+        # Assert
+        assert stable_id("otago", "scope", "view") != stable_id("otago/scope/view")
+        assert stable_id("otago", "scope", "view") != stable_id("5:otago5:scope4:view")
+        assert stable_id("a\0b", "c") != stable_id("a", "b\0c")
+        assert stable_id("ab", "c") != stable_id("a", "bc")
+        assert matrix_id("otago", "scope", "view") == stable_id(
+            "otago", "scope", "view"
+        )
+
+
+class TestUuidTag:
+    def test_tag_loads_as_stable_id(self, tmp_path):
+        # Act
+        template = write_template(
+            tmp_path,
+            "vars:\n"
+            "  - id: &client_id !uuid client/otago\n"
+            "realm:\n"
+            "  clients:\n"
+            "    - id: *client_id\n"
+            "    - id: !uuid client/otago\n"
+            "    - id: !uuid client/other\n",
+        )
+
+        # Assert
+        first, second, other = template["realm"]["clients"]
+        assert first["id"] == second["id"] == stable_id("client/otago")
+        assert other["id"] != first["id"]
+
+    def test_secret_tags_still_load(self, tmp_path):
+        # Act
+        template = write_template(tmp_path, "a: !uuid x\nb: !env OTAGO_SECRET\n")
+
+        # Assert
+        assert template["a"] == stable_id("x")
+        assert template["b"].backend == "env"
+
+    @pytest.mark.parametrize(
+        ("text", "message"),
+        [("a: !uuid [x]\n", "expects a scalar"), ("a: !uuid\n", "natural key")],
+    )
+    def test_invalid_key(self, tmp_path, text, message):
+        # Act & Assert
+        with pytest.raises(yaml.YAMLError, match=message):
+            write_template(tmp_path, text)
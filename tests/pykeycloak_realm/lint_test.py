@@ -0,0 +1,169 @@
+from pathlib import Path
+
+import pytest
+
+from pykeycloak_realm.lint import lint_template
+from pykeycloak_realm.realm import main
+
+TEMPLATES = Path(__file__).parents[2] / "data" / "realms" / "templates"
+
+TEMPLATE = """\
+envs:
+  clients:
+    - clientId: used
+      cid_alias: used_cid
+      cid: used-client
+    - clientId: unused
+      cid_alias: unused_cid
+      cid: unused-client
+    - clientId: as_key
+      cid_alias: key_cid
+vars:
+  names:
+    used: &used_name "used"
+    unused: &unused_name "unused"
+  scopes:
+    view: &scope_view "view"
+    edit: &scope_edit "edit"
+  sets:
+    dead: &dead_set
+      - *scope_edit
+    live: &live_set
+      - *scope_view
+realm:
+  realm: *used_name
+  scopes: *live_set
+  clients:
+    - clientId: $used_cid
+  roles:
+    client:
+      $key_cid: []
+  groups: &groups []
+"""
+
+
+def write(tmp_path, text):
+    path = tmp_path / "x.realm.yml"
+    path.write_text(text)
+    return path
+
+
+class TestLintTemplate:
+    def test_reports_dead_references(self, tmp_path):
+        # Act
+        findings = lint_template(write(tmp_path, TEMPLATE))
+
+        # Assert
+        assert [str(f) for f in findings] == [
+            "7: cid_alias 'unused_cid' is never used",
+            "14: unused anchor &unused_name",
+            "17: anchor &scope_edit is only used by unused anchors",
+            "19: unused anchor &dead_set",
+            "31: unused anchor &groups",
+        ]
+        assert [f.kind for f in findings] == ["cid_alias"] + ["anchor"] * 4
+
+    def test_chain_from_realm_is_live(self, tmp_path):
+        # Arrange
+        text = "vars:\n  a: &a 1\n  b: &b [*a]\n  c: &c {x: *b}\nrealm:\n  y: *c\n"
+
+        # Act & Assert
+        assert lint_template(write(tmp_path, text)) == []
+
+    def test_aliases_in_nested_anchors_are_live(self, tmp_path):
+        # Arrange
+        text = (
+            "vars:\n  x: &x 1\n"
+            "  outer: &outer\n    inner: &inner\n      v: *x\n"
+            "realm:\n  q: *outer\n"
+        )
+
+        # Act & Assert
+        assert lint_template(write(tmp_path, text)) == []
+
+    def test_nested_anchors_of_unused_anchor(self, tmp_path):
+        # Arrange
+        text = "vars:\n  x: &x 1\n  outer: &outer\n    inner: &inner [*x]\n"
+
+        # Act
+        findings = lint_template(write(tmp_path, text))
+
+        # Assert
+        assert [str(f) for f in findings] == [
+            "2: anchor &x is only used by unused anchors",
+            "3: unused anchor &outer",
+            "4: unused anchor &inner",
+        ]
+
+    def test_aliases_in_envs_count(self, tmp_path):
+        # Arrange
+        text = "vars:\n  s: &secret abc\nenvs:\n  clients:\n    - secret: *secret\n"
+
+        # Act & Assert
+        assert lint_template(write(tmp_path, text)) == []
+
+    def test_aliases_in_hierarchy_count(self, tmp_path):
+        # Arrange
+        text = "vars:\n  r: &viewer viewer\nhierarchy:\n  roles:\n    *viewer : []\n"
+
+        # Act & Assert
+        assert lint_template(write(tmp_path, text)) == []
+
+    def test_redefined_anchor(self, tmp_path):
+        # Arrange
+        text = "vars:\n  a: &x 1\n  b: &x 2\nrealm:\n  y: *x\n"
+
+        # Act
+        findings = lint_template(write(tmp_path, text))
+
+        # Assert
+        assert [str(f) for f in findings] == ["2: unused anchor &x"]
+
+    def test_secret_tags_are_not_constructed(self, tmp_path):
+        # Arrange
+        text = "envs:\n  s: !env MISSING_VARIABLE\nvars:\n  t: &t !file nope.txt\n"
+
+        # Act
+        findings = lint_template(write(tmp_path, text))
+
+        # Assert
+        assert [f.name for f in findings] == ["t"]
+
+    def test_example_template(self):
+        # Act
+        findings = lint_template(TEMPLATES / "otago.realm.yml")
+
+        # Assert
+        assert {f.name for f in findings} <= {"v_perm_rsrc", "v_ars_v"}
+        assert all(f.kind == "anchor" for f in findings)
+
+
+class TestLintCommand:
+    def test_findings_exit_with_one(self, tmp_path, capsys):
+        # Arrange
+        path = write(tmp_path, TEMPLATE)
+
+        # Act
+        with pytest.raises(SystemExit) as e:
+            main(["lint", str(path)])
+
+        # Assert
+        assert e.value.code == 1
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0] == f"{path}:7: cid_alias 'unused_cid' is never used"
+        assert len(lines) == 5
+
+    def test_clean_template(self, tmp_path, capsys):
+        # Arrange
+        path = write(tmp_path, "vars:\n  a: &a 1\nrealm:\n  b: *a\n")
+
+        # Act
+        main(["lint", str(path)])
+
+        # Assert
+        assert capsys.readouterr().out == ""
+
+    def test_missing_template(self, tmp_path):
+        # Act & Assert
+        with pytest.raises(SystemExit, match="Template not found"):
+            main(["lint", str(tmp_path / "nope")])
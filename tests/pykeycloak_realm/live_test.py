@@ -0,0 +1,269 @@
+import json
+
+import pytest
+
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.config import KeycloakAdminConfig
+from pykeycloak_realm.live import (
+    LiveCache,
+    cache_path,
+    drift_report,
+    project,
+    pull_realm,
+    pull_snapshot,
+)
+from pykeycloak_realm.realm import main
+from pykeycloak_realm.upload import KeycloakAdmin
+
+USERS = 250
+
+
+def make_realm():
+    return {
+        "realm": "otago",
+        "enabled": True,
+        "clients": [
+            {"clientId": "web", "publicClient": True},
+            {
+                "clientId": "api",
+                "secret": "s3cret",
+                "authorizationServicesEnabled": True,
+                "authorizationSettings": {
+                    "policies": [
+                        {"name": "p"},
+                        {
+                            "name": "read",
+                            "type": "scope",
+                            "resources": ["docs"],
+                            "scopes": ["view"],
+                            "policies": ["p"],
+                        },
+                    ]
+                },
+            },
+        ],
+        "roles": {
+            "realm": [{"name": "admin"}],
+            "client": {"api": [{"name": "reader"}]},
+        },
+        "groups": [{"name": "staff", "path": "/staff"}],
+        "users": [
+            {
+                "username": f"user-{u}",
+                "enabled": True,
+                "credentials": [{"type": "password", "value": "x"}],
+                "realmRoles": ["admin"],
+                "clientRoles": {"api": ["reader"]},
+                "groups": ["/staff"],
+            }
+            for u in range(USERS)
+        ],
+    }
+
+
+@pytest.fixture
+def admin(fake_keycloak):
+    admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+    admin.create_realm(json.dumps(make_realm()).encode())
+    # what a real server keeps: no credentials, builtin clients and roles
+    fake_keycloak.edit("otago", remove_credentials)
+    fake_keycloak.edit("otago", add_builtins)
+    fake_keycloak.calls.clear()
+    return admin
+
+
+def remove_credentials(realm):
+    for user in realm["users"]:
+        del user["credentials"]
+
+
+def add_builtins(realm):
+    realm["clients"].append({"clientId": "account", "enabled": True})
+    realm["roles"]["realm"].append({"name": "default-roles-otago"})
+    realm["roles"]["client"]["account"] = [{"name": "view-profile"}]
+
+
+class TestPullRealm:
+    def test_assembles_an_export(self, admin, fake_keycloak):
+        # Act
+        live, cache, stats = pull_realm(admin, "otago", concurrency=4)
+
+        # Assert
+        assert [c["clientId"] for c in live["clients"]] == ["web", "api", "account"]
+        assert live["clients"][1]["authorizationSettings"]["policies"][1] == {
+            "name": "read",
+            "type": "scope",
+            "config": {
+                "resources": '["docs"]',
+                "scopes": '["view"]',
+                "applyPolicies": '["p"]',
+            },
+        }
+        assert live["roles"]["client"] == {
+            "api": [{"name": "reader"}],
+            "account": [{"name": "view-profile"}],
+        }
+        assert len(live["users"]) == USERS
+        assert live["groups"] == [{"name": "staff", "path": "/staff"}]
+        # realm, clients, roles, 2 counts; 3 user pages, 1 group page,
+        # 3 client roles, 1 authorization settings
+        assert stats.requests == len(cache.entries) == 13
+        assert fake_keycloak.methods() == ["GET"] * 13
+
+    def test_cached_bodies_are_not_changed(self, admin):
+        # Arrange
+        _, cache, _ = pull_realm(admin, "otago")
+
+        # Act
+        _, _, stats = pull_realm(admin, "otago", cache)
+
+        # Assert
+        assert stats.unchanged == stats.requests
+        clients = next(v for k, v in cache.entries.items() if k.endswith("/clients"))
+        assert "authorizationSettings" not in clients[2][1]
+
+
+class TestPullSnapshot:
+    def test_etags_skip_unchanged_responses(self, admin, fake_keycloak, tmp_path):
+        # Arrange
+        fake_keycloak.etags = True
+        snapshot = tmp_path / "otago.live.realm.json"
+        first, _ = pull_snapshot(admin, "otago", snapshot)
+        written = snapshot.stat().st_mtime_ns
+
+        # Act
+        sections, stats = pull_snapshot(admin, "otago", snapshot)
+
+        # Assert
+        assert set(first) == {"realm", "enabled", "clients", "roles", "groups", "users"}
+        assert sections == {}
+        assert stats.not_modified == stats.requests
+        assert snapshot.stat().st_mtime_ns == written
+        assert cache_path(snapshot).is_file()
+
+    def test_changed_sections(self, admin, fake_keycloak, tmp_path):
+        # Arrange
+        snapshot = tmp_path / "otago.live.realm.json"
+        pull_snapshot(admin, "otago", snapshot)
+        fake_keycloak.edit("otago", lambda r: r["users"][-1].update(enabled=False))
+
+        # Act
+        sections, stats = pull_snapshot(admin, "otago", snapshot)
+
+        # Assert
+        assert sections == {"users": "changed"}
+        assert stats.changed == 1
+        live = json.loads(snapshot.read_text())
+        assert live["users"][-1]["enabled"] is False
+
+    def test_stale_cache_is_ignored(self, tmp_path):
+        # Arrange
+        path = tmp_path / "cache.json"
+        path.write_text('{"version": 0, "entries": {"/x": []}}')
+
+        # Act & Assert
+        assert LiveCache.load(path).entries == {}
+        assert LiveCache.load(tmp_path / "missing.json").entries == {}
+
+
+class TestDriftReport:
+    def test_no_drift(self, admin):
+        # Arrange
+        live, _, _ = pull_realm(admin, "otago")
+
+        # Act & Assert
+        assert drift_report(make_realm(), live) == []
+
+    def test_permission_refs_edited_in_the_console(self, admin, fake_keycloak):
+        # Arrange
+        def edit(realm):
+            realm["clients"][1]["authorizationSettings"]["policies"][1]["scopes"] = []
+
+        fake_keycloak.edit("otago", edit)
+        live, _, _ = pull_realm(admin, "otago")
+
+        # Act
+        changes = drift_report(make_realm(), live)
+
+        # Assert
+        assert [(c.path, c.old, c.new) for c in changes] == [
+            (
+                "clients[clientId=api].authorizationSettings.policies[name=read]"
+                ".scopes[0]",
+                "view",
+                None,
+            )
+        ]
+
+    def test_console_edits(self, admin, fake_keycloak):
+        # Arrange
+        def edit(realm):
+            realm["clients"][0]["publicClient"] = False
+            realm["users"].append({"username": "intruder"})
+            realm["roles"]["realm"] = realm["roles"]["realm"][1:]
+
+        fake_keycloak.edit("otago", edit)
+        live, _, _ = pull_realm(admin, "otago")
+
+        # Act
+        changes = drift_report(make_realm(), live)
+
+        # Assert
+        assert [str(c) for c in changes] == [
+            "~ clients[clientId=web].publicClient: true -> false",
+            '- roles.realm[name=admin]: {"name": "admin"}',
+            '+ users[username=intruder]: {"username": "intruder"}',
+        ]
+
+    def test_projection_keeps_declared_keys_and_all_records(self):
+        # Act
+        projected = project(
+            [{"name": "a", "id": "1", "x": 1}, {"name": "b", "id": "2"}],
+            [{"name": "a", "x": 2}],
+        )
+
+        # Assert
+        assert projected == [{"name": "a", "x": 1}, {"name": "b", "id": "2"}]
+
+
+class TestDriftCommand:
+    def test_drift_exits_with_one(self, admin, fake_keycloak, tmp_path, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_EXPORT_PATH", str(tmp_path))
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+        write_to_realm_import_file(make_realm(), tmp_path / "otago.realm.json")
+        main(["drift", "otago"])
+        fake_keycloak.edit(
+            "otago", lambda r: r["clients"][0].update(publicClient=False)
+        )
+
+        # Act & Assert
+        with pytest.raises(SystemExit) as exc:
+            main(["drift", "otago"])
+        assert exc.value.code == 1
+        assert (tmp_path / "otago.live.realm.json").is_file()
+
+    def test_pull_output(self, admin, fake_keycloak, tmp_path, monkeypatch, capsys):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_EXPORT_PATH", str(tmp_path))
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+        main(["pull", "otago"])
+        capsys.readouterr()
+
+        # Act
+        main(["pull", "otago", "--concurrency", "2"])
+
+        # Assert
+        assert capsys.readouterr().out == (
+            "otago: 13 requests (0 not modified, 13 unchanged, 0 changed) -> "
+            f"{tmp_path / 'otago.live.realm.json'}\n"
+        )
+
+    def test_cached_without_snapshot(self, tmp_path, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_EXPORT_PATH", str(tmp_path))
+        write_to_realm_import_file(make_realm(), tmp_path / "otago.realm.json")
+
+        # Act & Assert
+        with pytest.raises(SystemExit, match="No live snapshot of otago"):
+            main(["drift", "otago", "--cached"])
@@ -0,0 +1,162 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from pykeycloak_realm.config import KeycloakAdminConfig
+from pykeycloak_realm.loadtest import (
+    LoadTestError,
+    confidential_clients,
+    percentile,
+    run_load_test,
+    token_url,
+)
+from pykeycloak_realm.realm import main
+from pykeycloak_realm.upload import KeycloakAdmin
+
+REALM = {
+    "realm": "otago",
+    "clients": [
+        {"clientId": "web", "publicClient": True},
+        {"clientId": "api", "secret": "s1", "serviceAccountsEnabled": True},
+        {"clientId": "worker", "secret": "s2", "serviceAccountsEnabled": True},
+        {"clientId": "login", "secret": "s3"},
+    ],
+}
+
+TEMPLATE = """\
+envs:
+  clients:
+    - clientId: api
+      secret: s1
+realm:
+  realm: otago
+  clients:
+    - clientId: api
+      publicClient: false
+      serviceAccountsEnabled: true
+"""
+
+
+@pytest.fixture
+def url(fake_keycloak):
+    admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+    admin.create_realm(json.dumps(REALM).encode())
+    fake_keycloak.connections = 0
+    return token_url(fake_keycloak.url, "otago")
+
+
+class TestConfidentialClients:
+    def test_clients_with_secret_and_service_account(self):
+        # Act & Assert
+        assert confidential_clients(REALM) == [("api", "s1"), ("worker", "s2")]
+
+
+class TestPercentile:
+    @pytest.mark.parametrize(("p", "expected"), [(50, 50), (95, 95), (99, 99)])
+    def test_nearest_rank(self, p, expected):
+        # Act & Assert
+        assert percentile(list(range(1, 101)), p) == expected
+
+    def test_empty(self):
+        # Act & Assert
+        assert percentile([], 99) == 0.0
+
+
+class TestRunLoadTest:
+    def test_reuses_connections(self, url, fake_keycloak):
+        # Act
+        result = run_load_test(url, confidential_clients(REALM), 60, concurrency=4)
+
+        # Assert
+        assert (result.requests, result.failures) == (60, 0)
+        assert result.statuses == {200: 60}
+        assert result.connections == fake_keycloak.connections == 4
+        assert 0 < result.p50 <= result.p95 <= result.p99
+        assert result.throughput > 0
+
+    def test_wrong_secret_fails(self, url):
+        # Act
+        result = run_load_test(url, [("api", "s1"), ("api", "wrong")], 10, 2)
+
+        # Assert
+        assert result.failures == 5
+        assert result.statuses == {200: 5, 401: 5}
+
+    def test_unreachable_endpoint(self):
+        # Arrange
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+
+        # Act
+        result = run_load_test(f"http://127.0.0.1:{port}/token", [("a", "b")], 3, 1)
+
+        # Assert
+        assert result.statuses == {0: 3}
+        assert result.connections == 0
+
+    def test_closed_connections_are_reopened(self):
+        # Arrange: an HTTP/1.0 server closes after every response
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+
+        def serve():
+            for _ in range(3):
+                conn, _ = server.accept()
+                with conn:
+                    conn.recv(4096)
+                    conn.sendall(b"HTTP/1.0 200 OK\r\nContent-Length: 2\r\n\r\n{}")
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.getsockname()[1]}/token"
+
+        # Act
+        result = run_load_test(url, [("a", "b")], 3, 1)
+        thread.join()
+        server.close()
+
+        # Assert
+        assert (result.failures, result.connections) == (0, 3)
+
+    def test_no_clients(self, url):
+        # Act & Assert
+        with pytest.raises(LoadTestError, match="No confidential clients"):
+            run_load_test(url, [])
+
+
+class TestLoadtestCommand:
+    def test_reports_latency(self, tmp_path, url, fake_keycloak, monkeypatch, capsys):
+        # Arrange
+        (tmp_path / "otago.realm.yml").write_text(TEMPLATE)
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TEMPLATES_PATH", str(tmp_path))
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+
+        # Act
+        main(["loadtest", "otago", "--requests", "20", "--concurrency", "2"])
+
+        # Assert
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].startswith("otago: 20 requests from 1 clients in ")
+        assert lines[0].endswith("over 2 connections, 0 failed")
+        assert lines[1].startswith("  latency p50 ")
+
+    def test_failures_exit_with_one(self, tmp_path, url, fake_keycloak, monkeypatch):
+        # Arrange
+        (tmp_path / "otago.realm.yml").write_text(TEMPLATE.replace("s1", "s9"))
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TEMPLATES_PATH", str(tmp_path))
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+
+        # Act & Assert
+        with pytest.raises(SystemExit) as exc:
+            main(["loadtest", "otago", "--requests", "4"])
+        assert exc.value.code == 1
+
+    @pytest.mark.parametrize("option", ["--requests", "--concurrency"])
+    def test_invalid_requests_or_concurrency_exit(self, option):
+        # Act & Assert
+        with pytest.raises(SystemExit, match="must be at least 1"):
+            main(["loadtest", "otago", option, "0"])
@@ -0,0 +1,264 @@
+import copy
+import json
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer, export
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.metrics import (
+    RealmMetrics,
+    count_entities,
+    metrics_document,
+    prometheus_text,
+    write_metrics,
+)
+from pykeycloak_realm.realm import main
+
+TEMPLATE = {
+    "envs": {
+        "clients": [
+            {"clientId": "api", "secret": "s1", "cid_alias": "api", "cid": "id-1"}
+        ]
+    },
+    "realm": {
+        "realm": "otago",
+        "roles": {"realm": [{"name": "admin"}], "client": {"$api": [{"name": "r"}]}},
+        "clients": [
+            {
+                "clientId": "api",
+                "authorizationSettings": {
+                    "policies": [
+                        {
+                            "name": "policy_role__a",
+                            "type": "role",
+                            "config": {"roles": ["r"]},
+                        },
+                        {
+                            "name": "policy_role__b",
+                            "type": "role",
+                            "config": {"roles": ["r"]},
+                        },
+                        {"name": "other", "type": "js", "config": {}},
+                    ]
+                },
+            },
+            {"clientId": "web", "defaultRoles": ["$api"]},
+        ],
+        "users": [
+            {"username": "alice", "clientRoles": {"$api": ["r"]}},
+            {"username": "bob"},
+        ],
+    },
+}
+
+YAML_TEMPLATE = """\
+realm:
+  realm: otago
+  clients:
+    - clientId: api
+  users:
+    - username: alice
+"""
+
+
+def transform(**kwargs):
+    transformer = RealmTransformer(copy.deepcopy(TEMPLATE), **kwargs)
+    transformer.apply()
+    return transformer.metrics
+
+
+class TestRealmMetrics:
+    def test_stages_add_up(self):
+        # Arrange
+        metrics = RealmMetrics()
+
+        # Act
+        with metrics.stage("load"):
+            pass
+        with metrics.stage("write"):
+            pass
+        with metrics.stage("load"):
+            pass
+
+        # Assert
+        assert list(metrics.stages) == ["load", "write"]
+        assert metrics.seconds == sum(metrics.stages.values()) > 0
+
+    def test_count_entities(self):
+        # Act & Assert
+        assert count_entities(TEMPLATE["realm"]) == {
+            "clients": 2,
+            "roles": 2,
+            "policies": 3,
+            "users": 2,
+        }
+        assert count_entities({}) == {
+            "clients": 0,
+            "roles": 0,
+            "policies": 0,
+            "users": 0,
+        }
+
+
+class TestTransformerMetrics:
+    def test_serial(self):
+        # Act
+        metrics = transform()
+
+        # Assert
+        assert list(metrics.stages) == [
+            "realm_refs",
+            "secrets",
+            "hierarchy",
+            "authz_matrix",
+            "client_secrets",
+            "policy_encoding",
+            "aliases",
+        ]
+        assert metrics.entities["policies"] == 3
+        # the client role key, a default role and a user's client role key
+        assert metrics.aliases_replaced == 3
+        assert (metrics.cache_hits, metrics.cache_misses) == (1, 1)
+
+    def test_chunked_counts_match_serial(self):
+        # Act
+        metrics = transform(transform_workers=2, transform_chunk_size=1)
+
+        # Assert
+        assert "chunked_transform" in metrics.stages
+        assert metrics.aliases_replaced == 3
+        assert (metrics.cache_hits, metrics.cache_misses) == (1, 1)
+
+    def test_compact_and_schema_stages(self):
+        # Act
+        metrics = transform(compact_model=True, validate_schema=True)
+
+        # Assert
+        assert {"compact", "schema"} <= set(metrics.stages)
+        assert metrics.entities["users"] == 2
+
+
+class TestExportMetrics:
+    def test_export_records_load_write_and_size(self, tmp_path):
+        # Arrange
+        (tmp_path / "otago.realm.yml").write_text(YAML_TEMPLATE)
+        config = RealmBuilderConfig(
+            _template_dir_path=str(tmp_path), _template_export_dir_path=str(tmp_path)
+        )
+        metrics = RealmMetrics()
+
+        # Act
+        export("otago", "otago", config, metrics=metrics)
+
+        # Assert
+        stages = list(metrics.stages)
+        assert (stages[0], stages[-1]) == ("load", "write")
+        assert metrics.output_bytes == (tmp_path / "otago.realm.json").stat().st_size
+        assert metrics.peak_memory_bytes > 0
+        assert metrics.built_at > 0
+        assert metrics.entities == {
+            "clients": 1,
+            "roles": 0,
+            "policies": 0,
+            "users": 1,
+        }
+
+
+class TestFormats:
+    @pytest.fixture
+    def metrics(self):
+        return {
+            'a"b': RealmMetrics(
+                built_at=1700000000.0,
+                stages={"load": 0.5, "write": 0.25},
+                peak_memory_bytes=1024,
+                output_bytes=2048,
+                entities={"clients": 3},
+                aliases_replaced=4,
+                cache_hits=5,
+                cache_misses=6,
+            )
+        }
+
+    def test_prometheus(self, metrics):
+        # Act
+        lines = prometheus_text(metrics).splitlines()
+
+        # Assert
+        assert lines[:4] == [
+            "# HELP keycloak_realm_build_stage_seconds "
+            "Seconds spent in each build stage.",
+            "# TYPE keycloak_realm_build_stage_seconds gauge",
+            'keycloak_realm_build_stage_seconds{realm="a\\"b",stage="load"} 0.5',
+            'keycloak_realm_build_stage_seconds{realm="a\\"b",stage="write"} 0.25',
+        ]
+        assert 'keycloak_realm_build_seconds{realm="a\\"b"} 0.75' in lines
+        assert 'keycloak_realm_build_entities{realm="a\\"b",kind="clients"} 3' in lines
+        assert 'keycloak_realm_build_cache_misses{realm="a\\"b"} 6' in lines
+        assert lines[-1] == "# EOF"
+
+    def test_json(self, metrics):
+        # Act
+        document = metrics_document(metrics)
+
+        # Assert
+        assert document["version"] == 1
+        assert document["realms"]['a"b']["seconds"] == 0.75
+        assert document["realms"]['a"b']["stages"] == {"load": 0.5, "write": 0.25}
+
+    def test_write_metrics(self, metrics, tmp_path):
+        # Act
+        paths = write_metrics(tmp_path / "ci" / "build", metrics)
+
+        # Assert
+        assert [path.name for path in paths] == ["build.json", "build.prom"]
+        assert json.loads(paths[0].read_text()) == metrics_document(metrics)
+        assert paths[1].read_text() == prometheus_text(metrics)
+        assert sorted(p.name for p in paths[0].parent.iterdir()) == [
+            "build.json",
+            "build.prom",
+        ]
+
+
+class TestMetricsOption:
+    @pytest.fixture
+    def env(self, tmp_path, monkeypatch):
+        (tmp_path / "otago.realm.yml").write_text(YAML_TEMPLATE)
+        (tmp_path / "app.realm.yml").write_text(YAML_TEMPLATE.replace("otago", "app"))
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TEMPLATES_PATH", str(tmp_path))
+        monkeypatch.setenv("KEYCLOAK_BUILDER_EXPORT_PATH", str(tmp_path))
+        monkeypatch.delenv("KEYCLOAK_BUILDER_METRICS_PATH", raising=False)
+        return tmp_path
+
+    def test_export(self, env):
+        # Act
+        main(["export", "--from-realm", "otago", "--to-realm", "otago"])
+        main(
+            ["--from-realm", "otago", "--to-realm", "otago"]
+            + ["--metrics", str(env / "m")]
+        )
+
+        # Assert
+        document = json.loads((env / "m.json").read_text())
+        assert list(document["realms"]) == ["otago"]
+        assert (env / "m.prom").read_text().endswith("# EOF\n")
+
+    def test_not_written_by_default(self, env):
+        # Act
+        main(["export", "--from-realm", "otago", "--to-realm", "otago"])
+
+        # Assert
+        assert not list(env.glob("*.prom"))
+
+    def test_build_from_environment(self, env, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_METRICS_PATH", str(env / "m"))
+        main(["build", "--jobs", "1", "otago"])
+
+        # Act
+        main(["build", "--jobs", "1"])
+
+        # Assert: otago was not built again
+        document = json.loads((env / "m.json").read_text())
+        assert list(document["realms"]) == ["app"]
+        assert list(document["realms"]["app"]["stages"])[0] == "load"
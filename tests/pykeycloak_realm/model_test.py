@@ -0,0 +1,191 @@
+import copy
+import json
+from collections.abc import MutableMapping
+
+import pytest
+
+from pykeycloak_realm.builder import (
+    RealmTransformer,
+    deep_replace,
+    write_to_realm_import_file,
+)
+from pykeycloak_realm.model import Credential, Policy, User, compact_realm, to_json
+from pykeycloak_realm.secret_refs import SecretRef, clear_caches, resolve_secrets
+
+USER = {
+    "username": "admin",
+    "x-custom": {"a": 1},
+    "enabled": True,
+    "email": None,
+    "credentials": [{"type": "password", "value": "secret", "temporary": False}],
+    "realmRoles": ["otago_admin"],
+    "clientRoles": {"otago": ["system_role__otago_admin"]},
+}
+
+
+def make_template():
+    return {
+        "realm": {
+            "realm": "otago",
+            "clients": [
+                {
+                    "clientId": "otago",
+                    "authorizationSettings": {
+                        "policies": [
+                            {
+                                "name": "policy_role__admin",
+                                "type": "role",
+                                "config": {"roles": [{"id": "admin"}]},
+                            },
+                            {"name": "regular_policy", "config": {"x": "y"}},
+                        ]
+                    },
+                }
+            ],
+            "users": [
+                copy.deepcopy(USER),
+                {"username": "guest", "realmRoles": ["$otago_cid"]},
+            ],
+        },
+        "envs": {
+            "clients": [
+                {"clientId": "otago", "cid_alias": "otago_cid", "cid": "otago-id"}
+            ]
+        },
+    }
+
+
+class TestSlotModel:
+    def test_roundtrip_is_lossless(self):
+        # Act
+        user = User.from_dict(USER)
+
+        # Assert
+        assert user.to_dict() == USER
+        assert list(user.to_dict()) == list(USER)
+        assert isinstance(user["credentials"][0], Credential)
+        assert isinstance(user, MutableMapping)
+
+    def test_missing_field_is_not_none(self):
+        # Arrange
+        user = User.from_dict(USER)
+
+        # Act & Assert
+        assert user["email"] is None
+        assert "firstName" not in user
+        assert user.get("firstName", "-") == "-"
+        with pytest.raises(KeyError):
+            user["firstName"]
+
+    def test_set_and_delete_keep_key_order(self):
+        # Arrange
+        user = User.from_dict(USER)
+
+        # Act
+        user["firstName"] = "Ada"
+        user["x-other"] = 2
+        del user["x-custom"]
+        del user["email"]
+
+        # Assert
+        assert list(user) == [
+            "username",
+            "enabled",
+            "credentials",
+            "realmRoles",
+            "clientRoles",
+            "firstName",
+            "x-other",
+        ]
+        assert user["firstName"] == "Ada"
+        assert len(user) == 7
+
+    def test_equal_shapes_are_shared(self):
+        # Act
+        first = User.from_dict({"username": "a", "enabled": True})
+        second = User.from_dict({"username": "b", "enabled": False})
+
+        # Assert
+        assert first.keys() is second.keys()
+        assert first != second
+        assert first == {"username": "a", "enabled": True}
+
+    def test_json_output_matches_dict(self):
+        # Arrange
+        policy = {"name": "p", "extra": [1, 2], "config": {"roles": "[]"}}
+
+        # Act
+        dumped = json.dumps([Policy.from_dict(policy)], indent=2, default=to_json)
+
+        # Assert
+        assert dumped == json.dumps([policy], indent=2)
+
+    def test_unknown_object_is_not_serializable(self):
+        # Act & Assert
+        with pytest.raises(TypeError, match="not JSON serializable"):
+            json.dumps(object(), default=to_json)
+
+
+class TestCompactRealm:
+    def test_hot_entities_become_models(self):
+        # Arrange
+        realm = make_template()["realm"]
+
+        # Act
+        compact_realm(realm)
+
+        # Assert
+        assert all(isinstance(u, User) for u in realm["users"])
+        policies = realm["clients"][0]["authorizationSettings"]["policies"]
+        assert all(isinstance(p, Policy) for p in policies)
+
+    def test_transformer_output_is_unchanged(self):
+        # Act
+        plain = RealmTransformer(make_template()).apply()
+        compact = RealmTransformer(make_template(), compact_model=True).apply()
+
+        # Assert
+        assert compact == plain
+        assert compact["users"][1]["realmRoles"] == ["otago-id"]
+        policy = compact["clients"][0]["authorizationSettings"]["policies"][0]
+        assert isinstance(policy, Policy)
+        assert policy["config"]["roles"] == '[{"id": "admin"}]'
+
+    def test_deep_replace_keeps_model_type(self):
+        # Arrange
+        user = User.from_dict({"username": "$a", "$a": "$a"})
+
+        # Act
+        replaced = deep_replace(user, {"$a": "b"})
+
+        # Assert
+        assert isinstance(replaced, User)
+        assert replaced.to_dict() == {"username": "b", "b": "b"}
+
+    def test_secrets_resolve_inside_models(self, monkeypatch):
+        # Arrange
+        clear_caches()
+        monkeypatch.setenv("OTAGO_PASSWORD", "s3cret")
+        user = User.from_dict(
+            {"credentials": [{"value": SecretRef("env", "OTAGO_PASSWORD")}]}
+        )
+
+        # Act
+        count = resolve_secrets([user])
+
+        # Assert
+        assert count == 1
+        assert user["credentials"][0]["value"] == "s3cret"
+        clear_caches()
+
+    def test_written_export_is_byte_identical(self, tmp_path):
+        # Arrange
+        plain = RealmTransformer(make_template()).apply()
+        compact = RealmTransformer(make_template(), compact_model=True).apply()
+
+        # Act
+        first = write_to_realm_import_file(plain, tmp_path / "a.realm.json")
+        second = write_to_realm_import_file(compact, tmp_path / "b.realm.json")
+
+        # Assert
+        assert first.read_bytes() == second.read_bytes()
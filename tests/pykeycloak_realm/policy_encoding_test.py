@@ -0,0 +1,221 @@
+import copy
+import json
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer
+from pykeycloak_realm.policy_encoding import PolicyEncoder
+
+
+def make_realm(policies_per_client=3, clients=2):
+    return {
+        "clients": [
+            {
+                "clientId": f"client-{c}",
+                "authorizationSettings": {
+                    "policies": [
+                        {
+                            "name": f"policy_role__{c}_{p}",
+                            "config": {"roles": [{"id": f"role-{p % 2}"}]},
+                        }
+                        for p in range(policies_per_client)
+                    ]
+                    + [{"name": "regular_policy", "config": {"roles": ["x"]}}]
+                },
+            }
+            for c in range(clients)
+        ]
+        + [{"clientId": "no-authz"}]
+    }
+
+
+class TestPolicyEncoder:
+    def test_collects_matching_policies_across_clients(self):
+        # Arrange
+        realm = make_realm(policies_per_client=3, clients=4)
+
+        # Act
+        matches = PolicyEncoder().collect(realm["clients"])
+
+        # Assert
+        assert len(matches) == 12
+        assert all(fields == ("roles",) for _, fields in matches)
+
+    def test_apply_matches_per_policy_path(self):
+        # Arrange
+        realm = make_realm()
+        expected = copy.deepcopy(realm)
+        for client in expected["clients"][:-1]:
+            for policy in client["authorizationSettings"]["policies"][:-1]:
+                policy["config"]["roles"] = json.dumps(policy["config"]["roles"])
+
+        # Act
+        count = PolicyEncoder().apply(realm["clients"])
+
+        # Assert
+        assert count == 6
+        assert realm == expected
+
+    def test_repeated_values_are_encoded_once(self):
+        # Arrange
+        realm = make_realm(policies_per_client=10, clients=10)
+        encoder = PolicyEncoder()
+
+        # Act
+        encoder.apply(realm["clients"])
+
+        # Assert
+        assert encoder.misses == 2
+        assert encoder.hits == 98
+
+    def test_shared_config_is_not_encoded_twice(self):
+        # Arrange
+        shared = {"roles": ["admin"]}
+        clients = [
+            {
+                "authorizationSettings": {
+                    "policies": [
+                        {"name": "policy_role__a", "config": shared},
+                        {"name": "policy_role__b", "config": shared},
+                    ]
+                }
+            }
+        ]
+
+        encoder = PolicyEncoder()
+
+        # Act
+        encoder.apply(clients)
+
+        # Assert
+        policies = clients[0]["authorizationSettings"]["policies"]
+        assert [p["config"] for p in policies] == [{"roles": '["admin"]'}] * 2
+        assert (encoder.hits, encoder.misses) == (1, 1)
+
+    def test_config_shared_with_other_policies_is_not_changed(self):
+        # Arrange
+        shared = {"roles": ["admin"]}
+        clients = [
+            {
+                "authorizationSettings": {
+                    "policies": [
+                        {"name": "policy_role__a", "config": shared},
+                        {"name": "regular_policy", "config": shared},
+                    ]
+                }
+            }
+        ]
+
+        # Act
+        PolicyEncoder().apply(clients)
+
+        # Assert
+        policies = clients[0]["authorizationSettings"]["policies"]
+        assert policies[0]["config"] == {"roles": '["admin"]'}
+        assert policies[1]["config"] == shared == {"roles": ["admin"]}
+
+    def test_configurable_prefixes_and_fields(self):
+        # Arrange
+        clients = [
+            {
+                "authorizationSettings": {
+                    "policies": [
+                        {"name": "policy_client__a", "config": {"clients": ["c1"]}},
+                        {
+                            "name": "policy_group__a",
+                            "config": {"groups": [{"path": "/g"}], "roles": ["r"]},
+                        },
+                        {"name": "policy_role__a", "config": {"roles": ["r"]}},
+                    ]
+                }
+            }
+        ]
+        encoder = PolicyEncoder(
+            {"policy_client__": ["clients"], "policy_group__": ["groups", "roles"]}
+        )
+
+        # Act
+        encoder.apply(clients)
+
+        # Assert
+        policies = clients[0]["authorizationSettings"]["policies"]
+        assert policies[0]["config"] == {"clients": '["c1"]'}
+        assert policies[1]["config"] == {"groups": '[{"path": "/g"}]', "roles": '["r"]'}
+        assert policies[2]["config"] == {"roles": ["r"]}
+
+    def test_missing_field_encodes_empty_list(self):
+        # Arrange
+        clients = [
+            {
+                "authorizationSettings": {
+                    "policies": [{"name": "policy_role__a", "config": {"x": 1}}]
+                }
+            }
+        ]
+
+        # Act
+        PolicyEncoder().apply(clients)
+
+        # Assert
+        assert (
+            clients[0]["authorizationSettings"]["policies"][0]["config"]["roles"]
+            == "[]"
+        )
+
+    @pytest.mark.parametrize("first,second", [(True, 1), (1, 1.0)])
+    def test_equal_but_differently_encoded_values(self, first, second):
+        # Arrange
+        clients = [
+            {
+                "authorizationSettings": {
+                    "policies": [
+                        {
+                            "name": "policy_role__a",
+                            "config": {"roles": [{"required": first}]},
+                        },
+                        {
+                            "name": "policy_role__b",
+                            "config": {"roles": [{"required": second}]},
+                        },
+                    ]
+                }
+            }
+        ]
+
+        # Act
+        PolicyEncoder().apply(clients)
+
+        # Assert
+        a, b = clients[0]["authorizationSettings"]["policies"]
+        assert a["config"]["roles"] != b["config"]["roles"]
+
+
+class TestTransformerPolicyEncoding:
+    def test_apply_uses_configured_rules(self):
+        # Arrange
+        template = {
+            "realm": {
+                "clients": [
+                    {
+                        "clientId": "c",
+                        "authorizationSettings": {
+                            "policies": [
+                                {
+                                    "name": "policy_group__g",
+                                    "config": {"groups": ["/g"]},
+                                }
+                            ]
+                        },
+                    }
+                ]
+            }
+        }
+
+        # Act
+        result = RealmTransformer(
+            template, policy_encoding={"policy_group__": ("groups",)}
+        ).apply()
+
+        # Assert
+        policy = result["clients"][0]["authorizationSettings"]["policies"][0]
+        assert policy["config"]["groups"] == '["/g"]'
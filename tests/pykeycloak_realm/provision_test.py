@@ -0,0 +1,158 @@
+import json
+
+import pytest
+
+from pykeycloak_realm.builder import write_to_realm_import_file
+from pykeycloak_realm.config import KeycloakAdminConfig
+from pykeycloak_realm.provision import (
+    checkpoint_path,
+    iter_batches,
+    iter_users,
+    provision_users,
+)
+from pykeycloak_realm.realm import main
+from pykeycloak_realm.upload import KeycloakAdmin
+
+USERS = 23
+
+
+def make_users(count=USERS):
+    return [{"username": f"user-{u}", "enabled": True} for u in range(count)]
+
+
+@pytest.fixture
+def admin(fake_keycloak):
+    admin = KeycloakAdmin(KeycloakAdminConfig(url=fake_keycloak.url))
+    admin.create_realm(b'{"realm": "otago"}')
+    return admin
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "otago.realm.json"
+    realm = {"realm": "otago", "enabled": True, "users": make_users()}
+    write_to_realm_import_file(realm, path, overwrite=True)
+    return path
+
+
+class TestSources:
+    def test_export_and_jsonl_shard(self, tmp_path, export):
+        # Arrange
+        shard = tmp_path / "users.jsonl"
+        shard.write_text("\n".join(json.dumps(u) for u in make_users()) + "\n\n")
+
+        # Act & Assert
+        assert list(iter_users(export)) == make_users()
+        assert list(iter_users(shard)) == make_users()
+
+    def test_batches(self):
+        # Act
+        batches = list(iter_batches(make_users(), 10))
+
+        # Assert
+        assert [len(b) for b in batches] == [10, 10, 3]
+
+
+class TestProvisionUsers:
+    def test_imports_every_user_in_batches(self, admin, export, fake_keycloak):
+        # Act
+        result = provision_users(admin, "otago", export, batch_size=5, concurrency=3)
+
+        # Assert
+        assert (result.batches, result.imported, result.added) == (5, 5, USERS)
+        assert result.error is None
+        assert set(fake_keycloak.users["otago"]) == {
+            u["username"] for u in make_users()
+        }
+        assert fake_keycloak.methods().count("POST") == 1 + 1 + 5
+
+    def test_interrupted_run_resumes(self, admin, export, fake_keycloak):
+        # Arrange
+        fake_keycloak.import_limit = 2
+
+        # Act
+        failed = provision_users(admin, "otago", export, batch_size=5, concurrency=1)
+        fake_keycloak.import_limit = None
+        resumed = provision_users(admin, "otago", export, batch_size=5, concurrency=1)
+
+        # Assert
+        assert (failed.imported, failed.failed_batch) == (2, 2)
+        assert "HTTP 500" in failed.error
+        assert (resumed.resumed, resumed.imported, resumed.error) == (2, 3, None)
+        assert resumed.added == USERS
+        assert len(fake_keycloak.users["otago"]) == USERS
+
+    def test_finished_run_sends_nothing(self, admin, export, fake_keycloak):
+        # Arrange
+        provision_users(admin, "otago", export, batch_size=5)
+        fake_keycloak.calls.clear()
+
+        # Act
+        result = provision_users(admin, "otago", export, batch_size=5)
+
+        # Assert
+        assert (result.resumed, result.imported) == (5, 0)
+        assert fake_keycloak.calls == []
+
+    def test_checkpoint_of_other_batch_size_is_ignored(self, admin, export):
+        # Arrange
+        provision_users(admin, "otago", export, batch_size=5)
+
+        # Act
+        result = provision_users(
+            admin, "otago", export, batch_size=10, if_exists="SKIP"
+        )
+
+        # Assert
+        assert (result.resumed, result.imported) == (0, 3)
+        assert (result.added, result.skipped) == (0, USERS)
+        assert json.loads(checkpoint_path(export).read_text())["done"] == [0, 1, 2]
+
+    def test_restart(self, admin, export):
+        # Arrange
+        provision_users(admin, "otago", export, batch_size=5)
+
+        # Act
+        result = provision_users(admin, "otago", export, batch_size=5, restart=True)
+
+        # Assert
+        assert (result.resumed, result.imported, result.overwritten) == (0, 5, USERS)
+
+    def test_missing_realm(self, admin, export):
+        # Act
+        result = provision_users(admin, "nope", export, concurrency=1)
+
+        # Assert
+        assert (result.imported, result.failed_batch) == (0, 0)
+        assert result.error == "Realm not found: nope"
+
+    def test_invalid_policy(self, admin, export):
+        # Act & Assert
+        with pytest.raises(ValueError, match="Invalid ifResourceExists"):
+            provision_users(admin, "otago", export, if_exists="MERGE")
+
+
+class TestProvisionCommand:
+    def test_provisions_the_export_realm(
+        self, admin, export, fake_keycloak, monkeypatch, capsys
+    ):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+
+        # Act
+        main(["provision", str(export), "--batch-size", "10"])
+
+        # Assert
+        out = capsys.readouterr().out
+        assert out.startswith("otago: 3 batches imported, 0 resumed, of 3 in ")
+        assert f"({USERS} users added, 0 overwritten, 0 skipped)" in out
+
+    def test_failure_exits_with_one(self, admin, export, fake_keycloak, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+        fake_keycloak.import_limit = 0
+
+        # Act & Assert
+        with pytest.raises(SystemExit) as exc:
+            main(["provision", str(export)])
+        assert exc.value.code == 1
@@ -0,0 +1,163 @@
+import pytest
+import yaml
+
+from pykeycloak_realm.builder import (
+    RealmTransformer,
+    create_realm_config_file,
+    template_load,
+    write_to_realm_import_file,
+)
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.model import compact_realm
+from pykeycloak_realm.realm_refs import (
+    ExportValues,
+    RealmRef,
+    RealmRefError,
+    dependencies,
+    lookup,
+    parse_ref,
+)
+
+PARTNER = {
+    "realm": "partner",
+    "attributes": {"frontendUrl": "https://partner.example.org"},
+    "clients": [
+        {"clientId": "broker", "secret": "s3cret"},
+        {"clientId": "web", "redirectUris": ["/a", "/b"]},
+    ],
+    "users": [{"username": "alice", "email": "alice@example.org"}],
+}
+
+
+class TestParseRef:
+    def test_realm_and_path(self):
+        # Act & Assert
+        assert parse_ref("partner/clients/broker/secret") == RealmRef(
+            "partner", ("clients", "broker", "secret")
+        )
+        assert str(parse_ref("partner/realm")) == "!ref partner/realm"
+
+    @pytest.mark.parametrize("text", ["partner", "partner/", "/", "a//b"])
+    def test_invalid(self, text):
+        # Act & Assert
+        with pytest.raises(ValueError, match="expected <realm>/<path>"):
+            parse_ref(text)
+
+
+class TestRefTag:
+    def test_loads_references(self, tmp_path):
+        # Arrange
+        (tmp_path / "otago.realm.yml").write_text(
+            "realm:\n"
+            "  identityProviders:\n"
+            "    - alias: partner\n"
+            "      config:\n"
+            "        clientSecret: !ref partner/clients/broker/secret\n"
+            "        issuer: !ref partner/attributes/frontendUrl\n"
+        )
+
+        # Act
+        template = template_load("otago", ".realm.yml", str(tmp_path))
+
+        # Assert
+        config = template["realm"]["identityProviders"][0]["config"]
+        assert config["clientSecret"] == RealmRef(
+            "partner", ("clients", "broker", "secret")
+        )
+        assert dependencies(template) == {"partner"}
+
+    def test_rejects_invalid_reference(self, tmp_path):
+        # Arrange
+        (tmp_path / "otago.realm.yml").write_text("realm:\n  x: !ref partner\n")
+
+        # Act & Assert
+        with pytest.raises(yaml.constructor.ConstructorError, match="<realm>/<path>"):
+            template_load("otago", ".realm.yml", str(tmp_path))
+
+
+class TestLookup:
+    @pytest.mark.parametrize(
+        ("path", "expected"),
+        [
+            ("partner/clients/broker/secret", "s3cret"),
+            ("partner/clients/web/redirectUris/1", "/b"),
+            ("partner/users/alice/email", "alice@example.org"),
+            ("partner/attributes", {"frontendUrl": "https://partner.example.org"}),
+        ],
+    )
+    def test_paths(self, path, expected):
+        # Act & Assert
+        assert lookup(PARTNER, parse_ref(path)) == expected
+
+    def test_slotted_models_come_back_as_dicts(self):
+        # Arrange
+        realm = compact_realm({"users": [{"username": "alice", "enabled": True}]})
+
+        # Act
+        user = lookup(realm, parse_ref("partner/users/alice"))
+
+        # Assert
+        assert type(user) is dict
+        assert user == {"username": "alice", "enabled": True}
+
+    def test_missing(self):
+        # Act & Assert
+        with pytest.raises(
+            RealmRefError, match="no 'api' in partner/clients"
+        ) as exc_info:
+            lookup(PARTNER, parse_ref("partner/clients/api/secret"))
+        assert str(exc_info.value).startswith("!ref partner/clients/api/secret: ")
+
+
+class TestResolveFromExports:
+    def test_built_realm_is_read(self, tmp_path):
+        # Arrange
+        write_to_realm_import_file(PARTNER, tmp_path / "partner.realm.json")
+        template = {
+            "realm": {
+                "realm": "otago",
+                "smtpServer": {"from": parse_ref("partner/users/alice/email")},
+            }
+        }
+
+        # Act
+        realm = RealmTransformer(
+            template, realm_refs=ExportValues(tmp_path, ".realm.json")
+        ).apply()
+
+        # Assert
+        assert realm["smtpServer"] == {"from": "alice@example.org"}
+
+    def test_unbuilt_realm(self, tmp_path):
+        # Arrange
+        template = {"realm": {"x": parse_ref("partner/realm")}}
+        resolver = ExportValues(tmp_path, ".realm.json")
+
+        # Act & Assert
+        with pytest.raises(RealmRefError, match="partner is not built"):
+            RealmTransformer(template, realm_refs=resolver).apply()
+
+    def test_without_resolver(self):
+        # Act & Assert
+        with pytest.raises(RealmRefError, match="Unresolved reference !ref partner"):
+            RealmTransformer({"realm": {"x": parse_ref("partner/realm")}}).apply()
+
+    def test_single_export_reads_the_export_directory(self, tmp_path):
+        # Arrange
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        (templates / "otago.realm.yml").write_text(
+            "realm:\n  realm: otago\n  displayName: !ref partner/realm\n"
+        )
+        export = tmp_path / "export"
+        export.mkdir()
+        write_to_realm_import_file(PARTNER, export / "partner.realm.json")
+        config = RealmBuilderConfig(
+            _template_dir_path=str(templates), _template_export_dir_path=str(export)
+        )
+
+        # Act
+        realm = create_realm_config_file("otago", config)
+
+        # Assert
+        assert realm["displayName"] == "partner"
@@ -1,9 +1,9 @@
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 
 import pytest
 
 from pykeycloak_realm.config import RealmBuilderConfig
-from pykeycloak_realm.realm import main
+from pykeycloak_realm.realm import export, main
 
 
 class TestRealmMain:
@@ -49,3 +49,24 @@ class TestRealmMain:
         """Test without --from-realm"""
         with pytest.raises(SystemExit):
             main()
+
+    @patch("pykeycloak_realm.realm.export")
+    def test_main_export_subcommand(self, mock_export):
+        main(["export", "--from-realm", "sub-template", "--to-realm", "sub-output"])
+        mock_export.assert_called_once()
+        _, args = mock_export.call_args
+        assert args["from_template"] == "sub-template"
+        assert args["to_file"] == "sub-output"
+
+    def test_main_help_lists_commands(self, capsys):
+        with pytest.raises(SystemExit):
+            main(["--help"])
+        assert "export" in capsys.readouterr().out
+
+    @patch("pykeycloak_realm.builder.export")
+    def test_export_delegates_to_builder(self, mock_build_export):
+        config = RealmBuilderConfig()
+        export("from-template", "to-file", config)
+        mock_build_export.assert_called_once_with(
+            from_template="from-template", to_file="to-file", config=config, metrics=ANY
+        )
@@ -0,0 +1,166 @@
+from pathlib import Path
+
+import pytest
+
+from pykeycloak_realm.builder import RealmTransformer, template_load
+from pykeycloak_realm.schema import (
+    SchemaValidationError,
+    compile_schema,
+    realm_validator,
+    validate_realm,
+)
+
+TEMPLATES = Path(__file__).parents[2] / "data" / "realms" / "templates"
+
+
+def make_realm():
+    return {
+        "realm": "otago",
+        "enabled": True,
+        "clients": [
+            {
+                "clientId": "otago",
+                "enabled": True,
+                "attributes": {"pkce.code.challenge.method": "S256", "x": 1},
+                "authorizationSettings": {
+                    "policyEnforcementMode": "ENFORCING",
+                    "policies": [
+                        {
+                            "name": "policy_role__admin",
+                            "type": "role",
+                            "logic": "POSITIVE",
+                            "config": {"roles": [{"id": "admin"}]},
+                        }
+                    ],
+                },
+            }
+        ],
+        "roles": {"client": {"otago": [{"name": "admin", "composite": False}]}},
+        "users": [{"username": "admin", "email": None, "realmRoles": ["admin"]}],
+    }
+
+
+class TestValidateRealm:
+    def test_valid_realm(self):
+        # Act
+        errors = validate_realm(RealmTransformer({"realm": make_realm()}).apply())
+
+        # Assert
+        assert errors == []
+
+    def test_example_template_is_valid(self):
+        # Arrange
+        template = template_load("otago", ".realm.yml", str(TEMPLATES))
+
+        # Act
+        realm = RealmTransformer(template, validate_schema=True).apply()
+
+        # Assert
+        assert realm["realm"] == "otago"
+
+    def test_every_error_is_reported_with_its_path(self):
+        # Arrange
+        realm = make_realm()
+        realm["enabeld"] = True
+        realm["clients"][0]["enabled"] = "yes"
+        realm["clients"][0]["authorizationSettings"]["policies"][0]["logic"] = "MAYBE"
+        realm["roles"]["client"]["otago"].append({"description": "no name"})
+        realm["users"][0]["realmRoles"] = ["admin", 7]
+
+        # Act
+        errors = validate_realm(realm)
+
+        # Assert
+        assert errors == [
+            "clients[0].enabled: expected boolean, got string",
+            "clients[0].authorizationSettings.policies[0].logic: "
+            "'MAYBE' is not one of POSITIVE, NEGATIVE",
+            "clients[0].authorizationSettings.policies[0].config.roles: "
+            "expected string, got array",
+            "roles.client.otago[1].name: required",
+            "users[0].realmRoles[1]: expected string, got number",
+            "enabeld: unknown key",
+        ]
+
+    def test_bool_is_not_an_integer(self):
+        # Arrange
+        realm = make_realm()
+        realm["users"][0]["createdTimestamp"] = True
+
+        # Act
+        errors = validate_realm(realm)
+
+        # Assert
+        assert "users[0].createdTimestamp: expected integer, got boolean" in errors
+
+    def test_null_values_of_unknown_keys_are_reported(self):
+        # Act
+        errors = validate_realm({"realm": "a", "enabeld": None, "displayName": None})
+
+        # Assert
+        assert errors == ["enabeld: unknown key"]
+
+    def test_compact_models_are_validated(self):
+        # Arrange
+        template = {"realm": make_realm()}
+        template["realm"]["users"][0]["totp"] = "no"
+
+        # Act & Assert
+        with pytest.raises(SchemaValidationError, match=r"users\[0\].totp"):
+            RealmTransformer(template, compact_model=True, validate_schema=True).apply()
+
+    def test_transformer_raises_with_all_errors(self):
+        # Arrange
+        template = {"realm": make_realm() | {"clientz": [], "users": {}}}
+
+        # Act
+        with pytest.raises(SchemaValidationError) as e:
+            RealmTransformer(template, validate_schema=True).apply()
+
+        # Assert
+        assert e.value.errors == [
+            "users: expected array, got object",
+            "clientz: unknown key",
+        ]
+        assert str(e.value).startswith("Realm does not match the schema (2):")
+
+    def test_validator_is_compiled_once(self):
+        # Act & Assert
+        assert realm_validator() is realm_validator()
+
+
+class TestCompileSchema:
+    def test_subset(self):
+        # Arrange
+        check = compile_schema(
+            {
+                "type": "object",
+                "required": ["a"],
+                "properties": {
+                    "a": {"type": ["string", "integer"]},
+                    "b": {"type": "array", "items": {"enum": ["x", "y"]}},
+                },
+                "additionalProperties": {"type": "boolean"},
+            }
+        )
+        errors = []
+
+        # Act
+        check({"b": ["x", "z"], "c": True, "d": 1}, "", errors)
+
+        # Assert
+        assert errors == [
+            "b[1]: 'z' is not one of x, y",
+            "d: expected boolean, got number",
+            "a: required",
+        ]
+
+    def test_root_type_error(self):
+        # Arrange
+        errors = []
+
+        # Act
+        compile_schema({"type": "object", "properties": {}})([], "", errors)
+
+        # Assert
+        assert errors == ["realm: expected object, got array"]
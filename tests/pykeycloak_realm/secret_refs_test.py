@@ -0,0 +1,207 @@
+import json
+import shlex
+import sys
+
+import pytest
+import yaml
+
+from pykeycloak_realm.builder import RealmTransformer, template_load
+from pykeycloak_realm.secret_refs import (
+    BACKENDS,
+    CommandSecretBackend,
+    FileSecretBackend,
+    SecretBackend,
+    SecretRef,
+    SecretResolutionError,
+    clear_caches,
+    register_backend,
+    resolve_secrets,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    clear_caches()
+    yield
+    clear_caches()
+
+
+def write_template(tmp_path, text):
+    template_file = tmp_path / "secrets.realm.yml"
+    template_file.write_text(text)
+    return template_load("secrets", ".realm.yml", str(tmp_path))
+
+
+class TestSecretTags:
+    def test_tags_load_as_refs(self, tmp_path):
+        # Act
+        template = write_template(
+            tmp_path,
+            "envs:\n  a: !env OTAGO_SECRET\n  b: !cmd vault/otago\n  c: !file s.txt\n",
+        )
+
+        # Assert
+        assert template["envs"]["a"] == SecretRef("env", "OTAGO_SECRET")
+        assert template["envs"]["b"] == SecretRef("cmd", "vault/otago")
+        assert template["envs"]["c"] == SecretRef("file", str(tmp_path / "s.txt"))
+
+    def test_file_ref_keeps_entry_and_absolute_path(self, tmp_path):
+        # Act
+        template = write_template(tmp_path, "a: !file /run/secrets/all.env#OTAGO\n")
+
+        # Assert
+        assert template["a"] == SecretRef("file", "/run/secrets/all.env#OTAGO")
+
+    def test_unknown_tag(self, tmp_path):
+        # Act & Assert
+        with pytest.raises(yaml.YAMLError, match="unknown tag !vault"):
+            write_template(tmp_path, "a: !vault otago\n")
+
+
+class TestResolveSecrets:
+    def test_file_backend_reads_each_file_once(self, tmp_path):
+        # Arrange
+        (tmp_path / "clients.json").write_text(
+            json.dumps({f"client-{i}": f"secret-{i}" for i in range(300)})
+        )
+        (tmp_path / "single.txt").write_text("  whole-file-secret\n")
+        template = write_template(
+            tmp_path,
+            "envs:\n  clients:\n"
+            + "".join(
+                f"    - clientId: client-{i}\n      secret: !file clients.json#client-{i}\n"
+                for i in range(300)
+            )
+            + "realm:\n  x: !file single.txt\n",
+        )
+
+        # Act
+        replaced = resolve_secrets(template)
+
+        # Assert
+        assert replaced == 301
+        assert template["envs"]["clients"][299]["secret"] == "secret-299"  # noqa: S105
+        assert template["realm"]["x"] == "whole-file-secret"
+        assert BACKENDS["file"].calls == 1
+
+    def test_dotenv_entries(self, tmp_path):
+        # Arrange
+        (tmp_path / "secrets.env").write_text('# comment\nA=one\nB="two"\n')
+        data = {
+            "a": SecretRef("file", f"{tmp_path}/secrets.env#A"),
+            "b": [SecretRef("file", f"{tmp_path}/secrets.env#B")],
+        }
+
+        # Act
+        resolve_secrets(data)
+
+        # Assert
+        assert data == {"a": "one", "b": ["two"]}
+
+    def test_results_are_cached_for_the_process(self, tmp_path):
+        # Arrange
+        secret_file = tmp_path / "s.txt"
+        secret_file.write_text("first")
+        ref = SecretRef("file", str(secret_file))
+        resolve_secrets({"a": ref})
+        secret_file.write_text("second")
+
+        # Act
+        data = {"a": ref}
+        resolve_secrets(data)
+
+        # Assert
+        assert data["a"] == "first"
+        assert BACKENDS["file"].calls == 1
+
+    def test_env_backend(self, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("OTAGO_SECRET", "from-env")
+        data = {"clients": [{"secret": SecretRef("env", "OTAGO_SECRET")}]}
+
+        # Act
+        resolve_secrets(data)
+
+        # Assert
+        assert data["clients"][0]["secret"] == "from-env"  # noqa: S105
+
+    def test_missing_value(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("MISSING_SECRET", raising=False)
+
+        # Act & Assert
+        with pytest.raises(SecretResolutionError, match="MISSING_SECRET"):
+            resolve_secrets({"a": SecretRef("env", "MISSING_SECRET")})
+
+    def test_unknown_backend(self):
+        # Act & Assert
+        with pytest.raises(SecretResolutionError, match="!nope"):
+            resolve_secrets({"a": SecretRef("nope", "x")})
+
+    def test_command_backend_single_invocation(self, tmp_path):
+        # Arrange
+        log = tmp_path / "calls.log"
+        script = tmp_path / "secrets_cmd.py"
+        script.write_text(
+            "import json, sys\n"
+            f"open({str(log)!r}, 'a').write('call\\n')\n"
+            "keys = json.load(sys.stdin)\n"
+            "print(json.dumps({k: k.upper() for k in keys}))\n"
+        )
+        backend = CommandSecretBackend(
+            f"{shlex.quote(sys.executable)} {shlex.quote(str(script))}"
+        )
+        register_backend("cmd", backend)
+        data = {"clients": [{"secret": SecretRef("cmd", f"k{i}")} for i in range(50)]}
+
+        try:
+            # Act
+            resolve_secrets(data)
+        finally:
+            register_backend("cmd", CommandSecretBackend())
+
+        # Assert
+        assert data["clients"][49]["secret"] == "K49"  # noqa: S105
+        assert log.read_text() == "call\n"
+
+    def test_command_backend_not_configured(self, monkeypatch):
+        # Arrange
+        monkeypatch.delenv("KEYCLOAK_BUILDER_SECRETS_COMMAND", raising=False)
+
+        # Act & Assert
+        with pytest.raises(SecretResolutionError, match="not set"):
+            resolve_secrets({"a": SecretRef("cmd", "x")})
+
+    def test_backend_without_fetch_cannot_be_created(self):
+        # Arrange
+        class Incomplete(SecretBackend):
+            pass
+
+        # Act & Assert
+        with pytest.raises(TypeError, match="abstract"):
+            Incomplete()
+
+
+class TestTransformerWithSecretRefs:
+    def test_env_clients_secrets_are_injected(self, tmp_path):
+        # Arrange
+        (tmp_path / "otago.env").write_text("OTAGO_SECRET=resolved-secret\n")
+        template = {
+            "realm": {"clients": [{"clientId": "otago"}]},
+            "envs": {
+                "clients": [
+                    {
+                        "clientId": "otago",
+                        "secret": FileSecretBackend().make_ref(
+                            "file", "otago.env#OTAGO_SECRET", tmp_path / "t.yml"
+                        ),
+                    }
+                ]
+            },
+        }
+
+        # Act
+        result = RealmTransformer(template).apply()
+
+        # Assert
+        assert result["clients"][0]["secret"] == "resolved-secret"  # noqa: S105
@@ -0,0 +1,162 @@
+from pathlib import Path
+
+import pytest
+
+from pykeycloak_realm.config import RealmBuilderConfig
+from pykeycloak_realm.realm import main
+from pykeycloak_realm.snapshot import check_template, check_templates, find_templates
+
+DATA = Path(__file__).parents[2] / "data" / "realms"
+
+# the options the golden exports are built with (see .env)
+POLICY_ENCODING = "policy_role__=roles;policy_client__=clients;policy_group__=groups"
+
+TEMPLATE = """\
+realm:
+  realm: {name}
+  enabled: true
+  clients:
+    - clientId: web
+      publicClient: {public}
+"""
+
+
+def make_config(**kwargs):
+    return RealmBuilderConfig(
+        policy_encoding=POLICY_ENCODING, validate_schema=True, **kwargs
+    )
+
+
+def write_templates(tmp_path, *names, public="true"):
+    templates = tmp_path / "templates"
+    templates.mkdir(exist_ok=True)
+    for name in names:
+        (templates / f"{name}.realm.yml").write_text(
+            TEMPLATE.format(name=name, public=public)
+        )
+    return templates
+
+
+class TestGoldenSnapshots:
+    @pytest.mark.parametrize("compact_model", [False, True])
+    def test_bundled_templates_match_golden_exports(self, compact_model):
+        # Arrange
+        config = make_config(compact_model=compact_model)
+        templates = find_templates(DATA / "templates", config.template_file_suffix)
+
+        # Act
+        results = check_templates(templates, DATA / "golden", config)
+
+        # Assert
+        assert templates
+        assert {r.template: r.status for r in results} == {
+            t.name.removesuffix(config.template_file_suffix): "ok" for t in templates
+        }
+
+
+class TestCheckTemplates:
+    def test_update_then_ok_in_parallel(self, tmp_path):
+        # Arrange
+        config = make_config()
+        templates = find_templates(
+            write_templates(tmp_path, "a", "b", "c"), config.template_file_suffix
+        )
+        golden = tmp_path / "golden"
+
+        # Act
+        updated = check_templates(templates, golden, config, update=True, jobs=2)
+        checked = check_templates(templates, golden, config, jobs=2)
+
+        # Assert
+        assert [(r.template, r.status) for r in updated] == [
+            ("a", "updated"),
+            ("b", "updated"),
+            ("c", "updated"),
+        ]
+        assert [r.status for r in checked] == ["ok", "ok", "ok"]
+        assert (golden / "a.realm.json.fingerprint.json").is_file()
+
+    def test_changed_output_gets_structural_diff(self, tmp_path):
+        # Arrange
+        config = make_config()
+        template = write_templates(tmp_path, "a") / "a.realm.yml"
+        check_template(template, tmp_path / "golden", config, update=True)
+        write_templates(tmp_path, "a", public="false")
+
+        # Act
+        result = check_template(template, tmp_path / "golden", config)
+
+        # Assert
+        assert result.status == "changed"
+        assert result.sections == {"clients": "changed"}
+        assert [str(c) for c in result.changes] == [
+            "~ clients[clientId=web].publicClient: true -> false"
+        ]
+
+    def test_secrets_are_masked(self, tmp_path, monkeypatch):
+        # Arrange
+        monkeypatch.setenv("SNAPSHOT_WEB_SECRET", "s3cret")
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        template = templates / "a.realm.yml"
+        template.write_text(
+            "realm:\n  realm: a\n  clients:\n"
+            "    - clientId: web\n      secret: !env SNAPSHOT_WEB_SECRET\n"
+        )
+        golden = tmp_path / "golden"
+
+        # Act
+        check_template(template, golden, make_config(), update=True)
+        monkeypatch.delenv("SNAPSHOT_WEB_SECRET")
+        result = check_template(template, golden, make_config())
+
+        # Assert
+        text = (golden / "a.realm.json").read_text()
+        assert "s3cret" not in text
+        assert '"secret": "**********"' in text
+        assert result.status == "ok"
+
+    def test_missing_golden_export(self, tmp_path):
+        # Arrange
+        template = write_templates(tmp_path, "a") / "a.realm.yml"
+
+        # Act
+        result = check_template(template, tmp_path / "golden", make_config())
+
+        # Assert
+        assert result.status == "missing"
+
+
+class TestSnapshotCommand:
+    def test_differences_exit_with_one(self, tmp_path, monkeypatch, capsys):
+        # Arrange
+        monkeypatch.setenv("KEYCLOAK_BUILDER_GOLDEN_PATH", str(tmp_path / "golden"))
+        templates = write_templates(tmp_path, "a")
+        main(["snapshot", str(templates), "--update"])
+        write_templates(tmp_path, "a", public="false")
+        capsys.readouterr()
+
+        # Act
+        with pytest.raises(SystemExit) as exc:
+            main(["snapshot", str(templates)])
+
+        # Assert
+        assert exc.value.code == 1
+        assert capsys.readouterr().out.splitlines() == [
+            "a: changed",
+            "  clients: changed",
+            "  ~ clients[clientId=web].publicClient: true -> false",
+        ]
+
+    def test_unchanged_templates(self, tmp_path, capsys):
+        # Arrange
+        templates = write_templates(tmp_path, "a")
+        golden = str(tmp_path / "golden")
+        main(["snapshot", str(templates), "--golden", golden, "--update"])
+        capsys.readouterr()
+
+        # Act
+        main(["snapshot", str(templates), "--golden", golden])
+
+        # Assert
+        assert capsys.readouterr().out == "a: ok\n"
@@ -0,0 +1,262 @@
+import json
+
+import pytest
+
+from pykeycloak_realm.builder import export
+from pykeycloak_realm.config import KeycloakAdminConfig, RealmBuilderConfig
+from pykeycloak_realm.fingerprint import content_fingerprint, fingerprint_path
+from pykeycloak_realm.realm import main
+from pykeycloak_realm.upload import (
+    KeycloakAdmin,
+    KeycloakError,
+    build_realm,
+    deploy_realms,
+    deployed_fingerprint_path,
+)
+
+TEMPLATE = """\
+realm:
+  realm: {name}
+  enabled: true
+  clients:
+    - clientId: web
+"""
+
+
+def make_config(tmp_path):
+    templates = tmp_path / "templates"
+    export = tmp_path / "export"
+    templates.mkdir(exist_ok=True)
+    export.mkdir(exist_ok=True)
+    return RealmBuilderConfig(
+        _template_dir_path=str(templates), _template_export_dir_path=str(export)
+    )
+
+
+def write_templates(config, *names):
+    for name in names:
+        path = f"{config.template_dir_path}/{name}{config.template_file_suffix}"
+        with open(path, "w") as f:
+            f.write(TEMPLATE.format(name=name))
+
+
+def make_admin(fake, **kwargs):
+    return KeycloakAdmin(KeycloakAdminConfig(url=fake.url, **kwargs))
+
+
+class TestKeycloakAdmin:
+    def test_create_and_delete(self, fake_keycloak):
+        # Arrange
+        admin = make_admin(fake_keycloak)
+
+        # Act
+        admin.create_realm(b'{"realm": "otago"}')
+        exists = admin.realm_exists("otago")
+        admin.delete_realm("otago")
+
+        # Assert
+        assert exists is True
+        assert admin.realm_exists("otago") is False
+        assert fake_keycloak.methods() == ["POST", "POST", "GET", "DELETE", "GET"]
+
+    def test_expired_token_is_fetched_again(self, fake_keycloak):
+        # Arrange
+        admin = make_admin(fake_keycloak)
+        admin.realm_exists("otago")
+        fake_keycloak.expire_tokens()
+
+        # Act
+        exists = admin.realm_exists("otago")
+
+        # Assert
+        assert exists is False
+        assert fake_keycloak.methods() == ["POST", "GET", "GET", "POST", "GET"]
+
+    def test_authentication_failure(self, fake_keycloak):
+        # Arrange
+        admin = make_admin(fake_keycloak, password="wrong")  # noqa: S106
+
+        # Act & Assert
+        with pytest.raises(KeycloakError, match="Authentication failed: HTTP 401"):
+            admin.realm_exists("otago")
+
+    def test_server_error(self, fake_keycloak):
+        # Arrange
+        fake_keycloak.fail_realms.add("otago")
+
+        # Act & Assert
+        with pytest.raises(KeycloakError, match="POST /: HTTP 500"):
+            make_admin(fake_keycloak).create_realm(b'{"realm": "otago"}')
+
+    def test_invalid_url(self):
+        # Act & Assert
+        with pytest.raises(ValueError, match="Invalid Keycloak URL"):
+            KeycloakAdmin(KeycloakAdminConfig(url="file:///etc/passwd"))
+
+
+class TestDeployRealms:
+    def test_uploads_the_built_bytes(self, tmp_path, fake_keycloak):
+        # Arrange
+        config = make_config(tmp_path)
+        write_templates(config, "a", "b", "c")
+
+        # Act
+        results = deploy_realms(
+            ["a", "b", "c"], make_admin(fake_keycloak), config, builders=2
+        )
+
+        # Assert
+        assert [(r.template, r.status) for r in results] == [
+            ("a", "uploaded"),
+            ("b", "uploaded"),
+            ("c", "uploaded"),
+        ]
+        assert fake_keycloak.realms["a"] == build_realm("a", config).body
+        deployed = json.loads(
+            deployed_fingerprint_path(config.get_realm_filename("a")).read_text()
+        )
+        assert deployed == content_fingerprint(build_realm("a", config).fingerprint)
+        assert "mtime_ns" not in deployed
+
+    def test_deployed_fingerprint_matches_the_export_sidecar(
+        self, tmp_path, fake_keycloak
+    ):
+        # Arrange: what bin/realm_upload records is the sidecar of the export
+        # without its size and mtime lines
+        config = make_config(tmp_path)
+        write_templates(config, "a")
+        export("a", "a", config)
+        sidecar = fingerprint_path(config.get_realm_filename("a")).read_text()
+        recorded = "".join(
+            line
+            for line in sidecar.splitlines(keepends=True)
+            if not line.startswith(('  "size": ', '  "mtime_ns": '))
+        )
+
+        # Act
+        deploy_realms(["a"], make_admin(fake_keycloak), config)
+
+        # Assert
+        deployed = deployed_fingerprint_path(config.get_realm_filename("a"))
+        assert deployed.read_text() == recorded
+
+    def test_uploads_overlap_builds(self, tmp_path, fake_keycloak):
+        # Arrange
+        config = make_config(tmp_path)
+        write_templates(config, "a", "b", "c")
+        fake_keycloak.import_delay = 0.2
+
+        # Act
+        results = deploy_realms(
+            ["a", "b", "c"],
+            make_admin(fake_keycloak),
+            config,
+            builders=1,
+            uploaders=1,
+            queue_size=1,
+        )
+
+        # Assert
+        first_upload = min(r.upload_started_at for r in results)
+        last_build = max(r.built_at for r in results)
+        assert first_upload < last_build
+
+    def test_unchanged_realms_are_skipped(self, tmp_path, fake_keycloak):
+        # Arrange
+        config = make_config(tmp_path)
+        write_templates(config, "a")
+        admin = make_admin(fake_keycloak)
+        deploy_realms(["a"], admin, config)
+
+        # Act
+        unchanged = deploy_realms(["a"], admin, config)
+        forced = deploy_realms(["a"], admin, config, force=True)
+
+        # Assert
+        assert [r.status for r in unchanged] == ["unchanged"]
+        assert [r.status for r in forced] == ["uploaded"]
+        assert fake_keycloak.methods().count("DELETE") == 1
+
+    def test_without_users(self, tmp_path, fake_keycloak):
+        # Arrange
+        config = make_config(tmp_path)
+        write_templates(config, "a")
+        path = tmp_path / "templates" / "a.realm.yml"
+        path.write_text(path.read_text() + "  users:\n    - username: alice\n")
+
+        # Act
+        deploy_realms(["a"], make_admin(fake_keycloak), config, without_users=True)
+
+        # Assert
+        assert "users" in build_realm("a", config).body.decode()
+        assert "users" not in json.loads(fake_keycloak.realms["a"])
+
+    def test_failures_do_not_stop_the_batch(self, tmp_path, fake_keycloak):
+        # Arrange
+        config = make_config(tmp_path)
+        write_templates(config, "a", "b")
+        fake_keycloak.fail_realms.add("b")
+
+        # Act
+        results = deploy_realms(
+            ["missing", "a", "b"], make_admin(fake_keycloak), config
+        )
+
+        # Assert
+        assert [(r.template, r.status) for r in results] == [
+            ("missing", "build failed"),
+            ("a", "uploaded"),
+            ("b", "upload failed"),
+        ]
+        assert "Preset file does not exist" in results[0].error
+        assert results[2].error == "POST /: HTTP 500"
+        assert set(fake_keycloak.realms) == {"a"}
+
+    @pytest.mark.parametrize(
+        "kwargs", [{"uploaders": 0}, {"queue_size": 0}, {"queue_size": -1}]
+    )
+    def test_invalid_uploaders_or_queue(self, tmp_path, kwargs):
+        # Act & Assert
+        with pytest.raises(ValueError, match="must be at least 1"):
+            deploy_realms(["a"], None, make_config(tmp_path), **kwargs)
+
+
+class TestDeployCommand:
+    def test_deploys_every_template(self, tmp_path, fake_keycloak, monkeypatch, capsys):
+        # Arrange
+        config = make_config(tmp_path)
+        write_templates(config, "a", "b")
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TEMPLATES_PATH", config.template_dir_path)
+        monkeypatch.setenv(
+            "KEYCLOAK_BUILDER_EXPORT_PATH", config.template_export_dir_path
+        )
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+
+        # Act
+        main(["deploy", "--builders", "1"])
+
+        # Assert
+        lines = capsys.readouterr().out.splitlines()
+        assert [line.split(" (")[0] for line in lines[:2]] == [
+            "a: uploaded",
+            "b: uploaded",
+        ]
+        assert lines[2].startswith("2 realms in ")
+        assert set(fake_keycloak.realms) == {"a", "b"}
+
+    def test_failure_exits_with_one(self, tmp_path, fake_keycloak, monkeypatch):
+        # Arrange
+        config = make_config(tmp_path)
+        monkeypatch.setenv("KEYCLOAK_BUILDER_TEMPLATES_PATH", config.template_dir_path)
+        monkeypatch.setenv("KEYCLOAK_ADMIN_URL", fake_keycloak.url)
+
+        # Act & Assert
+        with pytest.raises(SystemExit) as exc:
+            main(["deploy", "missing"])
+        assert exc.value.code == 1
+
+    @pytest.mark.parametrize("option", ["--uploaders", "--queue"])
+    def test_invalid_uploaders_or_queue_exit(self, option):
+        # Act & Assert
+        with pytest.raises(SystemExit, match="must be at least 1"):
+            main(["deploy", option, "0"])